@@ -4,15 +4,26 @@ Uses Streamlit for the web interface.
 """
 
 import os
+import json
 import time
+import mimetypes
 import logging
-import tempfile
 import streamlit as st
 from pathlib import Path
+from typing import Optional
+from urllib.parse import quote
 from dotenv import load_dotenv
 
-from azure_openai_utils import AzureOpenAIClient
-from video_editor import combine_video_and_audio
+from artifacts import VIDEO_OUTPUT_DIR, new_artifact_id
+from azure_openai_utils import AzureOpenAIClient, TTS_STYLE_PRESETS
+from clip_index import CLIP_REUSE_ENABLED, CLIP_REUSE_THRESHOLD
+from job_queue import ACTIVE_STATUSES, JOB_QUEUE_BACKEND, JobWorkerPool
+from job_store import JobStore
+from pipeline import SORA_VARIANTS
+from renditions import RENDITION_LADDER, VIDEO_RENDITIONS
+from video_editor import STREAMING_FORMATS, VIDEO_STREAMING_FORMATS
+from music_library import get_music_library
+from telemetry import get_telemetry
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -28,17 +39,65 @@ OUTPUT_DIR.mkdir(exist_ok=True)
 # Background music directory
 MUSIC_DIR = Path("background_music")
 
+# Base URL under which a static file server (e.g. nginx or a CDN) serves the
+# output directory. Videos are then played and downloaded from there with
+# range requests instead of being pushed through the Streamlit server.
+MEDIA_BASE_URL = os.getenv("MEDIA_BASE_URL", "")
+
+def media_url(path: str) -> Optional[str]:
+    """Return the URL of an output file on the media server, or None without one."""
+    if not MEDIA_BASE_URL:
+        return None
+    try:
+        relative = Path(path).resolve().relative_to(OUTPUT_DIR.resolve())
+    except ValueError:
+        return None
+    return f"{MEDIA_BASE_URL.rstrip('/')}/{quote(relative.as_posix())}"
+
+def download_button(label: str, path: str, mime: str, key: Optional[str] = None):
+    """Offer a file for download, as a link to the media server if there is one."""
+    url = media_url(path)
+    if url:
+        st.link_button(label, url)
+        return
+    with open(path, "rb") as f:
+        st.download_button(
+            label=label,
+            data=f,
+            file_name=os.path.basename(path).replace("final_video_", "teaser_video_"),
+            mime=mime,
+            key=key
+        )
+
 # Get all MP3 files from the background music directory
+# (cached across reruns; new files show up within a minute)
+@st.cache_data(ttl=60)
 def get_music_files():
-    if not MUSIC_DIR.exists():
-        logger.warning(f"Music directory {MUSIC_DIR} does not exist")
-        return []
-    
-    music_files = sorted([f.name for f in MUSIC_DIR.glob("*.mp3")])
-    logger.info(f"Found {len(music_files)} music files in {MUSIC_DIR}")
-    return music_files
+    return get_music_library(MUSIC_DIR).tracks()
+
+# Seconds between progress checks of a running job
+JOB_POLL_INTERVAL = 2.0
+
+@st.cache_resource
+def get_client() -> AzureOpenAIClient:
+    """Create the client once per server process instead of on every rerun."""
+    return AzureOpenAIClient()
+
+@st.cache_resource
+def get_job_pool() -> JobWorkerPool:
+    """Start the worker pool once per server process; all sessions submit to it."""
+    pool = JobWorkerPool(get_client(), JobStore())
+    if JOB_QUEUE_BACKEND == "local":
+        # Jobs interrupted by a restart would otherwise stay queued forever
+        pool.recover()
+    # Apply the output quota to what earlier runs left behind
+    pool.evict_outputs(force=True)
+    return pool.start()
 
 def main():
+    # No-op unless METRICS_PORT is set; the server is started once per process
+    get_telemetry().start_metrics_server()
+
     st.set_page_config(
         page_title="AI Teaser Video Generator",
         page_icon="🎬",
@@ -69,9 +128,9 @@ def main():
         """)
         return
     
-    # Initialize the Azure OpenAI client
+    # Generations run on a worker pool shared by all sessions of this server
     try:
-        client = AzureOpenAIClient()
+        pool = get_job_pool()
     except Exception as e:
         st.error(f"Failed to initialize Azure OpenAI client: {str(e)}")
         return
@@ -87,6 +146,10 @@ def main():
     voice_options = ["alloy", "echo", "fable", "onyx", "nova", "shimmer"]
     selected_voice = st.selectbox("Choose a voice for narration:", voice_options)
     
+    # Delivery style for TTS ("Auto" uses the instructions generated with the narrative)
+    style_options = ["Auto"] + list(TTS_STYLE_PRESETS)
+    selected_style = st.selectbox("Choose a narration style:", style_options)
+    
     # Background music selection
     st.subheader("Background Music")
     music_files = get_music_files()
@@ -103,95 +166,153 @@ def main():
     if selected_music != "None":
         music_volume = st.slider("Background music volume:", 0.0, 1.0, 0.3, 0.1)
     
+    # More variants cost more Sora time but make a usable clip more likely
+    n_variants = st.slider("Video variants to choose the best from:", 1, 4, SORA_VARIANTS)
+    
+    # A clip made for a near-identical earlier prompt saves a multi-minute Sora job
+    reuse_clip = CLIP_REUSE_ENABLED and st.checkbox(
+        "Reuse the video of a similar earlier prompt if there is one", value=False
+    )
+    
+    # Narratives are cached by prompt, so the same prompt gets the same narrative unless asked otherwise
+    fresh_narrative = st.checkbox("Write a new narrative instead of reusing the last one for this prompt", value=False)
+    
+    # Extra formats are encoded together from a single decode of the final video
+    selected_renditions = st.multiselect("Additional formats:", list(RENDITION_LADDER), default=VIDEO_RENDITIONS)
+    
+    # Stream copies of the final video for players that stream from a file server
+    selected_streaming = st.multiselect("Streaming packages:", list(STREAMING_FORMATS), default=VIDEO_STREAMING_FORMATS)
+    
     # Process button
     if st.button("Generate Teaser Video", type="primary"):
-        # Create a progress bar
-        progress_bar = st.progress(0)
-        status_text = st.empty()
+        # Unique output name; several sessions may start a job within the same second
+        artifact_id = new_artifact_id()
+        
+        # Add background music if selected
+        background_music_path = None
+        if selected_music != "None" and MUSIC_DIR.exists():
+            background_music_path = str(MUSIC_DIR / selected_music)
+            logger.info(f"Using background music: {background_music_path} with volume {music_volume}")
         
+        job_id = pool.submit({
+            "prompt": prompt,
+            "output_path": os.path.join(VIDEO_OUTPUT_DIR, f"final_video_{artifact_id}.mp4"),
+            "voice": selected_voice,
+            "tts_style": None if selected_style == "Auto" else selected_style,
+            "background_music_path": background_music_path,
+            "music_volume": music_volume,
+            "n_variants": n_variants,
+            "renditions": selected_renditions,
+            "streaming": selected_streaming,
+            "reuse_threshold": CLIP_REUSE_THRESHOLD if reuse_clip else None,
+            "fresh_narrative": fresh_narrative
+        })
+        # The job id in the URL lets a reloaded page reconnect to the running job
+        st.session_state["job_id"] = job_id
+        st.query_params["job"] = job_id
+    
+    job_id = st.session_state.get("job_id") or st.query_params.get("job")
+    if job_id:
+        show_job(pool, job_id)
+
+def show_job(pool: JobWorkerPool, job_id: str):
+    """Show the progress and results of a job, polling until it finishes."""
+    job = pool.job_store.get_job(job_id)
+    if job is None:
+        st.session_state.pop("job_id", None)
+        return
+    stages = pool.job_store.load_stages(job_id)
+    status = job["status"]
+    
+    progress_bar = st.progress(100 if status == "succeeded" else int(100 * job["progress"]))
+    status_text = st.empty()
+    
+    if "narrative" in stages:
+        # Display the generated narrative
+        st.subheader("Generated Narrative")
+        narrative = stages["narrative"]
         try:
-            # Step 1: Generate narrative
-            status_text.text("Step 1/5: Generating narrative...")
-            narrative = client.generate_narrative(prompt)
-            progress_bar.progress(20)
-            
-            # Display the generated narrative
-            st.subheader("Generated Narrative")
-            st.write(narrative)
-            
-            # Step 2: Generate speech from narrative
-            status_text.text("Step 2/5: Converting narrative to speech...")
-            audio_data = client.generate_tts(narrative, voice=selected_voice)
-            progress_bar.progress(40)
-            
-            # Save audio for preview
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp_audio:
-                tmp_audio.write(audio_data)
-                audio_path = tmp_audio.name
-            
-            # Display audio player
-            st.subheader("Generated Voice Narration")
-            st.audio(audio_path)
-            
-            # Step 3: Generate Sora instructions
-            status_text.text("Step 3/5: Creating video generation instructions...")
-            sora_instructions = client.generate_sora_instructions(narrative)
-            progress_bar.progress(60)
-            
-            # Display the generated instructions
-            st.subheader("Video Generation Instructions")
-            st.write(sora_instructions)
-            
-            # Step 4: Generate video using Sora
-            status_text.text("Step 4/5: Generating video (this may take a while)...")
-            # Show spinner while video is generating
-            with st.spinner("Generating video with AI... This may take several minutes. Please wait."):
-                video_url = client.generate_video(sora_instructions)
-            
-            # Create timestamped output file
-            timestamp = time.strftime("%Y%m%d-%H%M%S")
-            
-            # Step 5: Combine video, voice narration, and background music
-            status_text.text("Step 5/5: Combining video, voice narration, and background music...")
-            progress_bar.progress(80)
-            final_video_path = str(OUTPUT_DIR / f"final_video_{timestamp}.mp4")
-            
-            # Add background music if selected
-            background_music_path = None
-            if selected_music != "None" and MUSIC_DIR.exists():
-                background_music_path = str(MUSIC_DIR / selected_music)
-                logger.info(f"Using background music: {background_music_path} with volume {music_volume}")
-            
-            # Combine all elements
-            final_path = combine_video_and_audio(
-                video_url, 
-                audio_data, 
-                final_video_path,
-                background_music_path=background_music_path,
-                music_volume=music_volume
-            )
-            progress_bar.progress(100)
-            
-            # Display the final video
-            st.subheader("Your Generated Teaser Video")
-            st.video(final_path)
-            
-            # Success message
-            status_text.text("Video generation complete! You can download it using the button below.")
-            
-            # Download button for the video
-            with open(final_path, "rb") as f:
-                st.download_button(
-                    label="Download Video",
-                    data=f,
-                    file_name=f"teaser_video_{timestamp}.mp4",
-                    mime="video/mp4"
-                )
-            
-        except Exception as e:
-            st.error(f"An error occurred: {str(e)}")
-            logger.error(f"Error in video generation process: {str(e)}")
-            status_text.text("Error: Video generation failed. Please try again.")
+            narrative = json.loads(narrative)["narrative"]
+        except (ValueError, TypeError, KeyError):
+            # Checkpoint written before narratives were bundled holds the plain text
+            pass
+        st.write(narrative)
+    if "audio" in stages and os.path.exists(stages["audio"]):
+        # Display audio player for the checkpointed narration
+        st.subheader("Generated Voice Narration")
+        st.audio(stages["audio"], format="audio/wav")
+    if "sora_instructions" in stages:
+        # Display the generated instructions
+        st.subheader("Video Generation Instructions")
+        st.write(stages["sora_instructions"])
+    if "plan" in stages:
+        plan = json.loads(stages["plan"])
+        st.caption(f"Video length: {plan['n_seconds']}s at {plan['width']}x{plan['height']} "
+                   f"for {plan['narration_seconds']:.1f}s of narration")
+    if "reused_clip" in stages:
+        match = json.loads(stages["reused_clip"])
+        st.caption(f"Reused the video of a similar earlier prompt ({match['similarity']:.0%} similar): "
+                   f"\"{match['prompt']}\"")
+    
+    if status == "queued":
+        status_text.text("Waiting for a free worker...")
+    elif status == "running":
+        if "narrative" not in stages:
+            status_text.text("Generating narrative...")
+        elif "video" not in stages:
+            status_text.text("Generating video (this may take a while)...")
+        elif "final_video" not in stages:
+            status_text.text("Combining video, voice narration, and background music...")
+        else:
+            status_text.text("Encoding additional formats...")
+    elif status == "failed":
+        st.error(f"An error occurred: {job['error']}")
+        status_text.text("Error: Video generation failed. Resume the run to continue from the last completed step.")
+        # Completed stages are checkpointed, so the resumed run continues from the last one
+        if st.button("Resume Failed Run"):
+            pool.resume(job_id)
+            st.rerun()
+    elif status == "succeeded":
+        # Success message
+        status_text.text("Video generation complete! You can download it using the button below.")
+    
+    if os.path.exists(stages.get("final_video", "")):
+        final_path = stages["final_video"]
+        
+        # Display the final video (possibly while additional formats are still encoding)
+        st.subheader("Your Generated Teaser Video")
+        st.video(media_url(final_path) or final_path)
+        
+        # Show how long each step took
+        if "timing_report" in stages:
+            with st.expander("Stage timings"):
+                st.text(stages["timing_report"])
+        
+        # Download button for the video
+        download_button("Download Video", final_path, "video/mp4")
+        
+        # Download buttons for the additional formats
+        for name, path in json.loads(stages.get("renditions", "{}")).items():
+            if os.path.exists(path):
+                download_button(f"Download {name}", path, mimetypes.guess_type(path)[0] or "application/octet-stream",
+                                key=f"rendition_{name}")
+        
+        # Streaming packages are played from the media server by an external player
+        packages = json.loads(stages.get("streaming", "{}"))
+        if packages:
+            st.markdown("**Streaming packages**")
+            for name, path in packages.items():
+                st.text(f"{name}: {media_url(path) or path}")
+    elif status in ACTIVE_STATUSES and os.path.exists(stages.get("preview") or ""):
+        # Shown as soon as the Sora clip is in; the final video replaces it
+        st.subheader("Preview")
+        st.caption("Quick preview without background music. The final video will appear here when it is ready.")
+        st.video(media_url(stages["preview"]) or stages["preview"])
+    
+    if status in ACTIVE_STATUSES:
+        # Poll the job store; the generation keeps running if this session goes away
+        time.sleep(JOB_POLL_INTERVAL)
+        st.rerun()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,260 @@
+"""
+Artifact lifecycle management for the video generation application.
+This module provides per-job scratch directories, unique output names and a disk quota for the output directory.
+"""
+
+import os
+import time
+import uuid
+import shutil
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Directory of the videos made by the app; subject to the output quota
+VIDEO_OUTPUT_DIR = os.getenv("VIDEO_OUTPUT_DIR", os.path.join("output", "videos"))
+
+# Root of the scratch directories; a RAM-backed tmpfs is used if the system has one
+SCRATCH_DIR = os.getenv("ARTIFACT_SCRATCH_DIR", "")
+
+# Quota of the output directory; 0 disables the limit
+OUTPUT_MAX_BYTES = int(os.getenv("OUTPUT_MAX_BYTES", str(20 * 1024 ** 3)))
+OUTPUT_MAX_AGE = float(os.getenv("OUTPUT_MAX_AGE", str(7 * 24 * 3600)))
+
+# Minimum seconds between two evictions triggered by finished jobs
+EVICTION_INTERVAL = float(os.getenv("OUTPUT_EVICTION_INTERVAL", "300"))
+
+# Files the eviction may delete; databases and state files are never touched
+EVICTABLE_EXTENSIONS = (".mp4", ".mov", ".webm", ".mkv", ".m4a", ".mp3", ".wav", ".jpg", ".png", ".webp", ".part",
+                        ".m4s", ".m3u8", ".mpd")
+
+# Prefix of scratch directories, so stale ones left by a crashed process can be found
+SCRATCH_PREFIX = "teaser-"
+
+
+def new_artifact_id() -> str:
+    """
+    Return a unique id for output file names.
+
+    The timestamp keeps names sortable and readable; the random suffix keeps
+    them unique when several jobs start within the same second.
+    """
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+def default_scratch_root() -> str:
+    """Return /dev/shm if it is a writable tmpfs, otherwise the system temp directory."""
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+    return tempfile.gettempdir()
+
+
+class ArtifactManager:
+    """
+    Owns the scratch directories of jobs and the disk quota of the output directory.
+
+    A scratch directory is shared by everyone who acquires the same key (e.g.
+    the worker running a job and the combine step inside it) and deleted with
+    everything in it when the last holder releases it, so temporary files do
+    not outlive their job even if a step fails halfway.
+    """
+
+    def __init__(self, scratch_root: Optional[str] = None):
+        """
+        Initialize the manager.
+
+        Args:
+            scratch_root: Directory for scratch directories (defaults to SCRATCH_DIR or a tmpfs)
+        """
+        self.scratch_root = Path(scratch_root or SCRATCH_DIR or default_scratch_root())
+        self._refs: Dict[Path, int] = {}
+        self._lock = threading.Lock()
+        self._last_eviction = 0.0
+
+    def acquire(self, key: Optional[str] = None) -> Path:
+        """
+        Return the scratch directory of key and take a reference to it.
+
+        Args:
+            key: Job id or other owner; a new unique key if None
+
+        Returns:
+            Path of the directory, created if needed
+        """
+        key = key or uuid.uuid4().hex
+        directory = self.scratch_root / f"{SCRATCH_PREFIX}{os.getpid()}-{key}"
+        with self._lock:
+            self._refs[directory] = self._refs.get(directory, 0) + 1
+            directory.mkdir(parents=True, exist_ok=True)
+        return directory
+
+    def release(self, directory: Path):
+        """Drop a reference taken by acquire; the last one deletes the directory."""
+        with self._lock:
+            self._refs[directory] -= 1
+            if self._refs[directory] > 0:
+                return
+            del self._refs[directory]
+            shutil.rmtree(directory, ignore_errors=True)
+
+    @contextmanager
+    def workdir(self, key: Optional[str] = None) -> Iterator[Path]:
+        """Context manager around acquire and release."""
+        directory = self.acquire(key)
+        try:
+            yield directory
+        finally:
+            self.release(directory)
+
+    def remove_stale_scratch(self, max_age: float = 24 * 3600):
+        """Delete scratch directories of processes that no longer run, or older than max_age seconds."""
+        if not self.scratch_root.is_dir():
+            return
+        for entry in self.scratch_root.iterdir():
+            if not entry.name.startswith(SCRATCH_PREFIX) or not entry.is_dir():
+                continue
+            pid = entry.name[len(SCRATCH_PREFIX):].split("-", 1)[0]
+            if not pid.isdigit() or int(pid) == os.getpid():
+                continue
+            if not _process_exists(int(pid)) or time.time() - entry.stat().st_mtime > max_age:
+                logger.info(f"Removing stale scratch directory {entry}")
+                shutil.rmtree(entry, ignore_errors=True)
+
+    def evict(self, roots: Iterable[str], max_bytes: int = OUTPUT_MAX_BYTES, max_age: float = OUTPUT_MAX_AGE,
+              protect: Iterable[str] = ()) -> int:
+        """
+        Delete old output files until the quota is met.
+
+        Files older than max_age are deleted first, then the least recently
+        modified ones until the rest fits in max_bytes. Only media files are
+        considered; directories emptied by the eviction are removed.
+
+        Args:
+            roots: Directories to scan (recursively)
+            max_bytes: Maximum total size of the files, 0 for no limit
+            max_age: Maximum age of a file in seconds, 0 for no limit
+            protect: Paths that must be kept, e.g. the files of running jobs
+
+        Returns:
+            Number of deleted files
+        """
+        roots = list(roots)
+        protected: Set[str] = {os.path.abspath(path) for path in protect}
+        files: List[os.DirEntry] = []
+        for root in roots:
+            files.extend(_scan_files(root))
+        files = [entry for entry in files if entry.name.lower().endswith(EVICTABLE_EXTENSIONS)
+                 and os.path.abspath(entry.path) not in protected]
+
+        now = time.time()
+        stats = sorted(((entry.path, entry.stat()) for entry in files), key=lambda item: item[1].st_mtime)
+        total = sum(stat.st_size for _, stat in stats)
+        removed = 0
+        for path, stat in stats:
+            too_old = max_age and now - stat.st_mtime > max_age
+            too_big = max_bytes and total > max_bytes
+            if not too_old and not too_big:
+                # Sorted by age, so the remaining files are newer and fit
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= stat.st_size
+            removed += 1
+            _remove_empty_parents(path, roots)
+        if removed:
+            logger.info(f"Evicted {removed} output files, {total / 1024 ** 2:.0f} MB left")
+        return removed
+
+    def maybe_evict(self, roots: Iterable[str], protect: Iterable[str] = ()) -> int:
+        """Run evict unless it already ran within the last EVICTION_INTERVAL seconds."""
+        with self._lock:
+            if time.time() - self._last_eviction < EVICTION_INTERVAL:
+                return 0
+            self._last_eviction = time.time()
+        return self.evict(roots, protect=protect)
+
+
+def publish(scratch_path: str, output_path: str) -> str:
+    """Move a finished file or directory from a scratch directory to its final path, replacing any previous one."""
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if os.path.isdir(scratch_path):
+        shutil.rmtree(output_path, ignore_errors=True)
+        shutil.move(scratch_path, output_path)
+        return output_path
+    try:
+        os.replace(scratch_path, output_path)
+    except OSError:
+        # The scratch directory is on another file system (e.g. tmpfs)
+        shutil.copyfile(scratch_path, output_path)
+        os.unlink(scratch_path)
+    return output_path
+
+
+def discard_files(paths: Iterable[str], owner_dir: str):
+    """Delete the files among paths that live in owner_dir, leaving shared files alone."""
+    owner_dir = os.path.abspath(owner_dir)
+    for path in paths:
+        if os.path.dirname(os.path.abspath(path)) == owner_dir and os.path.exists(path):
+            os.unlink(path)
+
+
+def _scan_files(root: str) -> Iterator[os.DirEntry]:
+    try:
+        entries = list(os.scandir(root))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from _scan_files(entry.path)
+        elif entry.is_file(follow_symlinks=False):
+            yield entry
+
+
+def _remove_empty_parents(path: str, roots: Iterable[str]):
+    stop = {os.path.abspath(root) for root in roots}
+    directory = os.path.dirname(os.path.abspath(path))
+    while directory not in stop and directory != os.path.dirname(directory):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            return
+        directory = os.path.dirname(directory)
+
+
+def _process_exists(pid: int) -> bool:
+    if os.name == "nt":
+        # Signal 0 is CTRL_C_EVENT on Windows; stale directories are found by age there
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+_manager: Optional[ArtifactManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_artifact_manager() -> ArtifactManager:
+    """Return the process-wide artifact manager."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ArtifactManager()
+            _manager.remove_stale_scratch()
+            logger.info(f"Scratch directories in {_manager.scratch_root}")
+        return _manager
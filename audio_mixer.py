@@ -0,0 +1,306 @@
+"""
+Audio mixing utilities for the video generation application.
+This module decodes narration and music to PCM arrays and mixes them with NumPy.
+"""
+
+import io
+import os
+import wave
+import logging
+import threading
+import subprocess
+from typing import Iterable, Optional, Sequence, Union
+
+import numpy as np
+from moviepy.config import get_setting
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Format of all decoded audio: interleaved float32 samples in [-1.0, 1.0]
+SAMPLE_RATE = 44100
+CHANNELS = 2
+
+# Peak level the final mix is limited to
+PEAK_LIMIT = 0.98
+
+# Level below which audio counts as silence
+SILENCE_LEVEL = 0.01
+
+# Default reduction of the background music while the narration is speaking
+MUSIC_DUCKING_DB = float(os.getenv("MUSIC_DUCKING_DB", "0"))
+
+# Format of the "pcm" response of the speech endpoint: 24 kHz, 16-bit little-endian mono
+TTS_PCM_SAMPLE_RATE = 24000
+TTS_PCM_INPUT_ARGS = ("-f", "s16le", "-ar", str(TTS_PCM_SAMPLE_RATE), "-ac", "1")
+
+
+def decode_audio(source: Union[str, bytes, Iterable[bytes]], sample_rate: int = SAMPLE_RATE, channels: int = CHANNELS,
+                 max_duration: Optional[float] = None, input_args: Sequence[str] = ()) -> np.ndarray:
+    """
+    Decode an audio file, encoded audio bytes or a stream of audio chunks to a PCM array.
+
+    A stream is fed to ffmpeg as the chunks arrive, so decoding overlaps
+    with the download instead of waiting for the whole response.
+
+    Args:
+        source: Path to an audio file, encoded audio data (e.g. MP3) as bytes,
+            or an iterable of audio chunks, such as AzureOpenAIClient.stream_tts
+        sample_rate: Sample rate of the returned samples
+        channels: Number of channels of the returned samples
+        max_duration: Optional number of seconds to decode from the start
+        input_args: ffmpeg options describing the input, required for headerless
+            formats such as raw PCM (see TTS_PCM_INPUT_ARGS)
+
+    Returns:
+        float32 array of shape (frames, channels)
+    """
+    from_path = isinstance(source, str)
+    command = [
+        get_setting("FFMPEG_BINARY"), "-hide_banner", "-loglevel", "error",
+        *input_args,
+        "-i", source if from_path else "pipe:0",
+        *(["-t", str(max_duration)] if max_duration else []),
+        "-f", "f32le", "-acodec", "pcm_f32le",
+        "-ac", str(channels), "-ar", str(sample_rate),
+        "pipe:1"
+    ]
+    if from_path or isinstance(source, (bytes, bytearray)):
+        result = subprocess.run(
+            command,
+            input=None if from_path else bytes(source),
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        returncode, output, errors = result.returncode, result.stdout, result.stderr
+    else:
+        returncode, output, errors = _decode_stream(command, source)
+    if returncode != 0:
+        raise Exception(f"ffmpeg audio decode failed: {errors.decode(errors='replace').strip()}")
+    return np.frombuffer(output, dtype=np.float32).reshape(-1, channels)
+
+
+def _decode_stream(command: Sequence[str], chunks: Iterable[bytes]):
+    """Run ffmpeg on a stream of chunks, writing them from a thread while reading its output."""
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    feed_error = []
+    stderr = []
+
+    def feed():
+        try:
+            for chunk in chunks:
+                process.stdin.write(chunk)
+        except BrokenPipeError:
+            pass
+        except Exception as e:
+            # Failure of the source, e.g. a dropped connection; re-raised below
+            feed_error.append(e)
+        finally:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    feeder = threading.Thread(target=feed, name="audio-feed", daemon=True)
+    reader = threading.Thread(target=lambda: stderr.append(process.stderr.read()), name="audio-stderr", daemon=True)
+    feeder.start()
+    reader.start()
+    output = process.stdout.read()
+    feeder.join()
+    reader.join()
+    process.wait()
+    if feed_error:
+        raise feed_error[0]
+    return process.returncode, output, stderr[0] if stderr else b""
+
+
+def to_wav_bytes(samples: np.ndarray, sample_rate: int = SAMPLE_RATE) -> bytes:
+    """Encode float32 samples of shape (frames, channels) as a 16-bit WAV file in memory."""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(samples.shape[1])
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def read_wav(path: str) -> np.ndarray:
+    """Read a 16-bit WAV file written from to_wav_bytes back to float32 samples."""
+    with wave.open(path, "rb") as wav:
+        channels = wav.getnchannels()
+        pcm = np.frombuffer(wav.readframes(wav.getnframes()), dtype="<i2")
+    return (pcm.astype(np.float32) / 32768.0).reshape(-1, channels)
+
+
+def speech_duration(samples: np.ndarray, sample_rate: int = SAMPLE_RATE) -> float:
+    """Return the seconds until the last non-silent sample, ignoring trailing silence."""
+    loud = np.flatnonzero(np.abs(samples).max(axis=1) > SILENCE_LEVEL) if len(samples) else []
+    return float(loud[-1] + 1) / sample_rate if len(loud) else 0.0
+
+
+def time_stretch(samples: np.ndarray, speed: float, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Change the tempo of audio without changing its pitch.
+
+    Args:
+        samples: float32 array of shape (frames, channels)
+        speed: Tempo factor, e.g. 1.05 plays 5% faster (0.5 to 2.0)
+        sample_rate: Sample rate of the samples
+
+    Returns:
+        The stretched samples
+    """
+    channels = samples.shape[1]
+    command = [
+        get_setting("FFMPEG_BINARY"), "-hide_banner", "-loglevel", "error",
+        "-f", "f32le", "-ar", str(sample_rate), "-ac", str(channels), "-i", "pipe:0",
+        "-filter:a", f"atempo={speed:.4f}",
+        "-f", "f32le", "-acodec", "pcm_f32le", "pipe:1"
+    ]
+    result = subprocess.run(
+        command,
+        input=np.ascontiguousarray(samples, dtype="<f4").tobytes(),
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    if result.returncode != 0:
+        raise Exception(f"ffmpeg time stretch failed: {result.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(result.stdout, dtype=np.float32).reshape(-1, channels)
+
+
+def fit_to_length(samples: np.ndarray, frames: int, loop: bool = False) -> np.ndarray:
+    """
+    Trim or pad samples to exactly the given number of frames.
+
+    Args:
+        samples: Array of shape (frames, channels)
+        frames: Target number of frames
+        loop: Repeat the samples instead of padding with silence
+
+    Returns:
+        Array of shape (frames, channels)
+    """
+    if len(samples) >= frames:
+        return samples[:frames]
+    if loop and len(samples):
+        repetitions = -(-frames // len(samples))
+        return np.tile(samples, (repetitions, 1))[:frames]
+    padded = np.zeros((frames, samples.shape[1]), dtype=samples.dtype)
+    padded[:len(samples)] = samples
+    return padded
+
+
+def envelope(samples: np.ndarray, sample_rate: int = SAMPLE_RATE, window_seconds: float = 0.05) -> np.ndarray:
+    """Return the moving RMS level of the samples, one value per frame."""
+    power = np.square(samples).mean(axis=1, dtype=np.float64)
+    window = max(1, int(sample_rate * window_seconds))
+    cumulative = np.concatenate(([0.0], np.cumsum(power)))
+    # Centered moving average of the power
+    start = np.clip(np.arange(len(power)) - window // 2, 0, len(power))
+    end = np.clip(start + window, 0, len(power))
+    return np.sqrt((cumulative[end] - cumulative[start]) / np.maximum(end - start, 1)).astype(np.float32)
+
+
+def duck(music: np.ndarray, voice: np.ndarray, amount_db: float, threshold: float = 0.02,
+         sample_rate: int = SAMPLE_RATE, release_seconds: float = 0.3) -> np.ndarray:
+    """
+    Lower the music while the voice is above a threshold.
+
+    Args:
+        music: Music samples of shape (frames, channels)
+        voice: Voice samples with the same shape as music
+        amount_db: Attenuation applied to the music under speech, in dB
+        threshold: RMS level above which the voice counts as speaking
+        sample_rate: Sample rate of the samples
+        release_seconds: Length of the gain ramps around speech
+
+    Returns:
+        The ducked music samples
+    """
+    if amount_db <= 0:
+        return music
+    speaking = (envelope(voice, sample_rate) > threshold).astype(np.float32)
+    # Smooth the on/off gate into ramps so the music does not jump in level
+    ramp = max(1, int(sample_rate * release_seconds))
+    kernel = np.ones(ramp, dtype=np.float32) / ramp
+    gate = np.clip(np.convolve(speaking, kernel, mode="same") * 2, 0.0, 1.0)
+    attenuation = 10 ** (-amount_db / 20)
+    gain = 1.0 - gate * (1.0 - attenuation)
+    return music * gain[:, None]
+
+
+def limit(samples: np.ndarray, peak: float = PEAK_LIMIT) -> np.ndarray:
+    """Scale the samples down if their peak exceeds the limit, so the mix never clips."""
+    current_peak = float(np.max(np.abs(samples))) if samples.size else 0.0
+    if current_peak > peak:
+        logger.info(f"Limiting mix peak from {current_peak:.2f} to {peak:.2f}")
+        samples = samples * (peak / current_peak)
+    return samples
+
+
+def mix_voice_and_music(voice: np.ndarray, duration: float, music: Optional[np.ndarray] = None,
+                        music_volume: float = 0.3, ducking_db: float = MUSIC_DUCKING_DB,
+                        max_stretch: float = 0.0, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Mix narration with optional looped background music.
+
+    Narration that is longer than the mix is sped up by at most max_stretch
+    to fit, and trimmed if it still does not.
+
+    Args:
+        voice: Voice samples of shape (frames, channels)
+        duration: Length of the mix in seconds (the video duration)
+        music: Optional music samples, looped or trimmed to the duration
+        music_volume: Gain applied to the music (0.0 to 1.0)
+        ducking_db: Extra music attenuation while the voice is speaking, in dB
+        max_stretch: Maximum relative speed-up of the voice (0.1 = 10% faster)
+        sample_rate: Sample rate of the samples
+
+    Returns:
+        float32 array of shape (frames, channels) with the final soundtrack
+    """
+    frames = int(round(duration * sample_rate))
+    speech = speech_duration(voice, sample_rate)
+    if speech > duration and max_stretch > 0:
+        speed = min(speech / duration, 1.0 + max_stretch)
+        logger.info(f"Speeding up narration by {speed - 1.0:.1%} to fit the video")
+        voice = time_stretch(voice, speed, sample_rate)
+    if speech_duration(voice, sample_rate) > duration:
+        logger.warning("Voice narration duration exceeds video duration. Trimming audio.")
+    mix = fit_to_length(voice, frames).astype(np.float32, copy=True)
+
+    if music is not None:
+        music = fit_to_length(music, frames, loop=True) * np.float32(music_volume)
+        music = duck(music, mix, ducking_db, sample_rate=sample_rate)
+        mix += music
+
+    return limit(mix).astype(np.float32, copy=False)
+
+
+def encode_audio(samples: np.ndarray, output_path: str, sample_rate: int = SAMPLE_RATE,
+                 codec: str = "aac", bitrate: str = "192k") -> str:
+    """
+    Encode PCM samples to an audio file.
+
+    Args:
+        samples: float32 array of shape (frames, channels)
+        output_path: Path for the encoded file
+        sample_rate: Sample rate of the samples
+        codec: ffmpeg audio codec
+        bitrate: Target audio bitrate
+
+    Returns:
+        Path to the encoded file
+    """
+    command = [
+        get_setting("FFMPEG_BINARY"), "-y", "-hide_banner", "-loglevel", "error",
+        "-f", "f32le", "-ar", str(sample_rate), "-ac", str(samples.shape[1]), "-i", "pipe:0",
+        "-c:a", codec, "-b:a", bitrate,
+        output_path
+    ]
+    result = subprocess.run(command, input=np.ascontiguousarray(samples, dtype=np.float32).tobytes(),
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise Exception(f"ffmpeg audio encode failed: {result.stderr.decode(errors='replace').strip()}")
+    return output_path
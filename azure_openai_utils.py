@@ -5,14 +5,28 @@ This module handles all interactions with Azure OpenAI services.
 
 import os
 import json
+import hashlib
 import time
 import logging
-from typing import Dict, Any, Optional
+import asyncio
+import threading
+from dataclasses import dataclass
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Any, Iterator, List, Optional, Tuple
+import httpx
 import requests
-from openai import AzureOpenAI
+from requests.adapters import HTTPAdapter
+from openai import AzureOpenAI, AsyncAzureOpenAI, BadRequestError
 from dotenv import load_dotenv
 import uuid
 
+from prompt_assets import GUIDE_MODE, get_prompt_assets
+from rate_limiter import estimate_tokens, get_governor, retry_after_seconds
+from retry import TRANSIENT_STATUS_CODES, is_transient_error
+from result_cache import ResultCache, create_result_cache, make_cache_key
+from telemetry import get_telemetry
+from job_tracker import SoraJobTracker, TERMINAL_STATUSES, POLL_INITIAL_INTERVAL, next_poll_interval, with_jitter
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -20,12 +34,199 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
-class AzureOpenAIClient:
-    """Client for interacting with Azure OpenAI services."""
+# Connection pool configuration shared by the sync and async clients
+MAX_CONNECTIONS = int(os.getenv("AZURE_OPENAI_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("AZURE_OPENAI_MAX_KEEPALIVE_CONNECTIONS", "10"))
+HTTP_TIMEOUT = float(os.getenv("AZURE_OPENAI_HTTP_TIMEOUT", "120"))
+
+# Video download configuration
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("VIDEO_DOWNLOAD_CHUNK_SIZE", str(1024 * 1024)))
+DOWNLOAD_MAX_RETRIES = int(os.getenv("VIDEO_DOWNLOAD_MAX_RETRIES", "3"))
+
+# Size of the chunks streamed speech is delivered in (about 0.1s of 24 kHz 16-bit PCM)
+TTS_STREAM_CHUNK_SIZE = int(os.getenv("TTS_STREAM_CHUNK_SIZE", "4800"))
+
+NARRATIVE_SYSTEM_MESSAGE = """
+            You are an expert video script writer. Create a compelling script for voice over video for a 15-second teaser video based on the user's prompt.
+            Your narrative should:
+            1. Be concise and impactful (approximately 35 words)
+            2. Have a clear beginning, middle, and end
+            3. Use vivid, descriptive language that can be visually represented
+            4. Have a natural flow for narration
+            5. Be optimized for less than 15-second duration
+            
+            Respond with just the narrative text, without any additional commentary.
+            """
+
+TTS_INSTRUCTIONS_SYSTEM_MESSAGE = """
+            You are an expert voice coach. Create instructions for text-to-speech delivery based on the provided narrative.
+            Your instructions should:
+            1. Suggest the appropriate tone and emotion for the narration
+            2. Indicate where emphasis should be placed
+            3. Note where pauses would enhance the delivery
+            4. Recommend voice modulation for different parts of the narrative
+            5. Be clear and specific to enhance the audio quality
+            
+            Respond with just the TTS instructions, without any additional commentary.
+            """
+
+NARRATIVE_BUNDLE_SYSTEM_MESSAGE = """
+            You are an expert video script writer and voice coach. Create a compelling script for voice over video for a 15-second teaser video based on the user's prompt, together with instructions for its text-to-speech delivery.
+            The narrative should:
+            1. Be concise and impactful (approximately 35 words)
+            2. Have a clear beginning, middle, and end
+            3. Use vivid, descriptive language that can be visually represented
+            4. Have a natural flow for narration
+            5. Be optimized for less than 15-second duration
+            The delivery instructions should suggest the tone and emotion, where to place emphasis and pauses, and how to modulate the voice for different parts of the narrative.
+            
+            Respond with a JSON object with the fields "narrative" and "tts_instructions"{sora_field}.
+            """
+
+SORA_PROMPT_FIELD_MESSAGE = """
+            The "sora_prompt" field holds the instructions for generating the video of the narrative:
+            """
+
+# Ready-made delivery instructions that skip the instruction generation call
+TTS_STYLE_PRESETS = {
+    "neutral": "Speak clearly at a natural, even pace with a friendly and neutral tone.",
+    "trailer": "Deliver like a cinematic movie trailer: deep, dramatic and measured, with short pauses between phrases and strong emphasis on the final line.",
+    "documentary": "Narrate like a nature documentary: calm, warm and curious, at an unhurried pace with gentle emphasis on vivid details.",
+    "energetic": "Speak with high energy and excitement at a brisk pace, emphasizing action words and ending on an upbeat note.",
+    "calm": "Speak softly and soothingly at a slow pace, with relaxed pauses and minimal emphasis."
+}
+
+
+@dataclass
+class NarrativeBundle:
+    """Narrative with its delivery instructions and, optionally, the Sora prompt, from a single call."""
+    narrative: str
+    tts_instructions: str
+    sora_prompt: Optional[str] = None
+
+
+def narrative_bundle_schema(include_sora_prompt: bool = False) -> Dict[str, Any]:
+    """Return the structured-output response format of a narrative bundle."""
+    fields = ["narrative", "tts_instructions"] + (["sora_prompt"] if include_sora_prompt else [])
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "narrative_bundle",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {field: {"type": "string"} for field in fields},
+                "required": fields,
+                "additionalProperties": False
+            }
+        }
+    }
+
+
+def parse_narrative_bundle(content: str) -> NarrativeBundle:
+    """Parse the JSON content of a narrative bundle response."""
+    data = json.loads(content)
+    sora_prompt = data.get("sora_prompt")
+    return NarrativeBundle(
+        narrative=data["narrative"].strip(),
+        tts_instructions=data["tts_instructions"].strip(),
+        sora_prompt=sora_prompt.replace('\n', ' ').strip() if sora_prompt else None
+    )
+
+
+def tts_style_instructions(style: str) -> str:
+    """Return the delivery instructions of a TTS style preset."""
+    if style not in TTS_STYLE_PRESETS:
+        raise ValueError(f"Unknown TTS style: {style}. Available styles: {', '.join(TTS_STYLE_PRESETS)}")
+    return TTS_STYLE_PRESETS[style]
+
+
+def create_http_session(max_connections: int = MAX_CONNECTIONS) -> requests.Session:
+    """
+    Create a requests session backed by a keep-alive connection pool.
+    
+    Args:
+        max_connections: Maximum number of pooled connections per host
+        
+    Returns:
+        A configured requests.Session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def create_httpx_limits(max_connections: int = MAX_CONNECTIONS,
+                        max_keepalive_connections: int = MAX_KEEPALIVE_CONNECTIONS) -> httpx.Limits:
+    """Build the httpx connection limits used by the pooled HTTP clients."""
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=min(max_keepalive_connections, max_connections)
+    )
+
+
+def raise_for_throttling(response):
+    """Raise an HTTP error for 429 and transient 5xx responses so the rate limiter can retry them; return other responses."""
+    if response.status_code in TRANSIENT_STATUS_CODES:
+        response.raise_for_status()
+    return response
+
+
+def raise_for_throttling_stream(response: requests.Response) -> requests.Response:
+    """raise_for_throttling for a response opened with stream=True; its connection is returned to the pool first."""
+    if response.status_code in TRANSIENT_STATUS_CODES:
+        response.close()
+        response.raise_for_status()
+    return response
+
+
+def job_creation_error(error: Exception) -> Exception:
+    """
+    Return the error to raise for a failed Sora job creation.
+
+    Creating a job is not idempotent: after a timeout, a dropped connection or
+    a 5xx response the job may exist anyway, and repeating the request would
+    pay for a second one. Such errors are turned into one that is not
+    retried; 429 responses (nothing was created) and other errors are kept.
+    """
+    if is_transient_error(error) and retry_after_seconds(error) is None:
+        return Exception(f"Sora job creation failed and may have created a job anyway, not retrying: {str(error)}")
+    return error
+
+
+def verify_download(part_path: str, expected_size: Optional[int], expected_sha256: Optional[str],
+                    chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> int:
+    """
+    Check a downloaded ".part" file against its expected size and checksum.
+
+    A file that fails the check is deleted, so the next attempt starts over.
+
+    Returns:
+        Size of the file in bytes
+    """
+    downloaded_size = os.path.getsize(part_path)
+    if expected_size is not None and downloaded_size != expected_size:
+        os.unlink(part_path)
+        raise Exception(f"Video download incomplete: got {downloaded_size} of {expected_size} bytes")
+
+    if expected_sha256:
+        digest = hashlib.sha256()
+        with open(part_path, "rb") as f:
+            for block in iter(lambda: f.read(chunk_size), b""):
+                digest.update(block)
+        if digest.hexdigest() != expected_sha256.lower():
+            os.unlink(part_path)
+            raise Exception("Video download checksum mismatch")
+    return downloaded_size
+
+
+class _AzureOpenAIBase:
+    """Configuration and request construction shared by the sync and async clients."""
     
-    def __init__(self):
-        """Initialize the Azure OpenAI client with configuration from environment variables."""
-        # Load configuration from environment variables
+    def _load_config(self):
+        """Load and validate the configuration from environment variables."""
         # Load main Azure OpenAI configuration
         self.api_key = os.getenv("AZURE_OPENAI_KEY")
         self.api_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
@@ -48,18 +249,199 @@ class AzureOpenAIClient:
             logger.error("Missing required Azure OpenAI configuration (including TTS-specific variables). Please check your .env file.")
             raise ValueError("Missing required Azure OpenAI configuration (including TTS-specific variables)")
         
+        # Client-side quota enforcement, shared by all clients of the same deployment
+        self.gpt_governor = get_governor("gpt", self.gpt_deployment_name)
+        self.tts_governor = get_governor("tts", self.tts_deployment_name)
+        self.sora_governor = get_governor("sora", self.sora_deployment_name)
+    
+    def _chat_cache_key(self, system_message: str, user_message: str, max_tokens: int, temperature: float,
+                        response_format: Optional[Dict[str, Any]] = None) -> str:
+        parts = {}
+        if response_format is not None:
+            parts["response_format"] = response_format
+        return make_cache_key(
+            deployment=self.gpt_deployment_name,
+            system=system_message,
+            user=user_message,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **parts
+        )
+    
+    @staticmethod
+    def _record_usage(kind: str, response: Any):
+        """Record the tokens a chat completion used, as reported by the service."""
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        telemetry = get_telemetry()
+        telemetry.increment("chat_tokens", usage.prompt_tokens or 0, kind=kind, type="prompt")
+        telemetry.increment("chat_tokens", usage.completion_tokens or 0, kind=kind, type="completion")
+    
+    def _narrative_bundle_request(self, prompt: str, include_sora_prompt: bool,
+                                  guide_mode: Optional[str] = None) -> Tuple[str, int]:
+        """Build the system message and token budget of a narrative bundle request."""
+        system_message = NARRATIVE_BUNDLE_SYSTEM_MESSAGE.format(sora_field=' and "sora_prompt"' if include_sora_prompt else "")
+        max_tokens = 800
+        if include_sora_prompt:
+            # The video guide is selected by the prompt, as the narrative does not exist yet
+            system_message += SORA_PROMPT_FIELD_MESSAGE + self._sora_system_message(prompt, guide_mode)
+            max_tokens += 2000
+        return system_message, max_tokens
+    
+    def _resolve_tts_instructions(self, instructions: Optional[str], style: Optional[str]) -> Optional[str]:
+        """Return explicit or preset instructions, or None if they have to be generated."""
+        if instructions:
+            return instructions
+        if style:
+            return tts_style_instructions(style)
+        return None
+    
+    def _tts_cache_key(self, data: Dict[str, Any]) -> str:
+        return make_cache_key(deployment=self.tts_deployment_name, request=data)
+    
+    def _sora_system_message(self, narrative: str, guide_mode: Optional[str] = None) -> str:
+        return get_prompt_assets().sora_system_message(narrative, mode=guide_mode or GUIDE_MODE)
+    
+    def _tts_request(self, text: str, instructions: str, voice: str, output_format: str) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+        """Build the URL, headers and body of a TTS request."""
+        tts_url = f"{self.tts_endpoint}/openai/deployments/{self.tts_deployment_name}/audio/speech?api-version=2025-03-01-preview"
+        
+        headers = {
+            "api-key": self.tts_api_key,
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.tts_api_key}"
+        }
+        
+        data = {
+            "model": "gpt-4o-mini-tts",
+            "input": text,
+            "instructions": instructions,
+            "voice": voice,
+            "response_format": output_format
+        }
+        return tts_url, headers, data
+    
+    def _sora_headers(self) -> Dict[str, str]:
+        return {
+            "Api-key": self.api_key,
+            "Content-Type": "application/json"
+        }
+    
+    def _video_job_body(self, instructions: str, duration_seconds: int, width: int, height: int,
+                        n_variants: int = 1) -> Dict[str, Any]:
+        return {
+            "prompt": instructions,
+            "width": width,
+            "height": height,
+            "n_seconds": duration_seconds,
+            "n_variants": n_variants,
+            "type": "video_gen",
+            "model": "sora"
+        }
+    
+    def _video_jobs_url(self) -> str:
+        return f"{self.api_endpoint}/openai/v1/video/generations/jobs?api-version=preview"
+    
+    def _video_job_status_url(self, job_id: str) -> str:
+        return f"{self.api_endpoint}/openai/v1/video/generations/jobs/{job_id}?api-version=preview"
+    
+    def _video_content_url(self, generation_id: str) -> str:
+        return f"{self.api_endpoint}/openai/v1/video/generations/{generation_id}/content/video?api-version=preview"
+    
+    @staticmethod
+    def _new_video_path(output_path: str) -> str:
+        # Generate a random filename with .mp4 extension
+        filename = f"{uuid.uuid4()}.mp4"
+        # Ensure output directory exists
+        os.makedirs(output_path, exist_ok=True)
+        # Combine directory and filename
+        return os.path.join(output_path, filename)
+
+
+class AzureOpenAIClient(_AzureOpenAIBase):
+    """Client for interacting with Azure OpenAI services."""
+    
+    def __init__(self, max_connections: int = MAX_CONNECTIONS, cache: Optional[ResultCache] = None):
+        """
+        Initialize the Azure OpenAI client with configuration from environment variables.
+        
+        Args:
+            max_connections: Maximum number of pooled connections per endpoint
+            cache: Result cache for model outputs (defaults to the one configured by the environment)
+        """
+        self._load_config()
+        self.cache = cache if cache is not None else create_result_cache()
+        
+        # One keep-alive pool per endpoint, since the TTS resource can live elsewhere
+        self.session = create_http_session(max_connections)
+        self.tts_session = create_http_session(max_connections)
+        
+        # Sora jobs are polled by one shared tracker thread, created on first use
+        self._job_tracker = None
+        self._tracker_lock = threading.Lock()
+        self._download_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="sora-download")
+        
         # Initialize Azure OpenAI client
         try:
             self.client = AzureOpenAI(
                 api_key=self.api_key,
                 api_version=self.api_version,
-                azure_endpoint=self.api_endpoint
+                azure_endpoint=self.api_endpoint,
+                http_client=httpx.Client(limits=create_httpx_limits(max_connections), timeout=HTTP_TIMEOUT),
+                # Retried by the deployment governor instead: 429s after Retry-After,
+                # connection errors, timeouts and 5xx with backoff
+                max_retries=0
             )
             logger.info("Azure OpenAI client initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize Azure OpenAI client: {str(e)}")
             raise
     
+    def close(self):
+        """Stop the job tracker and close the pooled HTTP connections."""
+        if self._job_tracker is not None:
+            self._job_tracker.stop()
+        self._download_executor.shutdown(wait=False)
+        self.session.close()
+        self.tts_session.close()
+        self.client.close()
+    
+    def _chat(self, kind: str, system_message: str, user_message: str, max_tokens: int, temperature: float,
+              response_format: Optional[Dict[str, Any]] = None, fresh: bool = False) -> str:
+        """
+        Run a chat completion, answering from the result cache when possible.
+        
+        With fresh, the cache is not consulted (the new answer still replaces
+        the cached one), so a sampled call such as the narrative can be rerun.
+        """
+        cache_key = self._chat_cache_key(system_message, user_message, max_tokens, temperature, response_format)
+        cached = None if fresh else self.cache.get_text(cache_key, kind)
+        get_telemetry().increment("chat_requests", kind=kind, cached=cached is not None)
+        if cached is not None:
+            return cached
+        
+        # Call Azure OpenAI API within the deployment's quota
+        with get_telemetry().span("chat", labels={"kind": kind}):
+            response = self.gpt_governor.call(
+                lambda: self.client.chat.completions.create(
+                    model=self.gpt_deployment_name,
+                    messages=[
+                        {"role": "system", "content": system_message},
+                        {"role": "user", "content": user_message}
+                    ],
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    **({"response_format": response_format} if response_format else {})
+                ),
+                tokens=estimate_tokens(system_message + user_message, max_tokens)
+            )
+        
+        self._record_usage(kind, response)
+        content = response.choices[0].message.content.strip()
+        self.cache.put_text(cache_key, content, kind)
+        return content
+    
     def generate_narrative(self, prompt: str, max_tokens: int = 500) -> str:
         """
         Generate a narrative for a video based on the user prompt using GPT-4.1.
@@ -72,31 +454,7 @@ class AzureOpenAIClient:
             Generated narrative text
         """
         try:
-            # Create system message for narrative generation
-            system_message = """
-            You are an expert video script writer. Create a compelling script for voice over video for a 15-second teaser video based on the user's prompt.
-            Your narrative should:
-            1. Be concise and impactful (approximately 35 words)
-            2. Have a clear beginning, middle, and end
-            3. Use vivid, descriptive language that can be visually represented
-            4. Have a natural flow for narration
-            5. Be optimized for less than 15-second duration
-            
-            Respond with just the narrative text, without any additional commentary.
-            """
-            
-            # Call Azure OpenAI API
-            response = self.client.chat.completions.create(
-                model=self.gpt_deployment_name,
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=max_tokens,
-                temperature=0.7
-            )
-            
-            narrative = response.choices[0].message.content.strip()
+            narrative = self._chat("narrative", NARRATIVE_SYSTEM_MESSAGE, prompt, max_tokens, 0.7)
             logger.info(f"Successfully generated narrative of {len(narrative.split())} words")
             return narrative
         
@@ -104,6 +462,42 @@ class AzureOpenAIClient:
             logger.error(f"Error generating narrative: {str(e)}")
             raise
     
+    def generate_narrative_bundle(self, prompt: str, include_sora_prompt: bool = False,
+                                  guide_mode: Optional[str] = None, fresh: bool = False) -> NarrativeBundle:
+        """
+        Generate the narrative and its TTS delivery instructions in a single structured-output call.
+        
+        This replaces the separate generate_tts_instructions call and, with
+        include_sora_prompt, the generate_sora_instructions call as well.
+        
+        Args:
+            prompt: User prompt describing the desired video
+            include_sora_prompt: Also generate the Sora video instructions
+            guide_mode: Guide mode used for the Sora instructions (defaults to SORA_GUIDE_MODE)
+            fresh: Write a new narrative instead of reusing a cached one for the same prompt
+            
+        Returns:
+            NarrativeBundle with the narrative, TTS instructions and optional Sora prompt
+        """
+        try:
+            system_message, max_tokens = self._narrative_bundle_request(prompt, include_sora_prompt, guide_mode)
+            try:
+                content = self._chat("narrative_bundle", system_message, prompt, max_tokens, 0.7,
+                                     narrative_bundle_schema(include_sora_prompt), fresh=fresh)
+            except BadRequestError:
+                # API versions before structured outputs only support JSON mode
+                logger.warning("Structured outputs not supported, falling back to JSON mode")
+                content = self._chat("narrative_bundle", system_message, prompt, max_tokens, 0.7, {"type": "json_object"},
+                                     fresh=fresh)
+            
+            bundle = parse_narrative_bundle(content)
+            logger.info(f"Successfully generated narrative bundle ({len(bundle.narrative.split())} word narrative)")
+            return bundle
+        
+        except Exception as e:
+            logger.error(f"Error generating narrative bundle: {str(e)}")
+            raise
+    
     def generate_tts_instructions(self, narrative: str, max_tokens: int = 300) -> str:
         """
         Generate instructions for text-to-speech delivery based on the narrative.
@@ -116,31 +510,7 @@ class AzureOpenAIClient:
             Instructions for TTS delivery including tone, emphasis, and pacing
         """
         try:
-            # Create system message for TTS instruction generation
-            system_message = """
-            You are an expert voice coach. Create instructions for text-to-speech delivery based on the provided narrative.
-            Your instructions should:
-            1. Suggest the appropriate tone and emotion for the narration
-            2. Indicate where emphasis should be placed
-            3. Note where pauses would enhance the delivery
-            4. Recommend voice modulation for different parts of the narrative
-            5. Be clear and specific to enhance the audio quality
-            
-            Respond with just the TTS instructions, without any additional commentary.
-            """
-            
-            # Call Azure OpenAI API
-            response = self.client.chat.completions.create(
-                model=self.gpt_deployment_name,
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": narrative}
-                ],
-                max_tokens=max_tokens,
-                temperature=0.6
-            )
-            
-            instructions = response.choices[0].message.content.strip()
+            instructions = self._chat("tts_instructions", TTS_INSTRUCTIONS_SYSTEM_MESSAGE, narrative, max_tokens, 0.6)
             logger.info(f"Successfully generated TTS instructions ({len(instructions.split())} words)")
             return instructions
         
@@ -148,41 +518,45 @@ class AzureOpenAIClient:
             logger.error(f"Error generating TTS instructions: {str(e)}")
             raise
 
-    def generate_tts(self, text: str, voice: str = "alloy", output_format: str = "mp3") -> bytes:
+    def generate_tts(self, text: str, voice: str = "alloy", output_format: str = "mp3",
+                     instructions: Optional[str] = None, style: Optional[str] = None) -> bytes:
         """
         Generate high-quality text-to-speech audio using Azure OpenAI TTS HD.
         
+        Delivery instructions are only generated with an extra chat call when
+        neither instructions nor a style preset are given.
+        
         Args:
             text: The narrative text to convert to speech
             voice: The voice to use for TTS (e.g., "alloy", "echo", "fable", "onyx", "nova", "shimmer")
             output_format: The output format of the audio file
+            instructions: Precomputed delivery instructions, e.g. from generate_narrative_bundle
+            style: Name of a TTS_STYLE_PRESETS entry, used when no instructions are given
             
         Returns:
             Audio data as bytes
         """
         try:
-            # Construct the API request to TTS endpoint
-            tts_url = f"{self.tts_endpoint}/openai/deployments/{self.tts_deployment_name}/audio/speech?api-version=2025-03-01-preview"
+            instructions = self._resolve_tts_instructions(instructions, style) or self.generate_tts_instructions(text)
             
-            headers = {
-                "api-key": self.tts_api_key,
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.tts_api_key}"
-            }
+            # Construct the API request to TTS endpoint
+            tts_url, headers, data = self._tts_request(text, instructions, voice, output_format)
             
-            data = {
-                "model": "gpt-4o-mini-tts",
-                "input": text,
-                "instructions": self.generate_tts_instructions(text),
-                "voice": voice,
-                "response_format": output_format
-            }
+            cache_key = self._tts_cache_key(data)
+            cached = self.cache.get(cache_key, "tts_audio")
+            if cached is not None:
+                return cached
             
-            # Make the API request
-            response = requests.post(tts_url, headers=headers, json=data)
+            # Make the API request over the pooled TTS connection
+            with get_telemetry().span("tts"):
+                response = self.tts_governor.call(
+                    lambda: raise_for_throttling(self.tts_session.post(tts_url, headers=headers, json=data, timeout=HTTP_TIMEOUT))
+                )
             
             if response.status_code == 200:
                 logger.info(f"Successfully generated TTS audio ({len(response.content)} bytes)")
+                get_telemetry().increment("tts_bytes", len(response.content))
+                self.cache.put(cache_key, response.content, "tts_audio")
                 return response.content
             else:
                 logger.error(f"TTS generation failed with status {response.status_code}: {response.text}")
@@ -192,39 +566,75 @@ class AzureOpenAIClient:
             logger.error(f"Error generating TTS: {str(e)}")
             raise
     
-    def generate_sora_instructions(self, narrative: str) -> str:
+    def stream_tts(self, text: str, voice: str = "alloy", output_format: str = "pcm",
+                   instructions: Optional[str] = None, style: Optional[str] = None) -> Iterator[bytes]:
+        """
+        Stream text-to-speech audio as it is synthesized.
+        
+        The request is only sent when iteration starts. Chunks are yielded as
+        they arrive, so playback or decoding (see audio_mixer.decode_audio) can
+        start at the first byte; the complete audio is cached once the stream ends.
+        
+        Args:
+            text: The narrative text to convert to speech
+            voice: The voice to use for TTS
+            output_format: "pcm" (24 kHz 16-bit mono, see audio_mixer.TTS_PCM_INPUT_ARGS),
+                "opus" or any other format supported by the speech endpoint
+            instructions: Precomputed delivery instructions
+            style: Name of a TTS_STYLE_PRESETS entry, used when no instructions are given
+            
+        Yields:
+            Chunks of audio data
+        """
+        instructions = self._resolve_tts_instructions(instructions, style) or self.generate_tts_instructions(text)
+        tts_url, headers, data = self._tts_request(text, instructions, voice, output_format)
+        
+        cache_key = self._tts_cache_key(data)
+        cached = self.cache.get(cache_key, "tts_audio")
+        if cached is not None:
+            yield cached
+            return
+        
+        telemetry = get_telemetry()
+        start = time.perf_counter()
+        response = self.tts_governor.call(
+            lambda: raise_for_throttling_stream(self.tts_session.post(tts_url, headers=headers, json=data, timeout=HTTP_TIMEOUT, stream=True))
+        )
+        with response:
+            if response.status_code != 200:
+                logger.error(f"TTS generation failed with status {response.status_code}: {response.text}")
+                raise Exception(f"TTS generation failed: {response.text}")
+            
+            chunks = []
+            for chunk in response.iter_content(chunk_size=TTS_STREAM_CHUNK_SIZE):
+                if not chunks:
+                    telemetry.observe("tts_first_byte_seconds", time.perf_counter() - start)
+                chunks.append(chunk)
+                yield chunk
+        
+        audio = b"".join(chunks)
+        telemetry.observe("tts_stream_seconds", time.perf_counter() - start)
+        telemetry.increment("tts_bytes", len(audio))
+        logger.info(f"Successfully streamed TTS audio ({len(audio)} bytes)")
+        self.cache.put(cache_key, audio, "tts_audio")
+    
+    def generate_sora_instructions(self, narrative: str, guide_mode: Optional[str] = None) -> str:
         """
         Generate detailed instructions for Sora video generation from the narrative.
         
         Args:
             narrative: The narrative text for the video
+            guide_mode: "full" to send the whole video generation guide, "condensed" to
+                send only the sections relevant to the narrative (defaults to SORA_GUIDE_MODE)
             
         Returns:
             Detailed instructions for Sora
         """
         try:
             # Create system message for Sora instruction generation
-            guide_path = os.path.join(os.path.dirname(__file__), "video_generation_guide.md")
-            with open(guide_path, "r", encoding="utf-8") as f:
-                video_guide_content = f.read()
-            system_message = f"""
-            You are an expert at creating prompts for AI video generation models like Sora. Convert the provided narrative into a detailed set of instructions for generating video. Follow these guidelines:
-            {video_guide_content}
-            answer in text and avoid markdown or any special characters. avoid new lines (\n) and maximum of 2000 words.
-            """
+            system_message = self._sora_system_message(narrative, guide_mode)
             
-            # Call Azure OpenAI API
-            response = self.client.chat.completions.create(
-                model=self.gpt_deployment_name,
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": narrative}
-                ],
-                temperature=0.1,
-                max_tokens=2000
-            )
-            
-            instructions = response.choices[0].message.content.strip()
+            instructions = self._chat("sora_instructions", system_message, narrative, 2000, 0.1)
             logger.info(f"Successfully generated Sora instructions ({len(instructions.split())} words)")
             instructions = instructions.replace('\n', ' ')
             return instructions
@@ -233,6 +643,235 @@ class AzureOpenAIClient:
             logger.error(f"Error generating Sora instructions: {str(e)}")
             raise
     
+    @property
+    def job_tracker(self) -> SoraJobTracker:
+        """Shared poller tracking all Sora jobs submitted through this client."""
+        with self._tracker_lock:
+            if self._job_tracker is None:
+                # The single poller thread must not sleep on the rate limiter; it reschedules instead
+                self._job_tracker = SoraJobTracker(lambda job_id: self.get_video_job_status(job_id, wait=False))
+            return self._job_tracker
+    
+    def create_video_job(self, instructions: str, duration_seconds: int = 20, width: int = 854, height: int = 480,
+                         n_variants: int = 1) -> str:
+        """
+        Create a Sora video generation job.
+        
+        Args:
+            instructions: Detailed instructions for video generation
+            duration_seconds: Desired video duration in seconds
+            width: Width of the video in pixels
+            height: Height of the video in pixels
+            n_variants: Number of alternative videos the job generates
+            
+        Returns:
+            Id of the created job
+        """
+        logger.info(instructions)
+        body = self._video_job_body(instructions, duration_seconds, width, height, n_variants)
+        
+        logger.info("Creating video generation job")
+        with get_telemetry().span("sora_create"):
+            try:
+                response = self.sora_governor.call(
+                    lambda: raise_for_throttling(self.session.post(self._video_jobs_url(), headers=self._sora_headers(), json=body, timeout=HTTP_TIMEOUT)),
+                    idempotent=False
+                )
+            except Exception as e:
+                error = job_creation_error(e)
+                if error is e:
+                    raise
+                raise error from e
+        response.raise_for_status()
+        
+        job_id = response.json()["id"]
+        logger.info(f"Job created: {job_id}")
+        return job_id
+    
+    def get_video_job_status(self, job_id: str, wait: bool = True) -> Dict[str, Any]:
+        """
+        Fetch the status response of a Sora job.
+        
+        Args:
+            job_id: Id of the Sora job
+            wait: Wait for the rate limit and retry failures; if False, raise
+                rate_limiter.RateLimitedError instead of waiting and do not retry
+        """
+        request = lambda: raise_for_throttling(
+            self.session.get(self._video_job_status_url(job_id), headers=self._sora_headers(), timeout=HTTP_TIMEOUT)
+        )
+        response = self.sora_governor.call(request) if wait else self.sora_governor.call_nowait(request)
+        response.raise_for_status()
+        return response.json()
+    
+    def download_generation(self, status_response: Dict[str, Any], output_path: str = "output") -> str:
+        """
+        Download the video of a finished Sora job.
+        
+        Args:
+            status_response: Final status response of the job
+            output_path: Directory where the video should be saved
+            
+        Returns:
+            Path to the downloaded video file
+        """
+        status = status_response.get("status")
+        if status != "succeeded":
+            logger.error(f"Job didn't succeed. Status: {status}")
+            raise Exception(f"Video generation failed. Status: {status}")
+        
+        generations = status_response.get("generations", [])
+        if not generations:
+            logger.error("No generations found in job result")
+            raise Exception("No generations found in job result")
+        
+        logger.info("Video generation succeeded")
+        generation_id = generations[0].get("id")
+        video_url = self._video_content_url(generation_id)
+        
+        return self.download_video(video_url, self._new_video_path(output_path))
+    
+    def download_generations(self, status_response: Dict[str, Any], output_path: str = "output") -> List[str]:
+        """
+        Download every video variant of a finished Sora job concurrently.
+        
+        Args:
+            status_response: Final status response of the job
+            output_path: Directory where the videos should be saved
+            
+        Returns:
+            Paths to the downloaded video files, in generation order
+        """
+        status = status_response.get("status")
+        if status != "succeeded":
+            logger.error(f"Job didn't succeed. Status: {status}")
+            raise Exception(f"Video generation failed. Status: {status}")
+        
+        generations = status_response.get("generations", [])
+        if not generations:
+            logger.error("No generations found in job result")
+            raise Exception("No generations found in job result")
+        
+        logger.info(f"Video generation succeeded, downloading {len(generations)} variants")
+        # A pool of its own, as this itself runs on the shared download executor
+        with ThreadPoolExecutor(max_workers=len(generations), thread_name_prefix="variant-download") as executor:
+            downloads = [
+                executor.submit(self.download_video, self._video_content_url(g.get("id")), self._new_video_path(output_path))
+                for g in generations
+            ]
+            return [download.result() for download in downloads]
+    
+    def submit_video(self, instructions: str, duration_seconds: int = 20, width: int = 854, height: int = 480,
+                     output_path: str = "output", timeout: Optional[float] = None,
+                     on_job_created: Optional[Callable[[str], None]] = None) -> Future:
+        """
+        Start generating a video without blocking the calling thread.
+        
+        The job is polled by the client's shared job tracker and the video is
+        downloaded once the job succeeds.
+        
+        Args:
+            instructions: Detailed instructions for video generation
+            duration_seconds: Desired video duration in seconds
+            width: Width of the video in pixels
+            height: Height of the video in pixels
+            output_path: Directory where the video should be saved
+            timeout: Seconds after which the job is given up
+            on_job_created: Optional callback invoked with the Sora job id as soon
+                as the job exists, e.g. to checkpoint it for attach_video_job
+            
+        Returns:
+            Future resolving with the path to the generated video file
+        """
+        # Wait for a free Sora job slot; it is held until the job finishes
+        self.sora_governor.acquire_slot()
+        try:
+            job_id = self.create_video_job(instructions, duration_seconds, width, height)
+            if on_job_created:
+                on_job_created(job_id)
+        except Exception:
+            self.sora_governor.release_slot()
+            raise
+        return self._track_video_job(job_id, output_path, timeout, self.download_generation)
+    
+    def submit_video_variants(self, instructions: str, n_variants: int, duration_seconds: int = 20, width: int = 854,
+                              height: int = 480, output_path: str = "output", timeout: Optional[float] = None,
+                              on_job_created: Optional[Callable[[str], None]] = None) -> Future:
+        """
+        Start a single Sora job that generates several alternative videos.
+        
+        One job with n variants waits in the queue once, instead of once per
+        retry when a clip comes back unusable. All variants are downloaded
+        concurrently; see video_scoring.pick_best_video to choose between them.
+        
+        Args:
+            instructions: Detailed instructions for video generation
+            n_variants: Number of alternative videos to generate
+            duration_seconds: Desired video duration in seconds
+            width: Width of the video in pixels
+            height: Height of the video in pixels
+            output_path: Directory where the videos should be saved
+            timeout: Seconds after which the job is given up
+            on_job_created: Optional callback invoked with the Sora job id as soon as the job exists
+            
+        Returns:
+            Future resolving with the paths to the generated video files
+        """
+        self.sora_governor.acquire_slot()
+        try:
+            job_id = self.create_video_job(instructions, duration_seconds, width, height, n_variants)
+            if on_job_created:
+                on_job_created(job_id)
+        except Exception:
+            self.sora_governor.release_slot()
+            raise
+        return self._track_video_job(job_id, output_path, timeout, self.download_generations)
+    
+    def attach_video_job(self, job_id: str, output_path: str = "output", timeout: Optional[float] = None,
+                         all_variants: bool = False) -> Future:
+        """
+        Resume waiting for a Sora job created earlier, e.g. by a run that crashed.
+        
+        Args:
+            job_id: Id of the existing Sora job
+            output_path: Directory where the video should be saved
+            timeout: Seconds after which the job is given up
+            all_variants: Download every variant, as submit_video_variants does
+            
+        Returns:
+            Future resolving with the path to the generated video file, or the
+            list of paths with all_variants
+        """
+        logger.info(f"Re-attaching to video job {job_id}")
+        self.sora_governor.acquire_slot()
+        download = self.download_generations if all_variants else self.download_generation
+        return self._track_video_job(job_id, output_path, timeout, download)
+    
+    def _track_video_job(self, job_id: str, output_path: str, timeout: Optional[float],
+                         download: Callable[[Dict[str, Any], str], Any]) -> Future:
+        # Expects the Sora job slot to be held; it is released once the job finishes
+        result = Future()
+        
+        def on_job_done(job_future: Future):
+            self.sora_governor.release_slot()
+            if job_future.cancelled():
+                result.cancel()
+                return
+            error = job_future.exception()
+            if error is not None:
+                result.set_exception(error)
+                return
+            download_future = self._download_executor.submit(download, job_future.result(), output_path)
+            download_future.add_done_callback(lambda f: result.set_exception(f.exception()) if f.exception() else result.set_result(f.result()))
+        
+        try:
+            self.job_tracker.track(job_id, timeout=timeout, callback=on_job_done)
+        except Exception:
+            # on_job_done never runs for a job that was not registered
+            self.sora_governor.release_slot()
+            raise
+        return result
+    
     def generate_video(self, instructions: str, duration_seconds: int = 20, width: int = 854, height: int = 480, output_path: str = "output") -> str:
         """
         Generate video using Azure OpenAI Sora model.
@@ -248,102 +887,441 @@ class AzureOpenAIClient:
             Path to the generated video file
         """
         try:
-            # 1. Create a video generation job
-            create_url = f"{self.api_endpoint}/openai/v1/video/generations/jobs?api-version=preview"
-
-            headers = {
-                "Api-key": self.api_key,
-                "Content-Type": "application/json"
-            }
-            
-            logger.info(instructions)
-
-            body = {
-                "prompt": instructions,
-                "width": width,
-                "height": height,
-                "n_seconds": duration_seconds,
-                "n_variants": 1,
-                "type": "video_gen",
-                "model": "sora"
-            }
-            
-            logger.info("Creating video generation job")
-            response = requests.post(create_url, headers=headers, json=body)
-            response.raise_for_status()
-            
-            job_id = response.json()["id"]
-            logger.info(f"Job created: {job_id}")
-            
-            # 2. Poll for job status
-            status_url = f"{self.api_endpoint}/openai/v1/video/generations/jobs/{job_id}?api-version=preview"
-            status = None
-            
-            while status not in ("succeeded", "failed", "cancelled"):
-                time.sleep(5)  # Wait before polling again
-                status_response = requests.get(status_url, headers=headers).json()
-                status = status_response.get("status")
-                logger.info(f"Job status: {status}")
-            
-            # 3. Retrieve generated video
-            if status == "succeeded":
-                generations = status_response.get("generations", [])
-                if generations:
-                    logger.info("Video generation succeeded")
-                    generation_id = generations[0].get("id")
-                    video_url = f"{self.api_endpoint}/openai/v1/video/generations/{generation_id}/content/video?api-version=preview"
-                    
-                    video_response = requests.get(video_url, headers=headers)
-                    if video_response.ok:
-                        # Generate a random filename with .mp4 extension
-                        filename = f"{uuid.uuid4()}.mp4"
-                        # Ensure output directory exists
-                        os.makedirs(output_path, exist_ok=True)
-                        # Combine directory and filename
-                        full_path = os.path.join(output_path, filename)
-                        
-                        with open(full_path, "wb") as file:
-                            file.write(video_response.content)
-                        logger.info(f'Generated video saved as "{full_path}"')
-                        return full_path
-                    else:
-                        logger.error(f"Failed to download video: {video_response.status_code}")
-                        raise Exception(f"Failed to download video: {video_response.text}")
-                else:
-                    logger.error("No generations found in job result")
-                    raise Exception("No generations found in job result")
-            else:
-                logger.error(f"Job didn't succeed. Status: {status}")
-                raise Exception(f"Video generation failed. Status: {status}")
+            return self.submit_video(instructions, duration_seconds, width, height, output_path).result()
         
         except Exception as e:
             logger.error(f"Error generating video: {str(e)}")
             raise
     
+    def download_video(self, video_url: str, output_path: str, chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+                       max_retries: int = DOWNLOAD_MAX_RETRIES, expected_sha256: Optional[str] = None) -> str:
         """
         Download the generated video from the provided URL.
         
+        The response is streamed to a temporary ".part" file in chunks, so memory
+        use does not depend on the size of the clip, and only renamed to
+        output_path once the size (and optional checksum) have been verified.
+        If the connection drops, the download resumes with a range request.
+        The ".part" file is removed if the download fails.
+        
         Args:
             video_url: URL of the generated video
             output_path: Path where the video should be saved
+            chunk_size: Number of bytes read from the response at a time
+            max_retries: Number of times an interrupted download is resumed
+            expected_sha256: Optional hex SHA-256 digest the file must match
             
         Returns:
             Path to the downloaded video file
         """
+        with get_telemetry().span("download"):
+            return self._download_video(video_url, output_path, chunk_size, max_retries, expected_sha256)
+    
+    def _download_video(self, video_url: str, output_path: str, chunk_size: int, max_retries: int,
+                        expected_sha256: Optional[str]) -> str:
+        part_path = f"{output_path}.part"
+        attempt = 0
+        received = 0
+        
+        try:
+            while True:
+                offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+                headers = self._sora_headers()
+                if offset:
+                    headers["Range"] = f"bytes={offset}-"
+            
+                try:
+                    with self.session.get(video_url, headers=headers, stream=True, timeout=HTTP_TIMEOUT) as response:
+                        if response.status_code == 206:
+                            # Content-Range: bytes <start>-<end>/<total>
+                            expected_size = int(response.headers["Content-Range"].rsplit("/", 1)[1])
+                            mode = "ab"
+                        elif response.status_code == 416 and offset:
+                            # The previous attempt already received the whole file
+                            expected_size = offset
+                            break
+                        elif response.status_code == 200:
+                            # Server ignored the range request, start from scratch
+                            content_length = response.headers.get("Content-Length")
+                            expected_size = int(content_length) if content_length else None
+                            mode = "wb"
+                        else:
+                            logger.error(f"Video download failed with status {response.status_code}")
+                            raise Exception(f"Video download failed: {response.status_code}")
+                    
+                        with open(part_path, mode) as f:
+                            for chunk in response.iter_content(chunk_size=chunk_size):
+                                f.write(chunk)
+                                received += len(chunk)
+                except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                    attempt += 1
+                    if attempt > max_retries:
+                        raise
+                    logger.warning(f"Video download interrupted ({str(e)}), resuming (attempt {attempt}/{max_retries})")
+                    time.sleep(min(2 ** attempt, 30))
+                    continue
+                break
+        
+            downloaded_size = verify_download(part_path, expected_size, expected_sha256, chunk_size)
+            os.replace(part_path, output_path)
+            logger.info(f"Successfully downloaded video to {output_path} ({downloaded_size} bytes)")
+            return output_path
+    
+        except Exception as e:
+            logger.error(f"Error downloading video: {str(e)}")
+            # Callers pick a new path for the next download, so nothing would resume from it
+            if os.path.exists(part_path):
+                os.unlink(part_path)
+            raise
+        
+        finally:
+            # Counts the bytes of interrupted attempts too
+            get_telemetry().increment("download_bytes", received)
+
+
+class AsyncAzureOpenAIClient(_AzureOpenAIBase):
+    """
+    Asynchronous client for interacting with Azure OpenAI services.
+    
+    All calls share keep-alive connection pools (one for the main endpoint and
+    one for the TTS endpoint), so many jobs can run in a single event loop
+    without holding a thread per request.
+    """
+    
+    def __init__(self, max_connections: int = MAX_CONNECTIONS,
+                 max_keepalive_connections: int = MAX_KEEPALIVE_CONNECTIONS,
+                 poll_interval: float = POLL_INITIAL_INTERVAL,
+                 cache: Optional[ResultCache] = None):
+        """
+        Initialize the async client with configuration from environment variables.
+        
+        Args:
+            max_connections: Maximum number of pooled connections per endpoint
+            max_keepalive_connections: Maximum number of idle connections kept open per endpoint
+            poll_interval: Initial seconds between Sora job status checks
+            cache: Result cache for model outputs (defaults to the one configured by the environment)
+        """
+        self._load_config()
+        self.cache = cache if cache is not None else create_result_cache()
+        self.poll_interval = poll_interval
+        
+        limits = create_httpx_limits(max_connections, max_keepalive_connections)
+        self.http_client = httpx.AsyncClient(limits=limits, timeout=HTTP_TIMEOUT)
+        self.tts_http_client = httpx.AsyncClient(limits=limits, timeout=HTTP_TIMEOUT)
+        
         try:
-            response = requests.get(video_url, stream=True)
+            # Chat completions share the main endpoint pool with the Sora job calls
+            self.client = AsyncAzureOpenAI(
+                api_key=self.api_key,
+                api_version=self.api_version,
+                azure_endpoint=self.api_endpoint,
+                http_client=self.http_client,
+                # Retried by the deployment governor, as in the sync client
+                max_retries=0
+            )
+            logger.info("Async Azure OpenAI client initialized successfully")
+        except Exception as e:
+            logger.error(f"Failed to initialize async Azure OpenAI client: {str(e)}")
+            raise
+    
+    async def aclose(self):
+        """Close the pooled HTTP connections."""
+        await self.http_client.aclose()
+        await self.tts_http_client.aclose()
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+    
+    async def _chat(self, kind: str, system_message: str, user_message: str, max_tokens: int, temperature: float,
+                    response_format: Optional[Dict[str, Any]] = None, fresh: bool = False) -> str:
+        cache_key = self._chat_cache_key(system_message, user_message, max_tokens, temperature, response_format)
+        cached = None if fresh else self.cache.get_text(cache_key, kind)
+        get_telemetry().increment("chat_requests", kind=kind, cached=cached is not None)
+        if cached is not None:
+            return cached
+        
+        with get_telemetry().span("chat", labels={"kind": kind}):
+            response = await self.gpt_governor.acall(
+                lambda: self.client.chat.completions.create(
+                    model=self.gpt_deployment_name,
+                    messages=[
+                        {"role": "system", "content": system_message},
+                        {"role": "user", "content": user_message}
+                    ],
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    **({"response_format": response_format} if response_format else {})
+                ),
+                tokens=estimate_tokens(system_message + user_message, max_tokens)
+            )
+        self._record_usage(kind, response)
+        content = response.choices[0].message.content.strip()
+        self.cache.put_text(cache_key, content, kind)
+        return content
+    
+    async def generate_narrative(self, prompt: str, max_tokens: int = 500) -> str:
+        """Async version of AzureOpenAIClient.generate_narrative."""
+        try:
+            narrative = await self._chat("narrative", NARRATIVE_SYSTEM_MESSAGE, prompt, max_tokens, 0.7)
+            logger.info(f"Successfully generated narrative of {len(narrative.split())} words")
+            return narrative
+        except Exception as e:
+            logger.error(f"Error generating narrative: {str(e)}")
+            raise
+    
+    async def generate_narrative_bundle(self, prompt: str, include_sora_prompt: bool = False,
+                                        guide_mode: Optional[str] = None, fresh: bool = False) -> NarrativeBundle:
+        """Async version of AzureOpenAIClient.generate_narrative_bundle."""
+        try:
+            system_message, max_tokens = self._narrative_bundle_request(prompt, include_sora_prompt, guide_mode)
+            try:
+                content = await self._chat("narrative_bundle", system_message, prompt, max_tokens, 0.7,
+                                           narrative_bundle_schema(include_sora_prompt), fresh=fresh)
+            except BadRequestError:
+                logger.warning("Structured outputs not supported, falling back to JSON mode")
+                content = await self._chat("narrative_bundle", system_message, prompt, max_tokens, 0.7,
+                                           {"type": "json_object"}, fresh=fresh)
+            
+            bundle = parse_narrative_bundle(content)
+            logger.info(f"Successfully generated narrative bundle ({len(bundle.narrative.split())} word narrative)")
+            return bundle
+        except Exception as e:
+            logger.error(f"Error generating narrative bundle: {str(e)}")
+            raise
+    
+    async def generate_tts_instructions(self, narrative: str, max_tokens: int = 300) -> str:
+        """Async version of AzureOpenAIClient.generate_tts_instructions."""
+        try:
+            instructions = await self._chat("tts_instructions", TTS_INSTRUCTIONS_SYSTEM_MESSAGE, narrative, max_tokens, 0.6)
+            logger.info(f"Successfully generated TTS instructions ({len(instructions.split())} words)")
+            return instructions
+        except Exception as e:
+            logger.error(f"Error generating TTS instructions: {str(e)}")
+            raise
+    
+    async def generate_tts(self, text: str, voice: str = "alloy", output_format: str = "mp3",
+                           instructions: Optional[str] = None, style: Optional[str] = None) -> bytes:
+        """Async version of AzureOpenAIClient.generate_tts."""
+        try:
+            instructions = self._resolve_tts_instructions(instructions, style) or await self.generate_tts_instructions(text)
+            tts_url, headers, data = self._tts_request(text, instructions, voice, output_format)
+            
+            cache_key = self._tts_cache_key(data)
+            cached = self.cache.get(cache_key, "tts_audio")
+            if cached is not None:
+                return cached
+            
+            async def post_tts():
+                return raise_for_throttling(await self.tts_http_client.post(tts_url, headers=headers, json=data))
+            
+            response = await self.tts_governor.acall(post_tts)
             
             if response.status_code == 200:
-                with open(output_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                
-                logger.info(f"Successfully downloaded video to {output_path}")
-                return output_path
+                logger.info(f"Successfully generated TTS audio ({len(response.content)} bytes)")
+                self.cache.put(cache_key, response.content, "tts_audio")
+                return response.content
             else:
-                logger.error(f"Video download failed with status {response.status_code}")
-                raise Exception(f"Video download failed: {response.status_code}")
+                logger.error(f"TTS generation failed with status {response.status_code}: {response.text}")
+                raise Exception(f"TTS generation failed: {response.text}")
         
         except Exception as e:
-            logger.error(f"Error downloading video: {str(e)}")
+            logger.error(f"Error generating TTS: {str(e)}")
+            raise
+    
+    async def stream_tts(self, text: str, voice: str = "alloy", output_format: str = "pcm",
+                         instructions: Optional[str] = None, style: Optional[str] = None) -> AsyncIterator[bytes]:
+        """Async version of AzureOpenAIClient.stream_tts."""
+        instructions = self._resolve_tts_instructions(instructions, style) or await self.generate_tts_instructions(text)
+        tts_url, headers, data = self._tts_request(text, instructions, voice, output_format)
+        
+        cache_key = self._tts_cache_key(data)
+        cached = self.cache.get(cache_key, "tts_audio")
+        if cached is not None:
+            yield cached
+            return
+        
+        async def post_tts():
+            request = self.tts_http_client.build_request("POST", tts_url, headers=headers, json=data)
+            response = await self.tts_http_client.send(request, stream=True)
+            if response.status_code in TRANSIENT_STATUS_CODES:
+                # Return the connection to the pool before the governor retries
+                await response.aclose()
+            return raise_for_throttling(response)
+        
+        response = await self.tts_governor.acall(post_tts)
+        try:
+            if response.status_code != 200:
+                body = (await response.aread()).decode(errors="replace")
+                logger.error(f"TTS generation failed with status {response.status_code}: {body}")
+                raise Exception(f"TTS generation failed: {body}")
+            
+            chunks = []
+            async for chunk in response.aiter_bytes(TTS_STREAM_CHUNK_SIZE):
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            await response.aclose()
+        
+        audio = b"".join(chunks)
+        get_telemetry().increment("tts_bytes", len(audio))
+        logger.info(f"Successfully streamed TTS audio ({len(audio)} bytes)")
+        self.cache.put(cache_key, audio, "tts_audio")
+    
+    async def generate_sora_instructions(self, narrative: str, guide_mode: Optional[str] = None) -> str:
+        """Async version of AzureOpenAIClient.generate_sora_instructions."""
+        try:
+            instructions = await self._chat("sora_instructions", self._sora_system_message(narrative, guide_mode), narrative, 2000, 0.1)
+            logger.info(f"Successfully generated Sora instructions ({len(instructions.split())} words)")
+            return instructions.replace('\n', ' ')
+        except Exception as e:
+            logger.error(f"Error generating Sora instructions: {str(e)}")
+            raise
+    
+    async def generate_video(self, instructions: str, duration_seconds: int = 20, width: int = 854, height: int = 480, output_path: str = "output") -> str:
+        """Async version of AzureOpenAIClient.generate_video."""
+        return (await self.generate_video_variants(instructions, 1, duration_seconds, width, height, output_path))[0]
+    
+    async def generate_video_variants(self, instructions: str, n_variants: int, duration_seconds: int = 20, width: int = 854,
+                                      height: int = 480, output_path: str = "output") -> List[str]:
+        """Generate n_variants videos in a single Sora job and download them concurrently."""
+        try:
+            # Hold a Sora job slot for the lifetime of the job
+            await asyncio.to_thread(self.sora_governor.acquire_slot)
+            try:
+                return await self._run_video_job(instructions, duration_seconds, width, height, output_path, n_variants)
+            finally:
+                self.sora_governor.release_slot()
+        
+        except Exception as e:
+            logger.error(f"Error generating video: {str(e)}")
             raise
+    
+    async def _run_video_job(self, instructions: str, duration_seconds: int, width: int, height: int, output_path: str,
+                             n_variants: int = 1) -> List[str]:
+        headers = self._sora_headers()
+        body = self._video_job_body(instructions, duration_seconds, width, height, n_variants)
+        
+        async def post_job():
+            return raise_for_throttling(await self.http_client.post(self._video_jobs_url(), headers=headers, json=body))
+        
+        logger.info("Creating video generation job")
+        try:
+            response = await self.sora_governor.acall(post_job, idempotent=False)
+        except Exception as e:
+            error = job_creation_error(e)
+            if error is e:
+                raise
+            raise error from e
+        response.raise_for_status()
+        
+        job_id = response.json()["id"]
+        logger.info(f"Job created: {job_id}")
+        
+        status_url = self._video_job_status_url(job_id)
+        
+        async def get_status():
+            return raise_for_throttling(await self.http_client.get(status_url, headers=headers))
+        
+        # Poll with the same adaptive backoff as the shared job tracker
+        status = None
+        interval = self.poll_interval
+        while status not in TERMINAL_STATUSES:
+            await asyncio.sleep(with_jitter(interval))
+            status_response = (await self.sora_governor.acall(get_status)).json()
+            new_status = status_response.get("status")
+            if new_status != status:
+                logger.info(f"Job status: {new_status}")
+            interval = next_poll_interval(interval, new_status != status, initial_interval=self.poll_interval)
+            status = new_status
+        
+        if status != "succeeded":
+            logger.error(f"Job didn't succeed. Status: {status}")
+            raise Exception(f"Video generation failed. Status: {status}")
+        
+        generations = status_response.get("generations", [])
+        if not generations:
+            logger.error("No generations found in job result")
+            raise Exception("No generations found in job result")
+        
+        logger.info(f"Video generation succeeded ({len(generations)} variants)")
+        return list(await asyncio.gather(*[
+            self._download_generation_video(generation.get("id"), output_path) for generation in generations
+        ]))
+    
+    async def _download_generation_video(self, generation_id: str, output_path: str,
+                                         chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+                                         max_retries: int = DOWNLOAD_MAX_RETRIES,
+                                         expected_sha256: Optional[str] = None) -> str:
+        """
+        Download a generated video like AzureOpenAIClient.download_video.
+        
+        The clip is streamed to a ".part" file, resumed with a range request if
+        the connection drops, and only renamed once its size (and optional
+        checksum) have been verified. The ".part" file is removed if the
+        download fails.
+        """
+        video_url = self._video_content_url(generation_id)
+        full_path = self._new_video_path(output_path)
+        part_path = f"{full_path}.part"
+        attempt = 0
+        received = 0
+        
+        with get_telemetry().span("download"):
+            try:
+                while True:
+                    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+                    headers = self._sora_headers()
+                    if offset:
+                        headers["Range"] = f"bytes={offset}-"
+                    
+                    try:
+                        async with self.http_client.stream("GET", video_url, headers=headers) as video_response:
+                            if video_response.status_code == 206:
+                                # Content-Range: bytes <start>-<end>/<total>
+                                expected_size = int(video_response.headers["Content-Range"].rsplit("/", 1)[1])
+                                mode = "ab"
+                            elif video_response.status_code == 416 and offset:
+                                # The previous attempt already received the whole file
+                                expected_size = offset
+                                break
+                            elif video_response.status_code == 200:
+                                # Server ignored the range request, start from scratch
+                                content_length = video_response.headers.get("Content-Length")
+                                expected_size = int(content_length) if content_length else None
+                                mode = "wb"
+                            else:
+                                await video_response.aread()
+                                logger.error(f"Failed to download video: {video_response.status_code}")
+                                raise Exception(f"Failed to download video: {video_response.text}")
+                            
+                            with open(part_path, mode) as file:
+                                async for chunk in video_response.aiter_bytes(chunk_size):
+                                    file.write(chunk)
+                                    received += len(chunk)
+                    except httpx.TransportError as e:
+                        attempt += 1
+                        if attempt > max_retries:
+                            raise
+                        logger.warning(f"Video download interrupted ({str(e)}), resuming (attempt {attempt}/{max_retries})")
+                        await asyncio.sleep(min(2 ** attempt, 30))
+                        continue
+                    break
+                
+                downloaded_size = verify_download(part_path, expected_size, expected_sha256, chunk_size)
+                os.replace(part_path, full_path)
+            
+            except Exception as e:
+                logger.error(f"Error downloading video: {str(e)}")
+                raise
+            
+            finally:
+                # Counts the bytes of interrupted attempts too
+                get_telemetry().increment("download_bytes", received)
+                if os.path.exists(part_path):
+                    os.unlink(part_path)
+        
+        logger.info(f'Generated video saved as "{full_path}" ({downloaded_size} bytes)')
+        return full_path
@@ -0,0 +1,299 @@
+"""
+Headless batch runner for the AI video generation system.
+Generates many teaser videos from a JSONL or CSV file of prompts.
+
+Usage:
+    python batch_runner.py prompts.jsonl --output-dir output/batch --sora-concurrency 8
+"""
+
+import os
+import csv
+import json
+import hashlib
+import time
+import logging
+import argparse
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from azure_openai_utils import AzureOpenAIClient
+from job_store import JobStore
+from core_scheduler import ENCODE_CORES, ENCODE_THREADS_PER_JOB
+from pipeline import SORA_VARIANTS, build_teaser_pipeline, run_checkpointed
+from telemetry import get_telemetry
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+MUSIC_DIR = Path("background_music")
+
+# Pipeline stages bounded by each concurrency setting
+CHAT_STAGES = ("narrative", "audio", "sora_instructions")
+SORA_STAGES = ("video", "video_variants")
+MUX_STAGES = ("final_video",)
+
+
+def read_prompts(path: str) -> List[Dict[str, Any]]:
+    """
+    Read the batch input file.
+
+    Each row needs a "prompt" and may set "id", "voice", "style" (a TTS
+    style preset), "music", "music_volume", "width", "height", "variants"
+    (number of Sora variants to choose from), "renditions" (comma separated
+    names of extra deliverables) and "streaming" (comma separated streaming
+    formats: fmp4, hls, dash). Rows without an id are numbered by their
+    position in the file.
+
+    Args:
+        path: Path to a .jsonl or .csv file
+
+    Returns:
+        List of rows as dicts
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    for number, row in enumerate(rows, start=1):
+        if not row.get("prompt"):
+            raise ValueError(f"Row {number} of {path} has no prompt")
+        row["id"] = str(row.get("id") or number)
+    return rows
+
+
+def job_key(row: Dict[str, Any]) -> str:
+    """
+    Return the job id of a row: its id and a hash of the parameters that shape the video.
+
+    Rows of different prompt files often share ids ("1", "2", ...); with the
+    hash, a row is only resumed from a job made for the same parameters.
+    """
+    fields = {
+        "prompt": row["prompt"],
+        "voice": row.get("voice") or "alloy",
+        "style": row.get("style") or None,
+        "width": int(row.get("width") or 854),
+        "height": int(row.get("height") or 480),
+        "variants": int(row.get("variants") or SORA_VARIANTS)
+    }
+    digest = hashlib.sha256(json.dumps(fields, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    return f"{row['id']}-{digest}"
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Return the given percentile (0.0 to 1.0) of values using linear interpolation."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class BatchState:
+    """
+    Progress of a batch, persisted as JSON after every finished job.
+
+    Re-running a batch with the same state file skips the jobs that already
+    succeeded. Jobs are keyed by job_key, so a row whose parameters changed
+    is run again.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                self.jobs = json.load(f).get("jobs", {})
+            logger.info(f"Resuming batch from {path} ({len(self.completed())} jobs already done)")
+
+    def completed(self) -> List[str]:
+        return [job_id for job_id, job in self.jobs.items() if job.get("status") == "succeeded"]
+
+    def record(self, job_id: str, **fields: Any):
+        with self._lock:
+            self.jobs.setdefault(job_id, {}).update(fields)
+            self._save()
+
+    def _save(self):
+        tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"jobs": self.jobs}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class BatchRunner:
+    """Runs the teaser pipeline for many prompts with bounded concurrency per stage."""
+
+    def __init__(self, client: AzureOpenAIClient, output_dir: Path, chat_concurrency: int = 4,
+                 sora_concurrency: int = 4, mux_concurrency: int = 2, state_path: Optional[Path] = None):
+        """
+        Initialize the runner.
+
+        Args:
+            client: AzureOpenAIClient used for the model calls
+            output_dir: Directory for the generated videos, state and report
+            chat_concurrency: Maximum concurrent chat and speech stages
+            sora_concurrency: Maximum concurrent Sora jobs
+            mux_concurrency: Maximum concurrent local combine stages
+            state_path: Progress file (defaults to batch_state.json in output_dir)
+        """
+        self.client = client
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.state = BatchState(state_path or self.output_dir / "batch_state.json")
+        # Stage checkpoints, so a failed job resumes from its last completed stage
+        self.job_store = JobStore(str(self.output_dir / "jobs.db"))
+
+        limits = {}
+        for stages, concurrency in ((CHAT_STAGES, chat_concurrency), (SORA_STAGES, sora_concurrency),
+                                    (MUX_STAGES, mux_concurrency)):
+            semaphore = threading.BoundedSemaphore(concurrency)
+            limits.update({stage: semaphore for stage in stages})
+        self.stage_limits = limits
+        # Enough jobs in flight to keep every stage busy
+        self.max_jobs = chat_concurrency + sora_concurrency + mux_concurrency
+
+    def run_job(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate the video of a single row and return its result record."""
+        job_id = job_key(row)
+        background_music_path = None
+        if row.get("music") and row["music"] != "None":
+            background_music_path = str(MUSIC_DIR / row["music"])
+
+        params = {
+            "prompt": row["prompt"],
+            "output_path": str(self.output_dir / f"final_video_{job_id}.mp4"),
+            "voice": row.get("voice") or "alloy",
+            "tts_style": row.get("style") or None,
+            "background_music_path": background_music_path,
+            "music_volume": float(row.get("music_volume") or 0.3),
+            "width": int(row.get("width") or 854),
+            "height": int(row.get("height") or 480),
+            "n_variants": int(row.get("variants") or SORA_VARIANTS),
+            # Nobody watches batch jobs while they run
+            "preview": False
+        }
+        if row.get("renditions"):
+            params["renditions"] = [name for name in row["renditions"].split(",") if name]
+        if row.get("streaming"):
+            params["streaming"] = [name for name in row["streaming"].split(",") if name]
+        self.job_store.create_job(params, job_id=job_id)
+        pipeline = build_teaser_pipeline(self.client, job_store=self.job_store, job_id=job_id, **params)
+        self.state.record(job_id, row=row["id"], status="running", started=time.time())
+        try:
+            result = run_checkpointed(pipeline, self.job_store, job_id, stage_limits=self.stage_limits)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            self.state.record(job_id, status="failed", error=str(e), finished=time.time())
+            raise
+
+        record = {
+            "status": "succeeded",
+            "output": result.results["final_video"],
+            "wall_time": result.wall_time,
+            "stage_times": {name: timing.duration for name, timing in result.timings.items()},
+            "finished": time.time()
+        }
+        self.state.record(job_id, **record)
+        return record
+
+    def run(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Run every row that has not succeeded yet.
+
+        Args:
+            rows: Rows as returned by read_prompts
+
+        Returns:
+            Summary report of the batch
+        """
+        done = set(self.state.completed())
+        todo = [row for row in rows if job_key(row) not in done]
+        logger.info(f"Running {len(todo)} of {len(rows)} jobs ({len(done)} already done)")
+
+        start = time.perf_counter()
+        succeeded, failed = 0, 0
+        with ThreadPoolExecutor(max_workers=max(1, self.max_jobs), thread_name_prefix="batch") as executor:
+            futures = {executor.submit(self.run_job, row): job_key(row) for row in todo}
+            for future in as_completed(futures):
+                if future.exception() is None:
+                    succeeded += 1
+                else:
+                    failed += 1
+                logger.info(f"Progress: {succeeded + failed}/{len(todo)} ({failed} failed)")
+        elapsed = time.perf_counter() - start
+
+        report = self.summarize(succeeded, failed, elapsed)
+        with open(self.output_dir / "batch_report.json", "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        return report
+
+    def summarize(self, succeeded: int, failed: int, elapsed: float) -> Dict[str, Any]:
+        """Build the throughput and latency report of this run."""
+        jobs = [job for job in self.state.jobs.values() if job.get("status") == "succeeded"]
+        stage_times: Dict[str, List[float]] = {}
+        for job in jobs:
+            for stage, duration in job.get("stage_times", {}).items():
+                stage_times.setdefault(stage, []).append(duration)
+        stage_times["end_to_end"] = [job["wall_time"] for job in jobs if "wall_time" in job]
+
+        return {
+            "succeeded": succeeded,
+            "failed": failed,
+            "elapsed_seconds": elapsed,
+            "videos_per_hour": succeeded / elapsed * 3600 if elapsed else 0.0,
+            "latency_seconds": {
+                stage: {
+                    "count": len(values),
+                    "p50": percentile(values, 0.5),
+                    "p90": percentile(values, 0.9),
+                    "p99": percentile(values, 0.99),
+                    "max": max(values) if values else 0.0
+                }
+                for stage, values in stage_times.items()
+            },
+            "metrics": get_telemetry().snapshot()
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate teaser videos for every prompt in a JSONL or CSV file.")
+    parser.add_argument("input", help="JSONL or CSV file with a prompt per row")
+    parser.add_argument("--output-dir", default=os.path.join("output", "batch"), help="Directory for videos, progress and report")
+    parser.add_argument("--chat-concurrency", type=int, default=4, help="Maximum concurrent chat and speech stages")
+    parser.add_argument("--sora-concurrency", type=int, default=4, help="Maximum concurrent Sora jobs")
+    # Combines share the machine's cores through the core scheduler, so this can exceed the core count
+    parser.add_argument("--mux-concurrency", type=int, default=max(2, ENCODE_CORES // ENCODE_THREADS_PER_JOB),
+                        help="Maximum concurrent combine stages")
+    parser.add_argument("--state", help="Progress file (defaults to batch_state.json in the output directory)")
+    args = parser.parse_args()
+
+    get_telemetry().start_metrics_server()
+    runner = BatchRunner(
+        AzureOpenAIClient(),
+        Path(args.output_dir),
+        chat_concurrency=args.chat_concurrency,
+        sora_concurrency=args.sora_concurrency,
+        mux_concurrency=args.mux_concurrency,
+        state_path=Path(args.state) if args.state else None
+    )
+    report = runner.run(read_prompts(args.input))
+    print(json.dumps(report, indent=2))
+    return report["failed"] == 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if main() else 1)
@@ -0,0 +1,241 @@
+"""
+Offline benchmark of the AI video generation pipeline.
+Runs the pipeline and the final combine step against the local mock Azure OpenAI server.
+
+Usage:
+    python benchmark.py --concurrency 1,4,8 --resolutions 854x480,1280x720 --jobs 8
+    python benchmark.py --skip-pipeline --combine-modes mux,reencode
+    python benchmark.py --imports --import-budget 2.0
+"""
+
+import os
+
+# Benchmarks measure the pipeline, not the result cache or clip reuse (the
+# benchmark prompts are near-duplicates), and the mock Sora jobs finish in
+# seconds; set before the modules below read their configuration
+os.environ.setdefault("RESULT_CACHE_ENABLED", "false")
+os.environ.setdefault("CLIP_REUSE_ENABLED", "false")
+os.environ.setdefault("SORA_POLL_INITIAL_INTERVAL", "0.5")
+os.environ.setdefault("SORA_POLL_MAX_INTERVAL", "2")
+
+import sys
+import json
+import time
+import logging
+import argparse
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from audio_mixer import SAMPLE_RATE, TTS_PCM_INPUT_ARGS, decode_audio
+from azure_openai_utils import AzureOpenAIClient
+from batch_runner import BatchRunner, percentile
+from mock_azure_server import (
+    AssetStore, MockAzureServer, add_config_arguments, config_from_arguments, make_speech_samples
+)
+from telemetry import get_telemetry
+from video_editor import combine_video_and_audio
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BENCHMARK_PROMPT = "A teaser for a new electric bicycle that folds into a backpack, take {number}"
+
+# Modules whose import time is guarded, and heavy modules they must only import lazily
+# (the MoviePy clip classes are only needed by the re-encode fallback)
+IMPORT_MODULES = ("app", "pipeline", "video_editor")
+LAZY_MODULES = ("moviepy.editor", "moviepy.video.io.VideoFileClip", "proglog")
+
+IMPORT_PROBE = """
+import sys, json, time
+start = time.perf_counter()
+__import__(sys.argv[1])
+print(json.dumps({"seconds": time.perf_counter() - start, "modules": sorted(sys.modules)}))
+"""
+
+
+def parse_resolutions(value: str) -> List[Tuple[int, int]]:
+    """Parse "854x480,1280x720" into [(854, 480), (1280, 720)]."""
+    return [tuple(int(n) for n in size.lower().split("x")) for size in value.split(",") if size]
+
+
+def latency_summary(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "p50": percentile(values, 0.5),
+        "p90": percentile(values, 0.9),
+        "max": max(values) if values else 0.0
+    }
+
+
+def benchmark_imports(modules: Sequence[str] = IMPORT_MODULES, repeats: int = 3,
+                      budget: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Measure the cold import time of modules, each in a fresh interpreter.
+
+    Args:
+        modules: Modules to import
+        repeats: Imports per module; the fastest one counts
+        budget: Maximum seconds per module, or None to only check for eager imports
+
+    Returns:
+        One result per module; "ok" is False if the module exceeded the budget
+        or imported one of LAZY_MODULES
+    """
+    repository = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for module in modules:
+        runs = []
+        for _ in range(repeats):
+            result = subprocess.run([sys.executable, "-c", IMPORT_PROBE, module], cwd=repository,
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            if result.returncode != 0:
+                raise Exception(f"Importing {module} failed: {result.stderr.strip()}")
+            runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+        seconds = min(run["seconds"] for run in runs)
+        eager = [name for name in LAZY_MODULES if name in runs[0]["modules"]]
+        results.append({
+            "module": module,
+            "seconds": seconds,
+            "eager_imports": eager,
+            "ok": not eager and (budget is None or seconds <= budget)
+        })
+    return results
+
+
+def benchmark_pipeline(client: AzureOpenAIClient, output_dir: Path, resolutions: Sequence[Tuple[int, int]],
+                       concurrencies: Sequence[int], jobs: int, n_variants: int = 1) -> List[Dict[str, Any]]:
+    """
+    Generate jobs videos per resolution and concurrency through the batch runner.
+
+    Returns:
+        One result per combination with throughput and per-stage latencies
+    """
+    results = []
+    for width, height in resolutions:
+        for concurrency in concurrencies:
+            run_dir = output_dir / f"pipeline_{width}x{height}_c{concurrency}_{int(time.time())}"
+            logger.info(f"Benchmarking {jobs} pipelines at {width}x{height} with concurrency {concurrency}")
+            runner = BatchRunner(client, run_dir, chat_concurrency=concurrency, sora_concurrency=concurrency,
+                                 mux_concurrency=concurrency)
+            rows = [
+                {"id": str(number), "prompt": BENCHMARK_PROMPT.format(number=number),
+                 "width": width, "height": height, "variants": n_variants}
+                for number in range(1, jobs + 1)
+            ]
+            report = runner.run(rows)
+            results.append({
+                "resolution": f"{width}x{height}",
+                "concurrency": concurrency,
+                "succeeded": report["succeeded"],
+                "failed": report["failed"],
+                "elapsed_seconds": report["elapsed_seconds"],
+                "videos_per_hour": report["videos_per_hour"],
+                "latency_seconds": report["latency_seconds"]
+            })
+    return results
+
+
+def benchmark_combine(assets: AssetStore, output_dir: Path, resolutions: Sequence[Tuple[int, int]],
+                      concurrencies: Sequence[int], jobs: int, modes: Sequence[str], clip_seconds: int = 10,
+                      background_music_path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Time combine_video_and_audio on a canned clip and narration.
+
+    Args:
+        modes: "mux" (stream copy of the video) and/or "reencode"
+
+    Returns:
+        One result per resolution, mode and concurrency
+    """
+    narration = decode_audio(
+        [make_speech_samples(clip_seconds - 1).tobytes()], input_args=TTS_PCM_INPUT_ARGS
+    )
+    logger.info(f"Benchmark narration: {len(narration) / SAMPLE_RATE:.1f}s")
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    results = []
+    for width, height in resolutions:
+        video_path = assets.video(width, height, clip_seconds)
+        for mode in modes:
+            for concurrency in concurrencies:
+                logger.info(f"Benchmarking {jobs} {mode} combines at {width}x{height} with concurrency {concurrency}")
+
+                def combine(number: int) -> float:
+                    start = time.perf_counter()
+                    combine_video_and_audio(
+                        video_path, narration, str(output_dir / f"combine_{mode}_{width}x{height}_{number}.mp4"),
+                        background_music_path=background_music_path, fast_mux=mode == "mux"
+                    )
+                    return time.perf_counter() - start
+
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="combine") as executor:
+                    durations = list(executor.map(combine, range(jobs)))
+                elapsed = time.perf_counter() - start
+                results.append({
+                    "resolution": f"{width}x{height}",
+                    "mode": mode,
+                    "concurrency": concurrency,
+                    "elapsed_seconds": elapsed,
+                    "videos_per_hour": jobs / elapsed * 3600 if elapsed else 0.0,
+                    "latency_seconds": latency_summary(durations)
+                })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline against a local mock Azure OpenAI server.")
+    parser.add_argument("--concurrency", default="1,4", help="Comma separated concurrency levels")
+    parser.add_argument("--resolutions", default="854x480", help="Comma separated WIDTHxHEIGHT sizes")
+    parser.add_argument("--jobs", type=int, default=4, help="Videos generated per concurrency level and resolution")
+    parser.add_argument("--variants", type=int, default=1, help="Sora variants per job")
+    parser.add_argument("--combine-modes", default="mux", help="Comma separated combine modes (mux, reencode)")
+    parser.add_argument("--music", help="Background music file used in the combine benchmark")
+    parser.add_argument("--skip-pipeline", action="store_true", help="Only benchmark the combine step")
+    parser.add_argument("--skip-combine", action="store_true", help="Only benchmark the pipeline")
+    parser.add_argument("--imports", action="store_true",
+                        help="Only check module import times; exits with 1 on a regression")
+    parser.add_argument("--import-budget", type=float, help="Maximum seconds to import each module")
+    parser.add_argument("--output-dir", default=os.path.join("output", "benchmark"), help="Directory for videos and the report")
+    parser.add_argument("--assets-dir", default=os.path.join("output", "mock_assets"), help="Directory of the canned speech and videos")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    if args.imports:
+        results = benchmark_imports(budget=args.import_budget)
+        print(json.dumps(results, indent=2))
+        sys.exit(0 if all(result["ok"] for result in results) else 1)
+
+    concurrencies = [int(c) for c in args.concurrency.split(",") if c]
+    resolutions = parse_resolutions(args.resolutions)
+    output_dir = Path(args.output_dir)
+    report: Dict[str, Any] = {"mock": vars(config_from_arguments(args))}
+
+    with MockAzureServer(config_from_arguments(args), assets_dir=args.assets_dir) as server:
+        os.environ.update(server.environment())
+        if not args.skip_pipeline:
+            client = AzureOpenAIClient()
+            try:
+                report["pipeline"] = benchmark_pipeline(client, output_dir, resolutions, concurrencies,
+                                                        args.jobs, n_variants=args.variants)
+            finally:
+                client.close()
+        if not args.skip_combine:
+            report["combine"] = benchmark_combine(
+                server.state.assets, output_dir / "combine", resolutions, concurrencies, args.jobs,
+                [m for m in args.combine_modes.split(",") if m], background_music_path=args.music
+            )
+        report["mock_requests"] = server.request_counts
+    report["metrics"] = get_telemetry().snapshot()
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with open(output_dir / "benchmark_report.json", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps({key: report[key] for key in ("pipeline", "combine") if key in report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+Near-duplicate prompt index for the video generation application.
+This module remembers the Sora clips of earlier prompts so similar prompts can reuse them instead of starting a new Sora job.
+
+Prompts are compared by the Jaccard similarity of their character shingles,
+estimated with MinHash signatures. Candidates are found with locality
+sensitive hashing (LSH): each signature is cut into bands, and prompts that
+share a band bucket are compared exactly. Lookups stay fast with many
+thousands of clips and need no embedding model.
+"""
+
+import os
+import re
+import time
+import uuid
+import shutil
+import sqlite3
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from typing import List, Optional, Set
+
+import numpy as np
+
+from telemetry import get_telemetry
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Reuse configuration; off unless enabled, since a reused clip was made for a different prompt
+CLIP_REUSE_ENABLED = os.getenv("CLIP_REUSE_ENABLED", "false").lower() in ("1", "true", "yes")
+CLIP_REUSE_THRESHOLD = float(os.getenv("CLIP_REUSE_THRESHOLD", "0.8"))
+CLIP_INDEX_PATH = os.getenv("CLIP_INDEX_PATH", os.path.join("output", "clip_index.db"))
+CLIP_INDEX_MAX_BYTES = int(os.getenv("CLIP_INDEX_MAX_BYTES", str(5 * 1024 ** 3)))
+
+# A reused clip may be this much longer than the clip the narration needs
+MAX_EXTRA_SECONDS = 5
+
+# MinHash signature length and LSH banding: 32 bands of 4 rows find pairs
+# above a similarity of about 0.5 with high probability
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 32
+SHINGLE_SIZE = 4
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_rng = np.random.RandomState(1)
+_HASH_A = _rng.randint(1, _MERSENNE_PRIME, size=NUM_PERMUTATIONS).astype(np.uint64)
+_HASH_B = _rng.randint(0, _MERSENNE_PRIME, size=NUM_PERMUTATIONS).astype(np.uint64)
+
+
+def normalize_prompt(text: str) -> str:
+    """Lowercase text and reduce it to words separated by single spaces."""
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    """Return the character shingles of the normalized text."""
+    text = normalize_prompt(text)
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def minhash(text: str) -> np.ndarray:
+    """Return the MinHash signature (NUM_PERMUTATIONS uint32 values) of text."""
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") & _MERSENNE_PRIME
+         for s in shingles(text)],
+        dtype=np.uint64
+    )
+    # (a * x + b) mod p for every permutation and shingle; a and x are below 2**31, so nothing overflows
+    permuted = (np.outer(_HASH_A, hashes) + _HASH_B[:, None]) % _MERSENNE_PRIME
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimate the Jaccard similarity of two texts from their signatures."""
+    return float(np.mean(a == b))
+
+
+def band_buckets(signature: np.ndarray) -> List[int]:
+    """Return the LSH bucket of every band of a signature."""
+    rows = NUM_PERMUTATIONS // LSH_BANDS
+    return [
+        int.from_bytes(hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(), digest_size=8).digest(),
+                       "little", signed=True)
+        for band in range(LSH_BANDS)
+    ]
+
+
+@dataclass
+class ClipMatch:
+    """A stored clip similar to a prompt."""
+    clip_id: str
+    path: str
+    prompt: str
+    similarity: float
+    n_seconds: int
+    width: int
+    height: int
+
+
+class ClipIndex:
+    """
+    SQLite-backed index of generated Sora clips by the prompt they were made for.
+
+    Registered clips are copied (or hard-linked) into a directory next to the
+    database, so they outlive the job that generated them. When the stored
+    clips exceed max_bytes, the least recently used ones are evicted.
+    """
+
+    def __init__(self, path: str = CLIP_INDEX_PATH, max_bytes: int = CLIP_INDEX_MAX_BYTES):
+        """
+        Initialize the index.
+
+        Args:
+            path: Path of the SQLite database file
+            max_bytes: Maximum total size of the stored clips
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.clip_dir = os.path.splitext(path)[0]
+        self._lock = threading.Lock()
+
+        os.makedirs(self.clip_dir, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS clips (
+                clip_id TEXT PRIMARY KEY,
+                prompt TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                path TEXT NOT NULL,
+                n_seconds INTEGER NOT NULL,
+                width INTEGER NOT NULL,
+                height INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS buckets (
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                clip_id TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS buckets_lookup ON buckets (band, bucket)")
+
+    def add(self, prompt: str, video_path: str, n_seconds: int, width: int, height: int) -> str:
+        """
+        Store a clip generated for prompt.
+
+        Args:
+            prompt: User prompt the clip was generated for
+            video_path: Path of the Sora clip
+            n_seconds: Clip length requested from Sora
+            width: Width of the clip in pixels
+            height: Height of the clip in pixels
+
+        Returns:
+            Id of the stored clip
+        """
+        clip_id = uuid.uuid4().hex
+        stored_path = os.path.join(self.clip_dir, f"{clip_id}{os.path.splitext(video_path)[1]}")
+        try:
+            os.link(video_path, stored_path)
+        except OSError:
+            shutil.copyfile(video_path, stored_path)
+        signature = minhash(prompt)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "INSERT INTO clips (clip_id, prompt, signature, path, n_seconds, width, height, size, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (clip_id, prompt, sqlite3.Binary(signature.tobytes()), stored_path, n_seconds, width, height,
+                 os.path.getsize(stored_path), now, now)
+            )
+            self._conn.executemany(
+                "INSERT INTO buckets (band, bucket, clip_id) VALUES (?, ?, ?)",
+                [(band, bucket, clip_id) for band, bucket in enumerate(band_buckets(signature))]
+            )
+            self._conn.execute("COMMIT")
+            self._evict()
+        logger.info(f"Added clip {clip_id} ({n_seconds}s, {width}x{height}) to the clip index")
+        return clip_id
+
+    def find(self, prompt: str, n_seconds: int, width: int, height: int,
+             threshold: float = CLIP_REUSE_THRESHOLD) -> Optional[ClipMatch]:
+        """
+        Find a stored clip for a prompt similar to prompt.
+
+        Only clips of the same size that are at least n_seconds (and at most
+        MAX_EXTRA_SECONDS more) long qualify. Among those above the
+        threshold, the most similar one wins; ties go to the shorter clip.
+
+        Args:
+            prompt: The new user prompt
+            n_seconds: Clip length the narration needs
+            width: Required width in pixels
+            height: Required height in pixels
+            threshold: Minimum estimated similarity (0.0 to 1.0)
+
+        Returns:
+            The best match, or None
+        """
+        signature = minhash(prompt)
+        buckets = band_buckets(signature)
+        with self._lock:
+            candidates = set()
+            for band, bucket in enumerate(buckets):
+                candidates.update(row[0] for row in self._conn.execute(
+                    "SELECT clip_id FROM buckets WHERE band = ? AND bucket = ?", (band, bucket)
+                ))
+            rows = [
+                self._conn.execute(
+                    "SELECT clip_id, prompt, signature, path, n_seconds, width, height FROM clips WHERE clip_id = ?",
+                    (clip_id,)
+                ).fetchone()
+                for clip_id in candidates
+            ]
+
+        matches = []
+        for row in rows:
+            if row is None:
+                continue
+            clip_id, clip_prompt, clip_signature, path, clip_seconds, clip_width, clip_height = row
+            if (clip_width, clip_height) != (width, height) or not n_seconds <= clip_seconds <= n_seconds + MAX_EXTRA_SECONDS:
+                continue
+            score = similarity(signature, np.frombuffer(clip_signature, dtype=np.uint32))
+            if score >= threshold:
+                matches.append(ClipMatch(clip_id, path, clip_prompt, score, clip_seconds, clip_width, clip_height))
+
+        for match in sorted(matches, key=lambda m: (-m.similarity, m.n_seconds)):
+            if not os.path.exists(match.path):
+                self.remove(match.clip_id)
+                continue
+            with self._lock:
+                self._conn.execute("UPDATE clips SET last_access = ? WHERE clip_id = ?", (time.time(), match.clip_id))
+            get_telemetry().increment("clip_reuse", result="hit")
+            logger.info(f"Reusing clip {match.clip_id} of a prompt with similarity {match.similarity:.2f}")
+            return match
+        get_telemetry().increment("clip_reuse", result="miss")
+        return None
+
+    def remove(self, clip_id: str):
+        """Forget a clip and delete its file."""
+        with self._lock:
+            self._remove(clip_id)
+
+    def _remove(self, clip_id: str):
+        row = self._conn.execute("SELECT path FROM clips WHERE clip_id = ?", (clip_id,)).fetchone()
+        self._conn.execute("DELETE FROM clips WHERE clip_id = ?", (clip_id,))
+        self._conn.execute("DELETE FROM buckets WHERE clip_id = ?", (clip_id,))
+        if row is not None and os.path.exists(row[0]):
+            os.unlink(row[0])
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM clips").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used clips until the index fits again
+        removed = 0
+        for clip_id, size in self._conn.execute("SELECT clip_id, size FROM clips ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._remove(clip_id)
+            total -= size
+            removed += 1
+        logger.info(f"Evicted {removed} clips from the clip index")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_index: Optional[ClipIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_clip_index() -> ClipIndex:
+    """Return the process-wide clip index."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = ClipIndex()
+        return _index
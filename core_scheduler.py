@@ -0,0 +1,101 @@
+"""
+CPU core scheduling for the video generation application.
+This module splits the cores of the machine among concurrent encode and mux jobs.
+"""
+
+import os
+import time
+import logging
+import threading
+import itertools
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from telemetry import get_telemetry
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Cores available to encoding on this machine
+ENCODE_CORES = int(os.getenv("ENCODE_CORES", str(os.cpu_count() or 1)))
+
+# Threads given to one video encode. x264 stops scaling well at around 8
+# threads for these resolutions, so a large machine runs several encodes at
+# once instead of one very wide one.
+ENCODE_THREADS_PER_JOB = int(os.getenv("ENCODE_THREADS_PER_JOB", str(max(1, min(8, ENCODE_CORES // 2)))))
+
+
+class CoreScheduler:
+    """
+    Hands out CPU cores to jobs so concurrent encodes do not oversubscribe the machine.
+
+    Each job reserves a number of threads for its duration and waits until
+    that many cores are free. Waiting jobs are served in arrival order, so a
+    wide encode is not starved by a stream of single-core muxes.
+    """
+
+    def __init__(self, cores: int = ENCODE_CORES):
+        """
+        Initialize the scheduler.
+
+        Args:
+            cores: Number of cores to share among jobs
+        """
+        self.cores = max(1, cores)
+        self._free = self.cores
+        self._waiting = deque()
+        self._tickets = itertools.count()
+        self._condition = threading.Condition()
+
+    @property
+    def free_cores(self) -> int:
+        with self._condition:
+            return self._free
+
+    @contextmanager
+    def reserve(self, threads: int, job: str = "encode") -> Iterator[int]:
+        """
+        Reserve cores for the duration of a job.
+
+        Args:
+            threads: Cores wanted; clamped to the size of the machine
+            job: Kind of job, used as a metric label
+
+        Yields:
+            Number of threads the job may use
+        """
+        threads = max(1, min(threads, self.cores))
+        ticket = next(self._tickets)
+        start = time.perf_counter()
+        with self._condition:
+            self._waiting.append(ticket)
+            while self._waiting[0] != ticket or self._free < threads:
+                self._condition.wait()
+            self._waiting.popleft()
+            self._free -= threads
+            # The next waiter may fit into the remaining cores
+            self._condition.notify_all()
+        get_telemetry().observe("core_wait_seconds", time.perf_counter() - start, job=job)
+
+        try:
+            yield threads
+        finally:
+            with self._condition:
+                self._free += threads
+                self._condition.notify_all()
+
+
+_scheduler: Optional[CoreScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_core_scheduler() -> CoreScheduler:
+    """Return the process-wide core scheduler."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = CoreScheduler()
+            logger.info(f"Scheduling encodes on {_scheduler.cores} cores, {ENCODE_THREADS_PER_JOB} threads per job")
+        return _scheduler
@@ -0,0 +1,160 @@
+"""
+Duration planning for the video generation application.
+This module sizes Sora jobs to the length of the narration instead of a fixed 20 seconds.
+"""
+
+import os
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from audio_mixer import speech_duration
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Clip lengths and frame sizes requested from Sora, smallest first
+SORA_DURATIONS = tuple(int(d) for d in os.getenv("SORA_DURATIONS", "5,10,15,20").split(","))
+SORA_RESOLUTIONS = (
+    (480, 480), (854, 480), (480, 854),
+    (720, 720), (1280, 720), (720, 1280),
+    (1080, 1080), (1920, 1080), (1080, 1920),
+)
+
+# Seconds of video kept after the narration ends
+DURATION_MARGIN = float(os.getenv("SORA_DURATION_MARGIN", "0.5"))
+
+# Maximum speed-up of the narration (0.1 = up to 10% faster) to fit a shorter clip
+MAX_TIME_STRETCH = float(os.getenv("NARRATION_MAX_TIME_STRETCH", "0.1"))
+
+# Speaking rate assumed for a voice until a narration in that voice has been measured
+DEFAULT_WORDS_PER_SECOND = float(os.getenv("NARRATION_WORDS_PER_SECOND", "2.5"))
+
+# Extra share of a predicted narration length that the clip covers while the
+# voice's speaking rate is still the default guess (0.25 = 25% longer)
+PREDICTION_MARGIN = float(os.getenv("SORA_PREDICTION_MARGIN", "0.25"))
+
+
+@dataclass
+class DurationPlan:
+    """Sora clip length and size chosen for a narration."""
+    narration_seconds: float
+    n_seconds: int
+    width: int
+    height: int
+    measured: bool
+
+    @property
+    def required_speedup(self) -> float:
+        """Factor the narration has to be sped up by to fit the clip (1.0 if it fits)."""
+        return max(1.0, (self.narration_seconds + DURATION_MARGIN) / self.n_seconds)
+
+
+def choose_duration(narration_seconds: float, durations: Sequence[int] = SORA_DURATIONS,
+                    max_stretch: float = MAX_TIME_STRETCH) -> int:
+    """
+    Pick the shortest clip length that covers the narration.
+
+    A clip that is too short by at most max_stretch is accepted, as the
+    narration is sped up to fit it when the video is combined.
+
+    Args:
+        narration_seconds: Length of the narration
+        durations: Supported clip lengths
+        max_stretch: Maximum relative speed-up of the narration
+
+    Returns:
+        Clip length in seconds (the longest supported one if none covers the narration)
+    """
+    needed = narration_seconds + DURATION_MARGIN
+    for duration in sorted(durations):
+        if needed <= duration * (1.0 + max_stretch):
+            return duration
+    return max(durations)
+
+
+def choose_resolution(width: int, height: int,
+                      resolutions: Sequence[Tuple[int, int]] = SORA_RESOLUTIONS) -> Tuple[int, int]:
+    """Return the smallest supported frame size that covers width x height."""
+    candidates = [(w, h) for w, h in resolutions if w >= width and h >= height]
+    if not candidates:
+        return max(resolutions, key=lambda r: r[0] * r[1])
+    return min(candidates, key=lambda r: r[0] * r[1])
+
+
+class DurationPlanner:
+    """
+    Plans Sora clip lengths from measured or predicted narration lengths.
+
+    Predictions use the speaking rate of each voice, learned from the
+    narrations measured so far in this process.
+    """
+
+    def __init__(self, words_per_second: float = DEFAULT_WORDS_PER_SECOND):
+        self.default_rate = words_per_second
+        self._rates: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def has_rate(self, voice: str) -> bool:
+        """Whether a narration in voice has been measured yet."""
+        with self._lock:
+            return voice in self._rates
+
+    def words_per_second(self, voice: str) -> float:
+        with self._lock:
+            words, seconds = self._rates.get(voice, (0, 0.0))
+        return words / seconds if seconds else self.default_rate
+
+    def record(self, voice: str, text: str, seconds: float):
+        """Record a measured narration to improve predictions for its voice."""
+        if seconds <= 0:
+            return
+        with self._lock:
+            words, total = self._rates.get(voice, (0, 0.0))
+            self._rates[voice] = (words + len(text.split()), total + seconds)
+
+    def predict(self, text: str, voice: str) -> float:
+        """Predict the seconds a narration takes to speak."""
+        return len(text.split()) / self.words_per_second(voice)
+
+    def plan(self, text: str, voice: str, width: int, height: int,
+             samples: Optional[np.ndarray] = None, max_stretch: float = MAX_TIME_STRETCH) -> DurationPlan:
+        """
+        Plan the clip for a narration.
+
+        Args:
+            text: Narration text
+            voice: TTS voice of the narration
+            width: Requested video width
+            height: Requested video height
+            samples: Synthesized narration, if available; otherwise its length is predicted
+            max_stretch: Maximum speed-up of the narration the combine step will apply, 0 for none
+
+        Returns:
+            DurationPlan for the Sora job
+        """
+        if samples is not None:
+            seconds = speech_duration(samples)
+            self.record(voice, text, seconds)
+            n_seconds = choose_duration(seconds, max_stretch=max_stretch)
+        else:
+            seconds = self.predict(text, voice)
+            # Until the voice has been measured, its rate is only a guess; leave room for a slow voice
+            margin = 0.0 if self.has_rate(voice) else PREDICTION_MARGIN
+            n_seconds = choose_duration(seconds * (1.0 + margin), max_stretch=max_stretch)
+        width, height = choose_resolution(width, height)
+        logger.info(f"Planned {n_seconds}s {width}x{height} clip for {seconds:.1f}s of "
+                    f"{'measured' if samples is not None else 'predicted'} narration")
+        return DurationPlan(seconds, n_seconds, width, height, samples is not None)
+
+
+_default_planner = DurationPlanner()
+
+
+def get_duration_planner() -> DurationPlanner:
+    """Return the process-wide duration planner."""
+    return _default_planner
@@ -0,0 +1,290 @@
+"""
+Background job queue for the video generation application.
+This module runs teaser generations on a pool of worker threads instead of the request thread.
+
+Jobs and their progress live in the JobStore, so any process sharing the
+database can submit jobs and follow them. The queue itself is pluggable:
+- "local": an in-process queue (default, single process)
+- "sqlite": workers claim queued jobs straight from the JobStore, so worker
+  processes started with `python job_queue.py` can share the work
+- "redis": a Redis list (needs the redis package and REDIS_URL)
+
+Usage:
+    JOB_QUEUE_BACKEND=sqlite python job_queue.py --workers 4
+"""
+
+import os
+import time
+import queue
+import logging
+import argparse
+import threading
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from artifacts import VIDEO_OUTPUT_DIR, get_artifact_manager
+from azure_openai_utils import AzureOpenAIClient
+from job_store import JobStore
+from pipeline import build_teaser_pipeline, run_checkpointed
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# Queue implementation ("local", "sqlite" or "redis") and number of generations run at the same time
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "local")
+JOB_QUEUE_WORKERS = int(os.getenv("JOB_QUEUE_WORKERS", "2"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_QUEUE_KEY = os.getenv("REDIS_QUEUE_KEY", "teaser:jobs")
+
+# Seconds a worker waits for a job before checking for shutdown
+QUEUE_POLL_INTERVAL = 1.0
+
+# Statuses of jobs that are waiting for or held by a worker
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class LocalJobQueue:
+    """In-process queue of job ids."""
+
+    def __init__(self):
+        self._queue: "queue.Queue[str]" = queue.Queue()
+
+    def put(self, job_id: str):
+        self._queue.put(job_id)
+
+    def get(self, timeout: float = QUEUE_POLL_INTERVAL) -> Optional[str]:
+        """Return the next job id, or None if none arrived within timeout seconds."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class SQLiteJobQueue:
+    """Queue backed by the "queued" status of jobs in the JobStore."""
+
+    def __init__(self, job_store: JobStore):
+        self.job_store = job_store
+
+    def put(self, job_id: str):
+        # Submitting already marks the job as queued
+        pass
+
+    def get(self, timeout: float = QUEUE_POLL_INTERVAL) -> Optional[str]:
+        job_id = self.job_store.claim_next_job()
+        if job_id is None:
+            time.sleep(timeout)
+        return job_id
+
+
+class RedisJobQueue:
+    """Queue of job ids in a Redis list, shared by workers on several hosts."""
+
+    def __init__(self, url: str = REDIS_URL, key: str = REDIS_QUEUE_KEY):
+        if redis is None:
+            raise ValueError("The redis job queue backend needs the redis package (pip install redis)")
+        self.key = key
+        self._redis = redis.Redis.from_url(url)
+
+    def put(self, job_id: str):
+        self._redis.rpush(self.key, job_id)
+
+    def get(self, timeout: float = QUEUE_POLL_INTERVAL) -> Optional[str]:
+        item = self._redis.blpop([self.key], timeout=max(1, int(timeout)))
+        return item[1].decode("utf-8") if item else None
+
+
+def create_job_queue(backend: str = JOB_QUEUE_BACKEND, job_store: Optional[JobStore] = None):
+    """Create the job queue of the given backend ("local", "sqlite" or "redis")."""
+    if backend == "local":
+        return LocalJobQueue()
+    if backend == "sqlite":
+        if job_store is None:
+            raise ValueError("The sqlite job queue backend needs a job store")
+        return SQLiteJobQueue(job_store)
+    if backend == "redis":
+        return RedisJobQueue()
+    raise ValueError(f"Unknown job queue backend: {backend}")
+
+
+class JobWorkerPool:
+    """
+    Runs queued teaser generations on a fixed number of worker threads.
+
+    Submitting only records the job and queues it, so callers (e.g. Streamlit
+    sessions) return immediately and follow the job through the JobStore.
+    The number of generations running at once is bounded by the workers, not
+    by the number of callers.
+    """
+
+    def __init__(self, client: AzureOpenAIClient, job_store: JobStore, job_queue=None,
+                 workers: int = JOB_QUEUE_WORKERS):
+        """
+        Initialize the pool.
+
+        Args:
+            client: Client shared by all workers
+            job_store: Store of the jobs, their progress and checkpoints
+            job_queue: Queue of job ids (defaults to the JOB_QUEUE_BACKEND queue)
+            workers: Number of worker threads; 0 only submits jobs for other processes to run
+        """
+        self.client = client
+        self.job_store = job_store
+        self.queue = job_queue or create_job_queue(job_store=job_store)
+        self.workers = workers
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+
+    def submit(self, params: Dict[str, Any]) -> str:
+        """
+        Queue a new generation.
+
+        Args:
+            params: Keyword arguments of build_teaser_pipeline, e.g. prompt and output_path
+
+        Returns:
+            Id of the job
+        """
+        job_id = self.job_store.create_job(params)
+        self._enqueue(job_id)
+        return job_id
+
+    def resume(self, job_id: str):
+        """Queue a failed job again; its completed stages are reused."""
+        self._enqueue(job_id)
+
+    def _enqueue(self, job_id: str):
+        self.job_store.set_status(job_id, "queued")
+        self.queue.put(job_id)
+        logger.info(f"Queued job {job_id}")
+
+    def recover(self):
+        """
+        Queue the jobs a previous process left queued or running.
+
+        Only safe when this pool is the only one working on the job store, as
+        with the local backend.
+        """
+        for job in self.job_store.list_jobs():
+            if job["status"] in ACTIVE_STATUSES:
+                logger.info(f"Recovering interrupted job {job['job_id']}")
+                self._enqueue(job["job_id"])
+
+    def start(self) -> "JobWorkerPool":
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {self.workers} job workers")
+        return self
+
+    def stop(self):
+        """Stop the workers after their current jobs."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _work(self):
+        while not self._stop.is_set():
+            job_id = self.queue.get()
+            if job_id is None:
+                continue
+            try:
+                self.run_job(job_id)
+            except Exception as e:
+                # The failure is recorded in the job store
+                logger.error(f"Job {job_id} failed: {str(e)}")
+            try:
+                self.evict_outputs()
+            except Exception as e:
+                logger.warning(f"Output eviction failed: {str(e)}")
+
+    def evict_outputs(self, force: bool = False) -> int:
+        """
+        Keep the videos and job artifacts within the output quota (see artifacts.OUTPUT_MAX_BYTES).
+
+        Files of queued and running jobs are never evicted.
+
+        Args:
+            force: Evict even if the last eviction was less than EVICTION_INTERVAL ago
+
+        Returns:
+            Number of deleted files
+        """
+        protect = []
+        for job in self.job_store.list_jobs():
+            if job["status"] not in ACTIVE_STATUSES:
+                continue
+            directory = self.job_store.artifact_root / job["job_id"]
+            if directory.is_dir():
+                protect.extend(str(path) for path in directory.iterdir())
+            output_path = job["params"].get("output_path")
+            if output_path:
+                # The final video and the renditions named after it
+                stem = os.path.splitext(output_path)[0]
+                directory = os.path.dirname(output_path) or "."
+                if os.path.isdir(directory):
+                    protect.extend(os.path.join(directory, name) for name in os.listdir(directory)
+                                   if os.path.join(directory, name).startswith(stem))
+        roots = [VIDEO_OUTPUT_DIR, str(self.job_store.artifact_root)]
+        manager = get_artifact_manager()
+        return manager.evict(roots, protect=protect) if force else manager.maybe_evict(roots, protect=protect)
+
+    def run_job(self, job_id: str):
+        """Run a job on the calling thread and record its progress."""
+        job = self.job_store.get_job(job_id)
+        if job is None:
+            logger.warning(f"Skipping unknown job {job_id}")
+            return
+        params = dict(job["params"])
+        # Recorded by the app before jobs were queued
+        params.pop("timestamp", None)
+        try:
+            pipeline = build_teaser_pipeline(self.client, job_store=self.job_store, job_id=job_id, **params)
+        except Exception as e:
+            self.job_store.set_status(job_id, "failed", error=str(e))
+            raise
+        completed = set(self.job_store.load_stages(job_id)) & set(pipeline.stages)
+        self.job_store.set_progress(job_id, len(completed) / len(pipeline.stages))
+
+        def on_stage_complete(stage_name, result):
+            completed.add(stage_name)
+            self.job_store.set_progress(job_id, len(completed) / len(pipeline.stages))
+
+        # The stages share the job's scratch directory, which is removed when the run ends
+        with get_artifact_manager().workdir(job_id):
+            result = run_checkpointed(pipeline, self.job_store, job_id, on_stage_complete=on_stage_complete)
+        self.job_store.save_stage(job_id, "timing_report", result.timing_report())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run teaser generation workers for a shared job queue.")
+    parser.add_argument("--workers", type=int, default=JOB_QUEUE_WORKERS, help="Number of concurrent generations")
+    parser.add_argument("--backend", default="redis" if JOB_QUEUE_BACKEND == "redis" else "sqlite", choices=("sqlite", "redis"),
+                        help="Queue shared with the processes that submit jobs")
+    args = parser.parse_args()
+
+    job_store = JobStore()
+    pool = JobWorkerPool(AzureOpenAIClient(), job_store, create_job_queue(args.backend, job_store), workers=args.workers)
+    pool.start()
+    try:
+        while True:
+            time.sleep(QUEUE_POLL_INTERVAL)
+    except KeyboardInterrupt:
+        logger.info("Stopping workers after their current jobs")
+        pool.stop()
+
+
+if __name__ == "__main__":
+    main()
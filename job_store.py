@@ -0,0 +1,193 @@
+"""
+Durable job state for the video generation application.
+This module records the artifact of every completed pipeline stage so failed runs can resume.
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", os.path.join("output", "jobs.db"))
+
+
+class JobStore:
+    """
+    SQLite-backed store of video jobs and their per-stage checkpoints.
+
+    Small artifacts (narrative, instructions, Sora job id, file paths) are
+    stored inline; binary artifacts such as the narration audio are written
+    to a per-job artifact directory next to the database and referenced by
+    path.
+    """
+
+    def __init__(self, path: str = JOB_STORE_PATH):
+        """
+        Initialize the store.
+
+        Args:
+            path: Path of the SQLite database file
+        """
+        self.path = path
+        self.artifact_root = Path(path).parent / "jobs"
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                params TEXT NOT NULL,
+                status TEXT NOT NULL,
+                error TEXT,
+                created REAL NOT NULL,
+                updated REAL NOT NULL,
+                progress REAL NOT NULL DEFAULT 0
+            )
+            """
+        )
+        # Databases created before progress was tracked
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+        if "progress" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN progress REAL NOT NULL DEFAULT 0")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS stages (
+                job_id TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                value TEXT NOT NULL,
+                updated REAL NOT NULL,
+                PRIMARY KEY (job_id, stage)
+            )
+            """
+        )
+
+    def create_job(self, params: Dict[str, Any], job_id: Optional[str] = None) -> str:
+        """
+        Register a job, or return the existing one with the same id.
+
+        Args:
+            params: Parameters needed to (re)run the job, e.g. prompt and voice
+            job_id: Optional id to use instead of a random one
+
+        Returns:
+            The job id
+        """
+        job_id = job_id or uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO jobs (job_id, params, status, created, updated) VALUES (?, ?, 'pending', ?, ?)",
+                (job_id, json.dumps(params), now, now)
+            )
+        return job_id
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the job record, or None if the job is unknown."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT params, status, error, created, updated, progress FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        params, status, error, created, updated, progress = row
+        return {
+            "job_id": job_id,
+            "params": json.loads(params),
+            "status": status,
+            "error": error,
+            "created": created,
+            "updated": updated,
+            "progress": progress
+        }
+
+    def list_jobs(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Return all jobs, optionally only those with the given status, newest first."""
+        with self._lock:
+            if status:
+                rows = self._conn.execute("SELECT job_id FROM jobs WHERE status = ? ORDER BY created DESC", (status,)).fetchall()
+            else:
+                rows = self._conn.execute("SELECT job_id FROM jobs ORDER BY created DESC").fetchall()
+        return [self.get_job(row[0]) for row in rows]
+
+    def set_status(self, job_id: str, status: str, error: Optional[str] = None):
+        """Update the status of a job ("pending", "queued", "running", "succeeded" or "failed")."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated = ? WHERE job_id = ?",
+                (status, error, time.time(), job_id)
+            )
+
+    def set_progress(self, job_id: str, progress: float):
+        """Record the fraction (0.0 to 1.0) of the pipeline stages a job has completed."""
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET progress = ?, updated = ? WHERE job_id = ?", (progress, time.time(), job_id))
+
+    def claim_next_job(self) -> Optional[str]:
+        """
+        Mark the oldest queued job as running and return its id.
+
+        The claim is a single write transaction, so workers in several
+        processes sharing the database never run the same job twice.
+
+        Returns:
+            Id of the claimed job, or None if no job is queued
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT job_id FROM jobs WHERE status = 'queued' ORDER BY updated LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', updated = ? WHERE job_id = ?", (time.time(), row[0])
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return row[0] if row is not None else None
+
+    def save_stage(self, job_id: str, stage: str, value: str):
+        """Record the artifact of a completed stage."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO stages (job_id, stage, value, updated) VALUES (?, ?, ?, ?)",
+                (job_id, stage, value, time.time())
+            )
+        logger.info(f"Checkpointed stage '{stage}' of job {job_id}")
+
+    def load_stages(self, job_id: str) -> Dict[str, str]:
+        """Return the recorded artifacts of a job by stage name."""
+        with self._lock:
+            rows = self._conn.execute("SELECT stage, value FROM stages WHERE job_id = ?", (job_id,)).fetchall()
+        return dict(rows)
+
+    def clear_stage(self, job_id: str, stage: str):
+        """Forget the artifact of a stage, so it is run again on resume."""
+        with self._lock:
+            self._conn.execute("DELETE FROM stages WHERE job_id = ? AND stage = ?", (job_id, stage))
+
+    def artifact_dir(self, job_id: str) -> Path:
+        """Return (and create) the directory for the binary artifacts of a job."""
+        directory = self.artifact_root / job_id
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,296 @@
+"""
+Sora job tracking for the video generation application.
+This module polls the status of all in-flight video generation jobs from a single background thread.
+"""
+
+import os
+import heapq
+import random
+import logging
+import itertools
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from rate_limiter import RateLimitedError
+from telemetry import get_telemetry
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Polling configuration
+POLL_INITIAL_INTERVAL = float(os.getenv("SORA_POLL_INITIAL_INTERVAL", "2"))
+POLL_MAX_INTERVAL = float(os.getenv("SORA_POLL_MAX_INTERVAL", "30"))
+POLL_BACKOFF_FACTOR = float(os.getenv("SORA_POLL_BACKOFF_FACTOR", "1.5"))
+POLL_JITTER = float(os.getenv("SORA_POLL_JITTER", "0.2"))
+JOB_TIMEOUT = float(os.getenv("SORA_JOB_TIMEOUT", "1800"))
+MAX_CONSECUTIVE_ERRORS = 5
+
+TERMINAL_STATUSES = ("succeeded", "failed", "cancelled")
+
+# Statuses of a job that is still waiting for capacity
+QUEUED_STATUSES = ("queued", "preprocessing")
+
+
+def next_poll_interval(interval: float, status_changed: bool,
+                       initial_interval: float = POLL_INITIAL_INTERVAL,
+                       max_interval: float = POLL_MAX_INTERVAL,
+                       backoff_factor: float = POLL_BACKOFF_FACTOR) -> float:
+    """
+    Compute the delay before the next status check of a job.
+
+    The interval grows exponentially while the job stays in the same state
+    and drops back to the initial interval whenever the state changes.
+
+    Args:
+        interval: The previous polling interval in seconds
+        status_changed: Whether the last check reported a new status
+        initial_interval: Interval used after a status change
+        max_interval: Upper bound for the interval
+        backoff_factor: Multiplier applied while the status is unchanged
+
+    Returns:
+        The next polling interval in seconds
+    """
+    if status_changed:
+        return initial_interval
+    return min(interval * backoff_factor, max_interval)
+
+
+def with_jitter(interval: float, jitter: float = POLL_JITTER) -> float:
+    """Randomize an interval by +/- jitter (a fraction) to spread out status checks."""
+    return max(0.0, interval * (1 + random.uniform(-jitter, jitter)))
+
+
+@dataclass
+class TrackedJob:
+    """State of a job that is being polled."""
+    job_id: str
+    future: Future
+    deadline: float
+    interval: float
+    status: Optional[str] = None
+    polls: int = 0
+    errors: int = 0
+    created: float = field(default_factory=time.monotonic)
+    started: Optional[float] = None
+
+
+class SoraJobTracker:
+    """
+    Tracks many Sora jobs with a single background poller thread.
+
+    Each tracked job gets a Future that resolves with the final status response
+    once the job reaches a terminal state, or fails with TimeoutError when the
+    job's deadline passes. Jobs are kept in a heap ordered by their next check
+    time, so the poller only wakes up when a job is due.
+
+    fetch_status must not block: it should raise
+    rate_limiter.RateLimitedError when the quota has no room, and the job is
+    checked again once it has. Any other error is counted against the job
+    only, so one job can never stop the polling of the others.
+    """
+
+    def __init__(self, fetch_status: Callable[[str], Dict[str, Any]],
+                 initial_interval: float = POLL_INITIAL_INTERVAL,
+                 max_interval: float = POLL_MAX_INTERVAL,
+                 backoff_factor: float = POLL_BACKOFF_FACTOR,
+                 jitter: float = POLL_JITTER,
+                 default_timeout: float = JOB_TIMEOUT):
+        """
+        Initialize the tracker.
+
+        Args:
+            fetch_status: Callable returning the status response of a job id
+            initial_interval: Seconds before the first check and after a status change
+            max_interval: Maximum seconds between two checks of the same job
+            backoff_factor: Interval multiplier while a job's status is unchanged
+            jitter: Random fraction added to or removed from every interval
+            default_timeout: Seconds after which a job is given up
+        """
+        self.fetch_status = fetch_status
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff_factor = backoff_factor
+        self.jitter = jitter
+        self.default_timeout = default_timeout
+
+        self._queue: List = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def track(self, job_id: str, timeout: Optional[float] = None,
+              callback: Optional[Callable[[Future], None]] = None) -> Future:
+        """
+        Start tracking a job.
+
+        Args:
+            job_id: Id of the Sora job
+            timeout: Seconds after which the job is given up (defaults to default_timeout)
+            callback: Optional callable invoked with the Future once the job completes
+
+        Returns:
+            Future resolving with the final status response of the job
+        """
+        future = Future()
+        if callback:
+            future.add_done_callback(callback)
+        now = time.monotonic()
+        job = TrackedJob(
+            job_id=job_id,
+            future=future,
+            deadline=now + (timeout if timeout is not None else self.default_timeout),
+            interval=self.initial_interval
+        )
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError("Job tracker has been stopped")
+            self._schedule(job, now)
+            self._ensure_started()
+            self._condition.notify()
+        logger.info(f"Tracking job {job_id}")
+        return future
+
+    def in_flight(self) -> int:
+        """Return the number of jobs currently being tracked."""
+        with self._condition:
+            return len(self._queue)
+
+    def stop(self):
+        """Stop the poller and cancel all jobs that are still being tracked."""
+        with self._condition:
+            self._stopped = True
+            jobs = [entry[2] for entry in self._queue]
+            self._queue.clear()
+            self._condition.notify()
+        for job in jobs:
+            job.future.cancel()
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="sora-job-tracker", daemon=True)
+            self._thread.start()
+
+    def _schedule(self, job: TrackedJob, now: float):
+        next_check = min(now + with_jitter(job.interval, self.jitter), job.deadline)
+        heapq.heappush(self._queue, (next_check, next(self._counter), job))
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    if self._queue:
+                        delay = self._queue[0][0] - time.monotonic()
+                        if delay <= 0:
+                            break
+                        self._condition.wait(delay)
+                    else:
+                        self._condition.wait()
+                if self._stopped:
+                    return
+                _, _, job = heapq.heappop(self._queue)
+
+            if job.future.done():
+                # Cancelled by its caller (or resolved) while waiting in the queue
+                continue
+            try:
+                self._poll(job)
+            except Exception as e:
+                logger.error(f"Tracking job {job.job_id} failed: {str(e)}")
+                self._resolve(job, exception=e)
+
+    @staticmethod
+    def _resolve(job: TrackedJob, result: Any = None, exception: Optional[BaseException] = None):
+        """Complete the future of a job, unless its caller already cancelled it."""
+        if job.future.done():
+            return
+        try:
+            if exception is not None:
+                job.future.set_exception(exception)
+            else:
+                job.future.set_result(result)
+        except InvalidStateError:
+            # Cancelled between the check and the call
+            pass
+
+    def _reschedule(self, job: TrackedJob, next_check: float):
+        with self._condition:
+            if self._stopped:
+                job.future.cancel()
+                return
+            heapq.heappush(self._queue, (min(next_check, job.deadline), next(self._counter), job))
+
+    def _poll(self, job: TrackedJob):
+        try:
+            status_response = self.fetch_status(job.job_id)
+            job.errors = 0
+        except RateLimitedError as e:
+            # No quota for a status check right now; try again once there is,
+            # without holding up the other jobs or counting it as an error
+            if time.monotonic() >= job.deadline:
+                self._record_metrics(job, "timeout")
+                self._resolve(job, exception=TimeoutError(f"Video generation job {job.job_id} timed out. Status: {job.status}"))
+            else:
+                self._reschedule(job, time.monotonic() + e.wait)
+            return
+        except Exception as e:
+            job.errors += 1
+            logger.warning(f"Status check for job {job.job_id} failed ({job.errors}/{MAX_CONSECUTIVE_ERRORS}): {str(e)}")
+            if job.errors >= MAX_CONSECUTIVE_ERRORS:
+                self._record_metrics(job, "error")
+                self._resolve(job, exception=e)
+                return
+            status_response = None
+
+        job.polls += 1
+        if status_response is not None:
+            status = status_response.get("status")
+            status_changed = status != job.status
+            if status_changed:
+                logger.info(f"Job {job.job_id} status: {status}")
+                if job.started is None and status not in QUEUED_STATUSES:
+                    job.started = time.monotonic()
+            job.status = status
+
+            if status in TERMINAL_STATUSES:
+                logger.info(f"Job {job.job_id} finished with status {status} after {job.polls} status checks")
+                self._record_metrics(job, status)
+                self._resolve(job, result=status_response)
+                return
+        else:
+            status_changed = False
+
+        now = time.monotonic()
+        if now >= job.deadline:
+            logger.error(f"Job {job.job_id} timed out with status {job.status}")
+            self._record_metrics(job, "timeout")
+            self._resolve(job, exception=TimeoutError(f"Video generation job {job.job_id} timed out. Status: {job.status}"))
+            return
+
+        job.interval = next_poll_interval(
+            job.interval, status_changed,
+            initial_interval=self.initial_interval,
+            max_interval=self.max_interval,
+            backoff_factor=self.backoff_factor
+        )
+        with self._condition:
+            if self._stopped:
+                job.future.cancel()
+                return
+            self._schedule(job, now)
+
+    @staticmethod
+    def _record_metrics(job: TrackedJob, outcome: str):
+        # Time spent queued at Sora versus generating, as seen by the poller
+        telemetry = get_telemetry()
+        finished = time.monotonic()
+        started = job.started or finished
+        telemetry.increment("sora_jobs", status=outcome)
+        telemetry.observe("sora_queue_seconds", started - job.created)
+        telemetry.observe("sora_run_seconds", finished - started)
+        telemetry.observe("sora_polls", job.polls)
@@ -0,0 +1,538 @@
+"""
+Local stand-in for the Azure OpenAI endpoints used by the video generation application.
+This module serves chat completions, speech and Sora jobs with configurable latency and failures.
+
+Usage:
+    python mock_azure_server.py --port 8765 --sora-run-seconds 5 --throttle-rate 0.05
+
+The printed environment variables point AzureOpenAIClient at the server.
+Speech and videos are canned assets generated once with ffmpeg (a tone
+pattern and a test pattern); files already present in the assets directory
+under the same names are served as they are.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import random
+import hashlib
+import logging
+import argparse
+import threading
+import subprocess
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import numpy as np
+from moviepy.config import get_setting
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Format of streamed "pcm" speech, as returned by the real endpoint
+SPEECH_SAMPLE_RATE = 24000
+
+# ffmpeg muxers of speech formats whose name differs from the format
+SPEECH_MUXERS = {"aac": "adts", "opus": "ogg"}
+
+CHAT_PATH = re.compile(r"^/openai/deployments/([^/]+)/chat/completions$")
+SPEECH_PATH = re.compile(r"^/openai/deployments/([^/]+)/audio/speech$")
+JOBS_PATH = re.compile(r"^/openai/v1/video/generations/jobs$")
+JOB_STATUS_PATH = re.compile(r"^/openai/v1/video/generations/jobs/([^/]+)$")
+CONTENT_PATH = re.compile(r"^/openai/v1/video/generations/([^/]+)/content/video$")
+
+WORDS = (
+    "light breaks over a quiet city as a lone runner crosses the bridge and the river "
+    "carries the first sounds of morning toward a harbor full of waiting ships"
+).split()
+
+
+@dataclass
+class MockConfig:
+    """Latency and failure behaviour of the mock server."""
+    # Seconds before a chat completion is returned
+    chat_latency: float = 0.5
+    # Seconds before the first speech byte is sent
+    tts_latency: float = 0.3
+    # Speech is streamed this many times faster than real time (0 = all at once)
+    tts_realtime_factor: float = 10.0
+    # Seconds of latency of Sora job creation and status requests
+    api_latency: float = 0.05
+    # Seconds a Sora job stays queued and then running
+    sora_queue_seconds: float = 1.0
+    sora_run_seconds: float = 3.0
+    # Download throughput of videos in bytes per second (0 = unlimited)
+    download_bytes_per_second: float = 0.0
+    # Relative random variation of all latencies (0.2 = +/- 20%)
+    latency_jitter: float = 0.2
+    # Fraction of API requests answered with 500 and with 429
+    failure_rate: float = 0.0
+    throttle_rate: float = 0.0
+    # Retry-After of throttled requests in seconds
+    retry_after: float = 1.0
+    # Fraction of Sora jobs that end with status "failed"
+    job_failure_rate: float = 0.0
+    # Length of generated narratives and the speaking rate of generated speech
+    narrative_words: int = 30
+    words_per_second: float = 2.5
+
+
+def run_ffmpeg(arguments, description: str):
+    """Run ffmpeg with the given arguments and raise on failure."""
+    command = [get_setting("FFMPEG_BINARY"), "-y", "-hide_banner", "-loglevel", "error"] + list(arguments)
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise Exception(f"ffmpeg {description} failed: {result.stderr.decode(errors='replace').strip()}")
+
+
+def make_speech_samples(seconds: float, sample_rate: int = SPEECH_SAMPLE_RATE) -> np.ndarray:
+    """
+    Synthesize a speech-like tone pattern.
+
+    Short tone bursts ("words") alternate with pauses, so silence detection
+    and ducking behave roughly as they do with real narration.
+
+    Returns:
+        int16 mono samples
+    """
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    tone = 0.3 * np.sin(2 * np.pi * 220.0 * t) + 0.1 * np.sin(2 * np.pi * 660.0 * t)
+    gate = (t % 0.4) < 0.3
+    return (tone * gate * 32767).astype(np.int16)
+
+
+def make_test_video(output_path: str, width: int, height: int, seconds: float, fps: int = 24) -> str:
+    """Encode an H.264 test pattern video with moving content, like a Sora clip without audio."""
+    run_ffmpeg([
+        "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={fps}:duration={seconds}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+        "-movflags", "+faststart",
+        output_path
+    ], "test video encode")
+    return output_path
+
+
+class AssetStore:
+    """Canned speech and video files, generated on first use and reused afterwards."""
+
+    def __init__(self, assets_dir: str):
+        self.assets_dir = assets_dir
+        os.makedirs(assets_dir, exist_ok=True)
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, name: str, create) -> str:
+        path = os.path.join(self.assets_dir, name)
+        with self._lock:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            if not os.path.exists(path):
+                logger.info(f"Generating mock asset {name}")
+                part_path = f"{path}.part{os.path.splitext(path)[1]}"
+                create(part_path)
+                os.replace(part_path, path)
+        return path
+
+    def speech(self, seconds: float, output_format: str) -> str:
+        """Path of a speech file of about the given length in the requested format."""
+        # Half second steps keep the number of generated files small
+        seconds = max(0.5, round(seconds * 2) / 2)
+
+        def create(path):
+            pcm = make_speech_samples(seconds).tobytes()
+            if output_format == "pcm":
+                with open(path, "wb") as f:
+                    f.write(pcm)
+                return
+            pcm_path = f"{path}.pcm"
+            with open(pcm_path, "wb") as f:
+                f.write(pcm)
+            try:
+                run_ffmpeg(["-f", "s16le", "-ar", str(SPEECH_SAMPLE_RATE), "-ac", "1", "-i", pcm_path,
+                            "-f", SPEECH_MUXERS.get(output_format, output_format), path], "speech encode")
+            finally:
+                os.unlink(pcm_path)
+
+        return self._cached(f"speech_{seconds:.1f}s.{output_format}", create)
+
+    def video(self, width: int, height: int, seconds: int) -> str:
+        """Path of a test video of the given size and length."""
+        return self._cached(f"video_{width}x{height}_{seconds}s.mp4",
+                            lambda path: make_test_video(path, width, height, seconds))
+
+
+class MockState:
+    """Configuration, assets and Sora jobs shared by all request handlers."""
+
+    def __init__(self, config: MockConfig, assets: AssetStore):
+        self.config = config
+        self.assets = assets
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.generations: Dict[str, Tuple[int, int, int]] = {}
+        self.requests: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def count(self, route: str):
+        with self.lock:
+            self.requests[route] = self.requests.get(route, 0) + 1
+
+    def delay(self, seconds: float):
+        jitter = self.config.latency_jitter
+        if seconds > 0:
+            time.sleep(seconds * random.uniform(1.0 - jitter, 1.0 + jitter))
+
+    def narrative(self, seed: str) -> str:
+        rng = random.Random(hashlib.sha256(seed.encode("utf-8")).hexdigest())
+        words = [rng.choice(WORDS) for _ in range(self.config.narrative_words)]
+        return " ".join(words).capitalize() + "."
+
+    def create_job(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        job_id = f"task_{uuid.uuid4().hex}"
+        job = {
+            "id": job_id,
+            "created": time.time(),
+            "width": int(body.get("width", 854)),
+            "height": int(body.get("height", 480)),
+            "n_seconds": int(body.get("n_seconds", 5)),
+            "n_variants": int(body.get("n_variants", 1)),
+            "fails": random.random() < self.config.job_failure_rate,
+            "generations": []
+        }
+        with self.lock:
+            self.jobs[job_id] = job
+        return self.job_status(job_id)
+
+    def job_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            elapsed = time.time() - job["created"]
+            if elapsed < self.config.sora_queue_seconds:
+                status = "queued"
+            elif elapsed < self.config.sora_queue_seconds + self.config.sora_run_seconds:
+                status = "running"
+            elif job["fails"]:
+                status = "failed"
+            else:
+                status = "succeeded"
+                if not job["generations"]:
+                    for _ in range(job["n_variants"]):
+                        generation_id = f"gen_{uuid.uuid4().hex}"
+                        self.generations[generation_id] = (job["width"], job["height"], job["n_seconds"])
+                        job["generations"].append({
+                            "id": generation_id,
+                            "job_id": job_id,
+                            "width": job["width"],
+                            "height": job["height"],
+                            "n_seconds": job["n_seconds"]
+                        })
+
+            response = {
+                "object": "video.generation.job",
+                "id": job_id,
+                "status": status,
+                "created_at": int(job["created"]),
+                "model": "sora",
+                "width": job["width"],
+                "height": job["height"],
+                "n_seconds": job["n_seconds"],
+                "n_variants": job["n_variants"],
+                "generations": list(job["generations"])
+            }
+            if status == "failed":
+                response["failure_reason"] = "mock_failure"
+            return response
+
+
+class MockAzureHandler(BaseHTTPRequestHandler):
+    """Routes the requests made by AzureOpenAIClient and AsyncAzureOpenAIClient."""
+
+    protocol_version = "HTTP/1.1"
+    server: "MockHTTPServer"
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    @property
+    def state(self) -> MockState:
+        return self.server.state
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        if CHAT_PATH.match(path):
+            self._api_call("chat", lambda: self._chat(body))
+        elif SPEECH_PATH.match(path):
+            self._api_call("speech", lambda: self._speech(body))
+        elif JOBS_PATH.match(path):
+            self._api_call("jobs", lambda: self._create_job(body))
+        else:
+            self._send_json(404, {"error": {"code": "NotFound", "message": f"No route for POST {path}"}})
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        status_match = JOB_STATUS_PATH.match(path)
+        content_match = CONTENT_PATH.match(path)
+
+        if status_match:
+            self._api_call("job_status", lambda: self._job_status(status_match.group(1)))
+        elif content_match:
+            self.state.count("content")
+            self._content(content_match.group(1))
+        else:
+            self._send_json(404, {"error": {"code": "NotFound", "message": f"No route for GET {path}"}})
+
+    def _api_call(self, route: str, handle):
+        """Count the request and inject the configured failures before handling it."""
+        self.state.count(route)
+        config = self.state.config
+        roll = random.random()
+        if roll < config.throttle_rate:
+            self.state.count(f"{route}_throttled")
+            self._send_json(429, {"error": {"code": "429", "message": "Rate limit exceeded (mock)"}}, headers={
+                "Retry-After": str(int(max(1, round(config.retry_after)))),
+                "retry-after-ms": str(int(config.retry_after * 1000))
+            })
+        elif roll < config.throttle_rate + config.failure_rate:
+            self.state.count(f"{route}_failed")
+            self._send_json(500, {"error": {"code": "InternalServerError", "message": "Injected failure (mock)"}})
+        else:
+            handle()
+
+    def _chat(self, body: Dict[str, Any]):
+        self.state.delay(self.state.config.chat_latency)
+        messages = body.get("messages", [])
+        system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+        user = next((m["content"] for m in messages if m.get("role") == "user"), "")
+        narrative = self.state.narrative(user)
+        response_format = body.get("response_format") or {}
+
+        if response_format.get("type") in ("json_schema", "json_object"):
+            fields = {
+                "narrative": narrative,
+                "tts_instructions": "Speak in a warm, steady voice with short pauses between sentences.",
+                "sora_prompt": f"Cinematic wide shot. {narrative}"
+            }
+            schema = response_format.get("json_schema", {}).get("schema", {})
+            properties = schema.get("properties") or {"narrative": None, "tts_instructions": None}
+            content = json.dumps({name: fields.get(name, "") for name in properties})
+        elif "sora" in system.lower() or "video" in system.lower():
+            content = f"Cinematic wide shot, golden hour lighting, slow dolly forward. {user}"
+        else:
+            content = narrative
+
+        prompt_tokens = (len(system) + len(user)) // 4
+        completion_tokens = len(content) // 4
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model") or "gpt-mock",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        })
+
+    def _speech(self, body: Dict[str, Any]):
+        config = self.state.config
+        output_format = body.get("response_format") or "mp3"
+        seconds = len(str(body.get("input", "")).split()) / config.words_per_second
+        path = self.state.assets.speech(seconds, output_format)
+        self.state.delay(config.tts_latency)
+
+        with open(path, "rb") as f:
+            data = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/pcm" if output_format == "pcm" else f"audio/{output_format}")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        # Pace the stream like a synthesizer running faster than real time
+        chunk_size = SPEECH_SAMPLE_RATE // 10 * 2
+        bytes_per_second = len(data) / seconds if seconds else 0
+        for offset in range(0, len(data), chunk_size):
+            chunk = data[offset:offset + chunk_size]
+            if config.tts_realtime_factor and bytes_per_second:
+                time.sleep(len(chunk) / bytes_per_second / config.tts_realtime_factor)
+            self.wfile.write(f"{len(chunk):X}\r\n".encode("ascii") + chunk + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _create_job(self, body: Dict[str, Any]):
+        self.state.delay(self.state.config.api_latency)
+        self._send_json(201, self.state.create_job(body))
+
+    def _job_status(self, job_id: str):
+        self.state.delay(self.state.config.api_latency)
+        status = self.state.job_status(job_id)
+        if status is None:
+            self._send_json(404, {"error": {"code": "NotFound", "message": f"Unknown job {job_id}"}})
+        else:
+            self._send_json(200, status)
+
+    def _content(self, generation_id: str):
+        with self.state.lock:
+            generation = self.state.generations.get(generation_id)
+        if generation is None:
+            self._send_json(404, {"error": {"code": "NotFound", "message": f"Unknown generation {generation_id}"}})
+            return
+        path = self.state.assets.video(*generation)
+        size = os.path.getsize(path)
+
+        start = 0
+        range_match = re.match(r"bytes=(\d+)-", self.headers.get("Range") or "")
+        if range_match:
+            start = int(range_match.group(1))
+            if start >= size:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{size - 1}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(size - start))
+        self.end_headers()
+
+        rate = self.state.config.download_bytes_per_second
+        with open(path, "rb") as f:
+            f.seek(start)
+            for chunk in iter(lambda: f.read(256 * 1024), b""):
+                if rate:
+                    time.sleep(len(chunk) / rate)
+                self.wfile.write(chunk)
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MockHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, state: MockState):
+        super().__init__(address, MockAzureHandler)
+        self.state = state
+
+
+class MockAzureServer:
+    """
+    Mock Azure OpenAI server running on a background thread.
+
+    Example:
+        with MockAzureServer(MockConfig(sora_run_seconds=1)) as server:
+            os.environ.update(server.environment())
+            client = AzureOpenAIClient()
+    """
+
+    def __init__(self, config: Optional[MockConfig] = None, host: str = "127.0.0.1", port: int = 0,
+                 assets_dir: str = os.path.join("output", "mock_assets")):
+        """
+        Args:
+            config: Latency and failure behaviour (defaults to MockConfig())
+            host: Interface to listen on
+            port: Port to listen on (0 picks a free port)
+            assets_dir: Directory of the canned speech and video files
+        """
+        self.state = MockState(config or MockConfig(), AssetStore(assets_dir))
+        self.httpd = MockHTTPServer((host, port), self.state)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def request_counts(self) -> Dict[str, int]:
+        """Requests received per route, including injected failures."""
+        with self.state.lock:
+            return dict(self.state.requests)
+
+    def environment(self) -> Dict[str, str]:
+        """Environment variables that point the clients at this server."""
+        return {
+            "AZURE_OPENAI_KEY": "mock-key",
+            "AZURE_OPENAI_ENDPOINT": self.url,
+            "AZURE_OPENAI_API_VERSION": "2025-01-01-preview",
+            "GPT_DEPLOYMENT_NAME": "gpt-mock",
+            "SORA_DEPLOYMENT_NAME": "sora-mock",
+            "AZURE_OPENAI_TTS_KEY": "mock-key",
+            "AZURE_OPENAI_TTS_ENDPOINT": self.url,
+            "TTS_DEPLOYMENT_NAME": "tts-mock"
+        }
+
+    def start(self) -> "MockAzureServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-azure", daemon=True)
+        self._thread.start()
+        logger.info(f"Mock Azure OpenAI server listening on {self.url}")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def add_config_arguments(parser: argparse.ArgumentParser):
+    """Add a command line option for every MockConfig field."""
+    for name, default in vars(MockConfig()).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(default), default=default)
+
+
+def config_from_arguments(args: argparse.Namespace) -> MockConfig:
+    return MockConfig(**{name: getattr(args, name) for name in vars(MockConfig())})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve mock Azure OpenAI chat, speech and Sora endpoints.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--assets-dir", default=os.path.join("output", "mock_assets"), help="Directory of the canned speech and videos")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockAzureServer(config_from_arguments(args), host=args.host, port=args.port, assets_dir=args.assets_dir)
+    print("Point the application at the mock server with:")
+    for name, value in server.environment().items():
+        print(f"{name}={value}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Background music library for the video generation application.
+This module decodes each music track once to a PCM cache file and serves it memory-mapped.
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from audio_mixer import SAMPLE_RATE, CHANNELS, decode_audio
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+MUSIC_DIR = Path(os.getenv("MUSIC_DIR", "background_music"))
+MUSIC_CACHE_DIR = Path(os.getenv("MUSIC_CACHE_DIR", os.path.join("output", "music_cache")))
+MUSIC_EXTENSIONS = (".mp3",)
+
+# Level below which the start and end of a track count as silence when finding loop points
+SILENCE_THRESHOLD = 1e-3
+
+
+@dataclass
+class TrackInfo:
+    """Metadata of a decoded music track."""
+    name: str
+    signature: str
+    frames: int
+    duration: float
+    loop_start: int
+    loop_end: int
+    rms_dbfs: float
+    peak: float
+
+
+def _signature(path: Path) -> str:
+    stat = path.stat()
+    return hashlib.sha1(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8")).hexdigest()[:16]
+
+
+class MusicLibrary:
+    """
+    Decoded, memory-mapped background music.
+
+    Every track is decoded once to 16-bit PCM at a fixed sample rate and
+    channel count and written to the cache directory. Reads go through
+    numpy.memmap, so processes using the same cache share the pages instead
+    of each holding a decoded copy. Track metadata (duration, loudness and
+    loop points) is kept in an in-memory index; a track is decoded again
+    when its file changes.
+    """
+
+    def __init__(self, music_dir: Path = MUSIC_DIR, cache_dir: Path = MUSIC_CACHE_DIR):
+        """
+        Initialize the library.
+
+        Args:
+            music_dir: Directory containing the music files
+            cache_dir: Directory for the decoded PCM files and their metadata
+        """
+        self.music_dir = Path(music_dir)
+        self.cache_dir = Path(cache_dir)
+        self._lock = threading.RLock()
+        self._dir_mtime: Optional[int] = None
+        self._files: Dict[str, Path] = {}
+        self._index: Dict[str, TrackInfo] = {}
+        self._maps: Dict[str, np.memmap] = {}
+
+    def refresh(self) -> bool:
+        """
+        Rescan the music directory if it changed since the last scan, and
+        forget the decoded tracks whose files were replaced.
+
+        Returns:
+            True if the directory was rescanned
+        """
+        with self._lock:
+            if not self.music_dir.exists():
+                if self._files:
+                    logger.warning(f"Music directory {self.music_dir} does not exist")
+                self._dir_mtime, self._files = None, {}
+                return False
+            mtime = self.music_dir.stat().st_mtime_ns
+            rescanned = mtime != self._dir_mtime
+            if rescanned:
+                self._files = {
+                    f.name: f for f in sorted(self.music_dir.iterdir())
+                    if f.is_file() and f.suffix.lower() in MUSIC_EXTENSIONS
+                }
+                self._dir_mtime = mtime
+                logger.info(f"Found {len(self._files)} music files in {self.music_dir}")
+            # Forget tracks that were removed or replaced; a track overwritten
+            # in place keeps its name and leaves the directory mtime unchanged
+            for name in list(self._index):
+                try:
+                    replaced = name not in self._files or self._index[name].signature != _signature(self._files[name])
+                except FileNotFoundError:
+                    replaced = True
+                if replaced:
+                    self._index.pop(name)
+                    self._maps.pop(name, None)
+            return rescanned
+
+    def tracks(self) -> List[str]:
+        """Return the names of all music files, sorted."""
+        with self._lock:
+            self.refresh()
+            return list(self._files)
+
+    def info(self, name: str) -> TrackInfo:
+        """Return the metadata of a track, decoding it first if needed."""
+        with self._lock:
+            self._ensure_decoded(name)
+            return self._index[name]
+
+    def samples(self, name: str) -> np.ndarray:
+        """Return the memory-mapped int16 samples of a track, shape (frames, channels)."""
+        with self._lock:
+            self._ensure_decoded(name)
+            if name not in self._maps:
+                info = self._index[name]
+                self._maps[name] = np.memmap(self._pcm_path(name, info.signature), dtype=np.int16,
+                                             mode="r", shape=(info.frames, CHANNELS))
+            return self._maps[name]
+
+    def load(self, name: str, max_duration: Optional[float] = None) -> np.ndarray:
+        """
+        Return the loopable part of a track as float32 samples.
+
+        Args:
+            name: File name of the track
+            max_duration: Optional number of seconds to return at most
+
+        Returns:
+            float32 array of shape (frames, channels), ready for audio_mixer
+        """
+        info = self.info(name)
+        samples = self.samples(name)[info.loop_start:info.loop_end]
+        if max_duration is not None:
+            samples = samples[:int(round(max_duration * SAMPLE_RATE))]
+        return samples.astype(np.float32) / 32768.0
+
+    def prepare(self):
+        """Decode every track that is not cached yet."""
+        for name in self.tracks():
+            self.info(name)
+
+    def _pcm_path(self, name: str, signature: str) -> Path:
+        return self.cache_dir / f"{Path(name).stem}.{signature}.pcm"
+
+    def _meta_path(self, name: str, signature: str) -> Path:
+        return self.cache_dir / f"{Path(name).stem}.{signature}.json"
+
+    def _ensure_decoded(self, name: str):
+        self.refresh()
+        if name in self._index:
+            return
+        if name not in self._files:
+            raise FileNotFoundError(f"Music track {name} not found in {self.music_dir}")
+
+        path = self._files[name]
+        signature = _signature(path)
+        pcm_path = self._pcm_path(name, signature)
+        meta_path = self._meta_path(name, signature)
+
+        if pcm_path.exists() and meta_path.exists():
+            with open(meta_path, "r", encoding="utf-8") as f:
+                self._index[name] = TrackInfo(**json.load(f))
+            return
+
+        logger.info(f"Decoding music track {name} into the music cache")
+        samples = decode_audio(str(path))
+        info = self._analyze(name, signature, samples)
+
+        # Write to temporary files and rename, so concurrent workers never see partial files
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+        tmp_pcm = pcm_path.with_name(f"{pcm_path.name}.{os.getpid()}.tmp")
+        pcm.tofile(tmp_pcm)
+        os.replace(tmp_pcm, pcm_path)
+        tmp_meta = meta_path.with_name(f"{meta_path.name}.{os.getpid()}.tmp")
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump(asdict(info), f)
+        os.replace(tmp_meta, meta_path)
+
+        self._index[name] = info
+
+    @staticmethod
+    def _analyze(name: str, signature: str, samples: np.ndarray) -> TrackInfo:
+        level = np.abs(samples).max(axis=1) if len(samples) else np.zeros(0)
+        audible = np.flatnonzero(level > SILENCE_THRESHOLD)
+        loop_start = int(audible[0]) if audible.size else 0
+        loop_end = int(audible[-1]) + 1 if audible.size else len(samples)
+        rms = float(np.sqrt(np.mean(np.square(samples, dtype=np.float64)))) if samples.size else 0.0
+        return TrackInfo(
+            name=name,
+            signature=signature,
+            frames=len(samples),
+            duration=len(samples) / SAMPLE_RATE,
+            loop_start=loop_start,
+            loop_end=loop_end,
+            rms_dbfs=float(20 * np.log10(rms)) if rms > 0 else float("-inf"),
+            peak=float(level.max()) if level.size else 0.0
+        )
+
+
+_libraries: Dict[Path, MusicLibrary] = {}
+_libraries_lock = threading.Lock()
+
+
+def get_music_library(music_dir: Path = MUSIC_DIR) -> MusicLibrary:
+    """Return the process-wide library for a music directory."""
+    key = Path(music_dir).resolve()
+    with _libraries_lock:
+        if key not in _libraries:
+            _libraries[key] = MusicLibrary(music_dir)
+        return _libraries[key]
+
+
+def load_music(path: str, max_duration: Optional[float] = None) -> np.ndarray:
+    """
+    Load a music file through the library of its directory.
+
+    Args:
+        path: Path to the music file
+        max_duration: Optional number of seconds to return at most
+
+    Returns:
+        float32 samples of shape (frames, channels)
+    """
+    music_path = Path(path)
+    return get_music_library(music_path.parent).load(music_path.name, max_duration)
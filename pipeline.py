@@ -0,0 +1,524 @@
+"""
+Pipeline orchestration for the AI video generation application.
+This module runs the teaser generation steps as a dependency graph.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from dataclasses import asdict, dataclass, field
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+from artifacts import discard_files
+from audio_mixer import TTS_PCM_INPUT_ARGS, decode_audio, read_wav, speech_duration, to_wav_bytes
+from azure_openai_utils import NarrativeBundle
+from clip_index import CLIP_REUSE_ENABLED, CLIP_REUSE_THRESHOLD, get_clip_index
+from duration_planner import MAX_TIME_STRETCH, DurationPlan, get_duration_planner
+from job_store import JobStore
+from renditions import VIDEO_RENDITIONS, parse_renditions, render_renditions
+from retry import call_with_retries, is_transient_error
+from telemetry import Span, get_telemetry
+from video_editor import (
+    ENCODER_PROFILE, VIDEO_STREAMING_FORMATS, combine_video_and_audio, make_preview, package_for_streaming
+)
+from video_scoring import pick_best_video
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Generate the Sora instructions in the same call as the narrative instead of a separate one
+NARRATIVE_INCLUDE_SORA_PROMPT = os.getenv("NARRATIVE_INCLUDE_SORA_PROMPT", "false").lower() in ("1", "true", "yes")
+
+# Number of video variants generated per Sora job; the best scoring one is used
+SORA_VARIANTS = int(os.getenv("SORA_VARIANTS", "1"))
+
+# "predicted" sizes the Sora clip from the narration's word count, so the Sora job
+# starts while the speech is still being synthesized; "measured" sizes it from the
+# synthesized narration, which is exact but makes the Sora job wait for speech synthesis
+DURATION_SOURCE = os.getenv("SORA_DURATION_SOURCE", "predicted")
+
+# Make a quick preview to show while the final video is assembled
+VIDEO_PREVIEW = os.getenv("VIDEO_PREVIEW", "true").lower() in ("1", "true", "yes")
+
+
+@dataclass
+class Stage:
+    """A single step of the pipeline and the stages it depends on."""
+    name: str
+    func: Callable[..., Any]
+    depends_on: Sequence[str] = ()
+
+
+@dataclass
+class StageTiming:
+    """Wall-clock timing of a completed stage, relative to the pipeline start."""
+    name: str
+    started: float
+    finished: float
+
+    @property
+    def duration(self) -> float:
+        return self.finished - self.started
+
+
+@dataclass
+class PipelineResult:
+    """Results and timings of a pipeline run."""
+    results: Dict[str, Any] = field(default_factory=dict)
+    timings: Dict[str, StageTiming] = field(default_factory=dict)
+    wall_time: float = 0.0
+
+    def timing_report(self) -> str:
+        """Return a human readable summary of per-stage timings."""
+        lines = [
+            f"{t.name}: {t.duration:.2f}s (started at +{t.started:.2f}s)"
+            for t in sorted(self.timings.values(), key=lambda t: t.started)
+        ]
+        lines.append(f"total wall time: {self.wall_time:.2f}s")
+        return "\n".join(lines)
+
+
+class Pipeline:
+    """
+    Runs stages as a dependency graph.
+
+    Every stage is started as soon as all of its dependencies have finished,
+    so independent branches run concurrently on a thread pool. Each stage
+    function is called with the results of its dependencies as keyword
+    arguments named after the dependency stages.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Stage] = {}
+
+    def add_stage(self, name: str, func: Callable[..., Any], depends_on: Sequence[str] = ()) -> "Pipeline":
+        """
+        Add a stage to the pipeline.
+
+        Args:
+            name: Unique stage name, also used as keyword argument for dependants
+            func: Callable executed for the stage
+            depends_on: Names of stages whose results the stage needs
+
+        Returns:
+            The pipeline itself, to allow chaining
+        """
+        if name in self.stages:
+            raise ValueError(f"Duplicate pipeline stage: {name}")
+        for dependency in depends_on:
+            if dependency not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dependency}'")
+        self.stages[name] = Stage(name, func, tuple(depends_on))
+        return self
+
+    def run(self, max_workers: Optional[int] = None,
+            on_stage_complete: Optional[Callable[[str, Any], None]] = None,
+            stage_limits: Optional[Dict[str, threading.Semaphore]] = None) -> PipelineResult:
+        """
+        Execute the pipeline.
+
+        Args:
+            max_workers: Maximum number of stages running at the same time
+            on_stage_complete: Optional callback invoked with the stage name and
+                result whenever a stage finishes. It always runs on the calling
+                thread, so it is safe to update the UI from it.
+            stage_limits: Optional semaphores by stage name, shared between
+                pipeline runs to bound how many instances of a stage run at once.
+                Stage timings exclude the time spent waiting for a semaphore.
+
+        Returns:
+            PipelineResult with the result and timing of every stage
+        """
+        pipeline_result = PipelineResult()
+        pending: List[str] = list(self.stages)
+        running = {}
+        start = time.perf_counter()
+
+        executor = ThreadPoolExecutor(max_workers=max_workers or len(self.stages) or 1, thread_name_prefix="pipeline")
+        with get_telemetry().span("pipeline") as job_span:
+            try:
+                while pending or running:
+                    # Start every stage whose dependencies are satisfied
+                    for name in list(pending):
+                        stage = self.stages[name]
+                        if all(dep in pipeline_result.results for dep in stage.depends_on):
+                            kwargs = {dep: pipeline_result.results[dep] for dep in stage.depends_on}
+                            logger.info(f"Starting stage '{name}'")
+                            limit = (stage_limits or {}).get(name)
+                            future = executor.submit(self._run_stage, stage, kwargs, start, limit, job_span)
+                            running[future] = name
+                            pending.remove(name)
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        result, timing = future.result()
+                        pipeline_result.results[name] = result
+                        pipeline_result.timings[name] = timing
+                        logger.info(f"Stage '{name}' finished in {timing.duration:.2f}s")
+                        if on_stage_complete:
+                            on_stage_complete(name, result)
+            except Exception:
+                # Fail right away: stages still running are abandoned instead of
+                # joined, and their results are discarded when they finish
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+        executor.shutdown()
+
+        pipeline_result.wall_time = time.perf_counter() - start
+        logger.info(f"Pipeline finished in {pipeline_result.wall_time:.2f}s")
+        return pipeline_result
+
+    @staticmethod
+    def _run_stage(stage: Stage, kwargs: Dict[str, Any], start: float, limit: Optional[threading.Semaphore] = None,
+                   parent: Optional[Span] = None):
+        telemetry = get_telemetry()
+        if limit is not None:
+            waited = time.perf_counter()
+            limit.acquire()
+            telemetry.observe("stage_queue_seconds", time.perf_counter() - waited, stage=stage.name)
+        try:
+            started = time.perf_counter() - start
+            with telemetry.span("stage", parent=parent, labels={"stage": stage.name}):
+                result = stage.func(**kwargs)
+            finished = time.perf_counter() - start
+        except Exception as e:
+            logger.error(f"Stage '{stage.name}' failed: {str(e)}")
+            raise
+        finally:
+            if limit is not None:
+                limit.release()
+        return result, StageTiming(stage.name, started, finished)
+
+
+def build_teaser_pipeline(client, prompt: str, output_path: str, voice: str = "alloy",
+                          background_music_path: Optional[str] = None, music_volume: float = 0.3,
+                          width: int = 854, height: int = 480, job_store: Optional[JobStore] = None,
+                          job_id: Optional[str] = None, tts_style: Optional[str] = None,
+                          include_sora_prompt: bool = NARRATIVE_INCLUDE_SORA_PROMPT,
+                          fresh_narrative: bool = False,
+                          n_variants: int = SORA_VARIANTS, duration_source: str = DURATION_SOURCE,
+                          max_stretch: float = MAX_TIME_STRETCH,
+                          renditions: Sequence[Union[str, Dict[str, Any]]] = VIDEO_RENDITIONS,
+                          encoder_profile: str = ENCODER_PROFILE,
+                          reuse_threshold: Optional[float] = CLIP_REUSE_THRESHOLD if CLIP_REUSE_ENABLED else None,
+                          preview: bool = VIDEO_PREVIEW,
+                          streaming: Sequence[str] = VIDEO_STREAMING_FORMATS) -> Pipeline:
+    """
+    Build the teaser video pipeline.
+
+    The narrative is generated first, together with its delivery instructions
+    in a single structured-output call (the "narrative" stage result is a
+    NarrativeBundle). Speech synthesis and the Sora branch (instructions,
+    then video) only depend on it and run in parallel. Speech is streamed
+    and decoded while it arrives; the "audio" stage result is the narration
+    as float32 samples (see audio_mixer). Both branches are joined when the
+    video and audio are combined.
+
+    The "plan" stage sizes the Sora clip to the narration (see
+    duration_planner) instead of always paying for 20 seconds. Narration
+    that is slightly too long for the clip is sped up by at most max_stretch.
+
+    With n_variants > 1 a single Sora job generates several videos
+    ("video_variants" stage). Once the narration is ready, the variants are
+    scored on sampled frames and the best one becomes the "video" result.
+
+    With a reuse_threshold, the clip index is searched for a clip generated
+    for a similar earlier prompt (same size, long enough for the narration)
+    before a Sora job is started. A match becomes the "video" result and gets
+    the new narration and music; its details are recorded as the
+    "reused_clip" stage. Newly generated clips are added to the index once
+    the final video has been made from them.
+
+    With preview, a "preview" stage makes a quick proxy (narration only, no
+    re-encode if avoidable; see video_editor.make_preview) as soon as the
+    video and narration are ready. It runs next to the final assembly, so
+    the app can show it while the full-quality video is made. A failed
+    preview does not fail the job.
+
+    Stages that fail with a transient network or server error are retried.
+    With a job store, the artifact of every completed stage is recorded under
+    job_id and reused when the same job is built again, so a failed run
+    resumes from the last completed stage. The Sora job id is recorded as
+    soon as the job is created, so a resumed run re-attaches to the job
+    instead of paying for a new one.
+
+    Args:
+        client: AzureOpenAIClient used for the model calls
+        prompt: User prompt describing the desired video
+        output_path: Path for the final video file
+        voice: The voice to use for the narration
+        background_music_path: Optional path to a background music file
+        music_volume: Volume level for background music (0.0 to 1.0)
+        width: Width of the generated video in pixels
+        height: Height of the generated video in pixels
+        job_store: Optional store for the stage checkpoints
+        job_id: Id of the job in job_store
+        tts_style: Optional TTS style preset used instead of the generated delivery instructions
+        include_sora_prompt: Generate the Sora instructions in the narrative call as well
+        fresh_narrative: Write a new narrative even if one for the same prompt is cached
+        n_variants: Number of video variants to generate and choose from
+        duration_source: "measured" or "predicted" narration length for sizing the clip
+        max_stretch: Maximum speed-up of the narration (0.1 = 10% faster), 0 to disable
+        renditions: Extra deliverables made from the final video, as names from
+            renditions.RENDITION_LADDER or dicts of Rendition fields
+        encoder_profile: Name of the video_editor encoder profile used if the video has to be re-encoded
+        reuse_threshold: Minimum prompt similarity (0.0 to 1.0) for reusing an indexed clip,
+            or None to neither reuse nor index clips
+        preview: Make a quick preview next to the final video
+        streaming: Streaming packages made from the final video, as names from
+            video_editor.STREAMING_FORMATS ("fmp4", "hls", "dash")
+
+    Returns:
+        Pipeline ready to run
+    """
+    if duration_source not in ("measured", "predicted"):
+        raise ValueError(f"Unknown duration source: {duration_source}")
+    renditions = parse_renditions(renditions)
+    if job_store is not None and job_id is None:
+        raise ValueError("A job_id is required when checkpointing to a job store")
+    checkpoints = job_store.load_stages(job_id) if job_store else {}
+
+    def existing_file(path: str) -> Optional[str]:
+        return path if os.path.exists(path) else None
+
+    def save_audio(voice) -> str:
+        audio_path = job_store.artifact_dir(job_id) / "narration.wav"
+        with open(audio_path, "wb") as f:
+            f.write(to_wav_bytes(voice))
+        return str(audio_path)
+
+    def load_audio(audio_path: str):
+        # Checkpoints written before streaming synthesis hold MP3 bytes
+        if not audio_path.endswith(".wav") or not os.path.exists(audio_path):
+            return None
+        return read_wav(audio_path)
+
+    def existing_files(value: str) -> Optional[List[str]]:
+        paths = json.loads(value)
+        return paths if all(os.path.exists(path) for path in paths) else None
+
+    def existing_outputs(value: str) -> Optional[Dict[str, str]]:
+        paths = json.loads(value)
+        return paths if all(os.path.exists(path) for path in paths.values()) else None
+
+    def save_plan(plan: DurationPlan) -> str:
+        return json.dumps(asdict(plan))
+
+    def load_plan(value: str) -> DurationPlan:
+        return DurationPlan(**json.loads(value))
+
+    def save_bundle(bundle: NarrativeBundle) -> str:
+        return json.dumps(asdict(bundle))
+
+    def load_bundle(value: str) -> Optional[NarrativeBundle]:
+        try:
+            return NarrativeBundle(**json.loads(value))
+        except (ValueError, TypeError):
+            # Checkpoint written before narratives were bundled
+            return None
+
+    def checkpointed(name: str, func: Callable[..., Any], save: Callable[[Any], str] = str,
+                     load: Callable[[str], Any] = lambda value: value) -> Callable[..., Any]:
+        # load returns None if the recorded artifact is no longer usable
+        def run(**kwargs):
+            if name in checkpoints:
+                result = load(checkpoints[name])
+                if result is not None:
+                    logger.info(f"Reusing checkpointed result of stage '{name}'")
+                    return result
+            result = call_with_retries(lambda: func(**kwargs), description=f"stage '{name}'")
+            if job_store is not None:
+                job_store.save_stage(job_id, name, save(result))
+            return result
+        return run
+
+    sora_job = {"id": checkpoints.get("sora_job")}
+
+    def record_sora_job(sora_job_id: str):
+        sora_job["id"] = sora_job_id
+        if job_store is not None:
+            job_store.save_stage(job_id, "sora_job", sora_job_id)
+
+    def synthesize_narration(narrative: NarrativeBundle):
+        # Raw PCM is streamed straight into the decoder, which resamples it for the mixer
+        audio = decode_audio(
+            client.stream_tts(
+                narrative.narrative,
+                voice=voice,
+                instructions=None if tts_style else narrative.tts_instructions,
+                style=tts_style
+            ),
+            input_args=TTS_PCM_INPUT_ARGS
+        )
+        if duration_source == "predicted":
+            # The plan did not see this narration; learn the voice's speaking rate from it anyway
+            get_duration_planner().record(voice, narrative.narrative, speech_duration(audio))
+        return audio
+
+    def plan_clip(narrative: NarrativeBundle, audio=None) -> DurationPlan:
+        return get_duration_planner().plan(narrative.narrative, voice, width, height, samples=audio,
+                                           max_stretch=max_stretch)
+
+    # Raw Sora clips belong to the job and are deleted once it succeeds (see run_checkpointed)
+    clip_dir = str(job_store.artifact_dir(job_id)) if job_store else (os.path.dirname(output_path) or "output")
+
+    def generate_video(sora_instructions: str, plan: DurationPlan):
+        if reuse_threshold is not None and not sora_job["id"]:
+            match = get_clip_index().find(prompt, plan.n_seconds, plan.width, plan.height, threshold=reuse_threshold)
+            if match is not None:
+                if job_store is not None:
+                    job_store.save_stage(job_id, "reused_clip", json.dumps(asdict(match)))
+                return [match.path] if n_variants > 1 else match.path
+        size = {"duration_seconds": plan.n_seconds, "width": plan.width, "height": plan.height, "output_path": clip_dir}
+        if sora_job["id"]:
+            future = client.attach_video_job(sora_job["id"], output_path=clip_dir, all_variants=n_variants > 1)
+        elif n_variants > 1:
+            future = client.submit_video_variants(sora_instructions, n_variants, on_job_created=record_sora_job, **size)
+        else:
+            future = client.submit_video(sora_instructions, on_job_created=record_sora_job, **size)
+        try:
+            return future.result()
+        except Exception as e:
+            if not is_transient_error(e):
+                # The Sora job itself failed or timed out; create a new one next time
+                sora_job["id"] = None
+                if job_store is not None:
+                    job_store.clear_stage(job_id, "sora_job")
+            raise
+
+    pipeline = Pipeline()
+    pipeline.add_stage(
+        "narrative",
+        checkpointed("narrative",
+                     lambda: client.generate_narrative_bundle(prompt, include_sora_prompt=include_sora_prompt,
+                                                              fresh=fresh_narrative),
+                     save=save_bundle, load=load_bundle)
+    )
+    pipeline.add_stage(
+        "audio",
+        checkpointed(
+            "audio",
+            synthesize_narration,
+            save=save_audio,
+            load=load_audio
+        ),
+        depends_on=["narrative"]
+    )
+    pipeline.add_stage(
+        "sora_instructions",
+        checkpointed("sora_instructions",
+                     lambda narrative: narrative.sora_prompt or client.generate_sora_instructions(narrative.narrative)),
+        depends_on=["narrative"]
+    )
+    pipeline.add_stage("plan", checkpointed("plan", plan_clip, save=save_plan, load=load_plan),
+                       depends_on=["narrative", "audio"] if duration_source == "measured" else ["narrative"])
+    if n_variants > 1:
+        pipeline.add_stage("video_variants",
+                           checkpointed("video_variants", generate_video, save=json.dumps, load=existing_files),
+                           depends_on=["sora_instructions", "plan"])
+        # The narration has to fit in the chosen clip; measured like the plan, without trailing silence
+        pipeline.add_stage(
+            "video",
+            checkpointed("video",
+                         lambda video_variants, audio: pick_best_video(video_variants, speech_duration(audio))[0],
+                         load=existing_file),
+            depends_on=["video_variants", "audio"]
+        )
+    else:
+        pipeline.add_stage("video", checkpointed("video", generate_video, load=existing_file),
+                           depends_on=["sora_instructions", "plan"])
+    def make_preview_video(video: str, audio) -> str:
+        if job_store is not None:
+            preview_path = str(job_store.artifact_dir(job_id) / "preview.mp4")
+        else:
+            preview_path = f"{os.path.splitext(output_path)[0]}_preview.mp4"
+        try:
+            return make_preview(video, audio, preview_path, max_stretch=max_stretch, scratch_key=job_id)
+        except Exception as e:
+            # The final video is what counts; an empty path is retried on resume
+            logger.warning(f"Could not make the preview: {str(e)}")
+            return ""
+
+    if preview:
+        # Added before the final video, so it is started first once both can run
+        pipeline.add_stage("preview", checkpointed("preview", make_preview_video, load=existing_file),
+                           depends_on=["video", "audio"])
+
+    def make_final_video(video: str, audio, plan: DurationPlan) -> str:
+        final_video = combine_video_and_audio(
+            video,
+            audio,
+            output_path,
+            background_music_path=background_music_path,
+            music_volume=music_volume,
+            max_stretch=max_stretch,
+            profile=encoder_profile,
+            scratch_key=job_id
+        )
+        if reuse_threshold is not None and os.path.dirname(os.path.abspath(video)) != os.path.abspath(get_clip_index().clip_dir):
+            try:
+                get_clip_index().add(prompt, video, plan.n_seconds, plan.width, plan.height)
+            except Exception as e:
+                # Losing a chance of reuse must not fail the job
+                logger.warning(f"Could not add the clip to the clip index: {str(e)}")
+        return final_video
+
+    pipeline.add_stage(
+        "final_video",
+        checkpointed("final_video", make_final_video, load=existing_file),
+        depends_on=["video", "audio", "plan"]
+    )
+    if renditions:
+        # All deliverables are encoded from a single decode of the final video
+        pipeline.add_stage(
+            "renditions",
+            checkpointed("renditions", lambda final_video: render_renditions(final_video, renditions, scratch_key=job_id),
+                         save=json.dumps, load=existing_outputs),
+            depends_on=["final_video"]
+        )
+    if streaming:
+        # Stream copies only, so this runs next to the renditions at little cost
+        pipeline.add_stage(
+            "streaming",
+            checkpointed("streaming", lambda final_video: package_for_streaming(final_video, list(streaming), scratch_key=job_id),
+                         save=json.dumps, load=existing_outputs),
+            depends_on=["final_video"]
+        )
+    return pipeline
+
+
+def run_checkpointed(pipeline: Pipeline, job_store: JobStore, job_id: str, **run_kwargs: Any) -> PipelineResult:
+    """
+    Run a pipeline built with a job store and record the outcome of the job.
+
+    Once the job succeeded, its raw Sora clips and the preview are deleted
+    from the job's artifact directory; only the final video and renditions
+    are kept.
+
+    Args:
+        pipeline: Pipeline built by build_teaser_pipeline with job_store and job_id
+        job_store: The job store the pipeline checkpoints to
+        job_id: Id of the job
+        **run_kwargs: Passed on to Pipeline.run
+
+    Returns:
+        PipelineResult of the run
+    """
+    job_store.set_status(job_id, "running")
+    try:
+        result = pipeline.run(**run_kwargs)
+    except Exception as e:
+        job_store.set_status(job_id, "failed", error=str(e))
+        raise
+    job_store.set_status(job_id, "succeeded")
+
+    stages = job_store.load_stages(job_id)
+    intermediates = json.loads(stages.get("video_variants", "[]"))
+    intermediates += [stages[name] for name in ("video", "preview") if stages.get(name)]
+    discard_files(intermediates, str(job_store.artifact_dir(job_id)))
+    return result
@@ -0,0 +1,247 @@
+"""
+Prompt assets for the video generation application.
+This module loads the video generation guide once per process and renders the Sora system prompt from it.
+"""
+
+import os
+import re
+import math
+import logging
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+GUIDE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "video_generation_guide.md")
+
+# "full" sends the whole guide, "condensed" only the core sections plus the
+# example sections that best match the narrative
+GUIDE_MODE = os.getenv("SORA_GUIDE_MODE", "condensed")
+GUIDE_MAX_SECTIONS = int(os.getenv("SORA_GUIDE_MAX_SECTIONS", "6"))
+
+# Top-level sections of the guide that are always included in the condensed prompt
+CORE_SECTIONS = (
+    "4. Understanding Cinematic Language",
+    "5. Aligning Mood and Message with Camera Shots",
+    "6. Enhancing Narratives with Camera Movements",
+    "7. Combining Shots and Movements in Prompts",
+    "8. Incorporating Contextual Details",
+    "9. Best Practices and Tips",
+    "10. Common Mistakes to Avoid",
+    "11. Advanced Techniques",
+)
+
+# Top-level section whose subsections are ranked against the narrative
+EXAMPLES_SECTION = "18. Appendix: Collection of Video Prompts"
+
+SORA_SYSTEM_MESSAGE_TEMPLATE = """
+            You are an expert at creating prompts for AI video generation models like Sora. Convert the provided narrative into a detailed set of instructions for generating video. Follow these guidelines:
+            {guide}
+            answer in text and avoid markdown or any special characters. avoid new lines (\\n) and maximum of 2000 words.
+            """
+
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from in into is it its of on or that the their this to with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokenizer used for the section index."""
+    return [token for token in re.findall(r"[a-z0-9]+", text.lower()) if token not in _STOPWORDS]
+
+
+@dataclass
+class GuideSection:
+    """A heading of the guide together with the text directly below it."""
+    title: str
+    level: int
+    top_level: str
+    text: str
+    tokens: List[str] = field(default_factory=list)
+
+
+class BM25Index:
+    """Small Okapi BM25 index over pre-tokenized documents."""
+
+    def __init__(self, documents: Sequence[List[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_counts = [Counter(doc) for doc in documents]
+        self.lengths = [len(doc) for doc in documents]
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        document_frequency = Counter(term for counts in self.term_counts for term in counts)
+        n = len(documents)
+        self.idf: Dict[str, float] = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()
+        }
+
+    def scores(self, query: List[str]) -> List[float]:
+        """Return the BM25 score of every document for the query tokens."""
+        results = []
+        for counts, length in zip(self.term_counts, self.lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / self.avg_length) if self.avg_length else self.k1
+            for term in query:
+                tf = counts.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            results.append(score)
+        return results
+
+
+def parse_sections(markdown: str) -> List[GuideSection]:
+    """Split a markdown document into sections at every heading."""
+    sections: List[GuideSection] = []
+    top_level = ""
+    current: Optional[GuideSection] = None
+    body: List[str] = []
+
+    def flush():
+        if current is not None:
+            current.text = "\n".join(body).strip()
+            # Headings are counted twice so they weigh more than body text
+            current.tokens = tokenize(current.title) * 2 + tokenize(current.text)
+            sections.append(current)
+
+    for line in markdown.split("\n"):
+        match = re.match(r"^(#{1,6})\s+(.*)", line)
+        if match:
+            flush()
+            level = len(match.group(1))
+            title = match.group(2).strip()
+            if level <= 2:
+                top_level = title
+            current = GuideSection(title=title, level=level, top_level=top_level, text="")
+            body = [line]
+        else:
+            body.append(line)
+    flush()
+    return sections
+
+
+class PromptAssetManager:
+    """
+    Loads the video generation guide and keeps derived prompt assets in memory.
+
+    The guide is read once and only reloaded when its modification time
+    changes. The full system message is rendered once per load; the condensed
+    variant keeps the core guidance and adds the example sections that rank
+    best for the narrative in a BM25 index over the guide's sections.
+    """
+
+    def __init__(self, guide_path: str = GUIDE_PATH, core_sections: Sequence[str] = CORE_SECTIONS,
+                 examples_section: str = EXAMPLES_SECTION, max_sections: int = GUIDE_MAX_SECTIONS):
+        """
+        Initialize the manager.
+
+        Args:
+            guide_path: Path to the markdown guide
+            core_sections: Top-level section titles always included in the condensed prompt
+            examples_section: Top-level section whose subsections are selected per narrative
+            max_sections: Number of example sections added to the condensed prompt
+        """
+        self.guide_path = guide_path
+        self.core_sections = tuple(core_sections)
+        self.examples_section = examples_section
+        self.max_sections = max_sections
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._guide = ""
+        self._sections: List[GuideSection] = []
+        self._core_text = ""
+        self._candidates: List[GuideSection] = []
+        self._index: Optional[BM25Index] = None
+        self._full_message = ""
+
+    def _refresh(self):
+        mtime = os.stat(self.guide_path).st_mtime
+        if mtime == self._mtime:
+            return
+        with open(self.guide_path, "r", encoding="utf-8") as f:
+            guide = f.read()
+
+        sections = parse_sections(guide)
+        core = [s for s in sections if s.top_level in self.core_sections]
+        candidates = [s for s in sections if s.top_level == self.examples_section and s.level > 2 and s.tokens]
+
+        self._guide = guide
+        self._sections = sections
+        self._core_text = "\n\n".join(s.text for s in core)
+        self._candidates = candidates
+        self._index = BM25Index([s.tokens for s in candidates])
+        self._full_message = SORA_SYSTEM_MESSAGE_TEMPLATE.format(guide=guide)
+        self._mtime = mtime
+        logger.info(f"Loaded video generation guide ({len(guide)} characters, {len(sections)} sections)")
+
+    def guide(self) -> str:
+        """Return the full text of the guide."""
+        with self._lock:
+            self._refresh()
+            return self._guide
+
+    def sections(self) -> List[GuideSection]:
+        """Return the parsed sections of the guide."""
+        with self._lock:
+            self._refresh()
+            return list(self._sections)
+
+    def select_sections(self, narrative: str, max_sections: Optional[int] = None) -> List[GuideSection]:
+        """
+        Select the example sections most relevant to a narrative.
+
+        Args:
+            narrative: The narrative text for the video
+            max_sections: Number of sections to return (defaults to the manager's setting)
+
+        Returns:
+            The best matching sections, in guide order
+        """
+        limit = self.max_sections if max_sections is None else max_sections
+        with self._lock:
+            self._refresh()
+            candidates, index = self._candidates, self._index
+        scores = index.scores(tokenize(narrative))
+        ranked = sorted(range(len(candidates)), key=lambda i: scores[i], reverse=True)
+        chosen = sorted(i for i in ranked[:limit] if scores[i] > 0)
+        return [candidates[i] for i in chosen]
+
+    def sora_system_message(self, narrative: Optional[str] = None, mode: str = GUIDE_MODE) -> str:
+        """
+        Render the system message for Sora instruction generation.
+
+        Args:
+            narrative: The narrative text, used to pick sections in condensed mode
+            mode: "full" for the whole guide or "condensed" for the selected sections
+
+        Returns:
+            The system message text
+        """
+        if mode == "full" or narrative is None:
+            with self._lock:
+                self._refresh()
+                return self._full_message
+        if mode != "condensed":
+            raise ValueError(f"Unknown guide mode: {mode}")
+
+        selected = self.select_sections(narrative)
+        with self._lock:
+            core_text = self._core_text
+        guide = "\n\n".join([core_text] + [s.text for s in selected])
+        return SORA_SYSTEM_MESSAGE_TEMPLATE.format(guide=guide)
+
+
+_default_manager: Optional[PromptAssetManager] = None
+_default_manager_lock = threading.Lock()
+
+
+def get_prompt_assets() -> PromptAssetManager:
+    """Return the process-wide prompt asset manager."""
+    global _default_manager
+    with _default_manager_lock:
+        if _default_manager is None:
+            _default_manager = PromptAssetManager()
+        return _default_manager
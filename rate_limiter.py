@@ -0,0 +1,318 @@
+"""
+Client-side rate limiting for the video generation application.
+This module keeps calls to each Azure OpenAI deployment within its request and token quotas.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from retry import backoff_delay, is_transient_error
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Number of times a throttled (429) call is retried after waiting for Retry-After
+MAX_THROTTLE_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "5"))
+
+# Number of times a call that failed with a connection error, timeout or 5xx
+# is retried with backoff (the OpenAI SDK's own retries are turned off)
+MAX_TRANSIENT_RETRIES = int(os.getenv("RATE_LIMIT_TRANSIENT_RETRIES", "2"))
+
+# Wait used when a 429 response carries no Retry-After header
+DEFAULT_RETRY_AFTER = 10.0
+
+# Seconds of quota that may be used in a single burst
+BURST_SECONDS = 10.0
+
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
+def estimate_tokens(text: str, max_tokens: int = 0) -> int:
+    """
+    Estimate the tokens a chat call counts against the tokens-per-minute quota.
+
+    Azure counts the prompt plus the requested max_tokens; the prompt is
+    estimated at four characters per token.
+    """
+    return len(text) // 4 + 1 + max_tokens
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """
+    Return how long to wait if error is a 429 response, or None otherwise.
+
+    Works with requests, httpx and openai errors, which all carry the HTTP
+    response in a "response" attribute.
+    """
+    response = getattr(error, "response", None)
+    if response is None or getattr(response, "status_code", None) != 429:
+        return None
+    header = response.headers.get("Retry-After") or response.headers.get("retry-after")
+    if not header:
+        return DEFAULT_RETRY_AFTER
+    try:
+        return max(0.0, float(header))
+    except ValueError:
+        # HTTP date format
+        try:
+            return max(0.0, parsedate_to_datetime(header).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return DEFAULT_RETRY_AFTER
+
+
+class RateLimitedError(Exception):
+    """Raised by non-blocking calls when the quota has no room; wait holds the seconds until it has."""
+
+    def __init__(self, name: str, wait: float):
+        super().__init__(f"Deployment {name} is rate limited for {wait:.1f}s")
+        self.wait = wait
+
+
+class TokenBucket:
+    """
+    Reservation-based token bucket.
+
+    Callers reserve capacity and are told how long to wait before using it.
+    The balance may go negative, so reservations are served strictly in
+    arrival order and the sustained rate stays at the configured limit.
+    """
+
+    def __init__(self, per_minute: float, burst_seconds: float = BURST_SECONDS):
+        """
+        Initialize the bucket.
+
+        Args:
+            per_minute: Sustained rate in units per minute
+            burst_seconds: Seconds of rate that can be used at once
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.available = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Reserve amount units and return the seconds to wait before using them."""
+        with self._lock:
+            now = time.monotonic()
+            self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+            self.updated = now
+            # Charged in full: a reservation larger than the burst drives the
+            # balance negative, which delays it and every later caller until
+            # the rate has paid for it
+            self.available -= amount
+            return 0.0 if self.available >= 0 else -self.available / self.rate
+
+    def try_reserve(self, amount: float) -> float:
+        """
+        Reserve amount units only if that needs no wait.
+
+        Returns:
+            0.0 if the units were reserved, otherwise the seconds until they
+            could be (nothing is reserved then)
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+            self.updated = now
+            needed = min(amount, self.capacity)
+            if self.available >= needed:
+                self.available -= amount
+                return 0.0
+            return (needed - self.available) / self.rate
+
+
+class DeploymentGovernor:
+    """
+    Rate limiter and concurrency cap for one deployment.
+
+    Combines a requests-per-minute bucket, an optional tokens-per-minute
+    bucket and an optional cap on concurrent operations (used for in-flight
+    Sora jobs). A 429 response pauses all callers until its Retry-After time.
+    """
+
+    def __init__(self, name: str, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None, max_concurrency: Optional[int] = None):
+        """
+        Initialize the governor.
+
+        Args:
+            name: Deployment name, used in log messages
+            requests_per_minute: Request quota, or None for no limit
+            tokens_per_minute: Token quota, or None for no limit
+            max_concurrency: Maximum concurrent operations, or None for no limit
+        """
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: int = 0) -> float:
+        """Reserve one request and the given tokens; return the seconds to wait."""
+        delay = 0.0
+        if self.requests:
+            delay = max(delay, self.requests.reserve(1))
+        if self.tokens and tokens:
+            delay = max(delay, self.tokens.reserve(tokens))
+        with self._lock:
+            delay = max(delay, self._blocked_until - time.monotonic())
+        return delay
+
+    def try_reserve(self, tokens: int = 0) -> float:
+        """Reserve one request and the given tokens if that needs no wait; otherwise return the wait."""
+        with self._lock:
+            blocked = self._blocked_until - time.monotonic()
+        if blocked > 0:
+            return blocked
+        if self.requests:
+            wait = self.requests.try_reserve(1)
+            if wait > 0:
+                return wait
+        if self.tokens and tokens:
+            return self.tokens.try_reserve(tokens)
+        return 0.0
+
+    def throttled(self, retry_after: float):
+        """Pause all callers for retry_after seconds after a 429 response."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+        logger.warning(f"Deployment {self.name} throttled, pausing for {retry_after:.1f}s")
+
+    def acquire_slot(self):
+        """Take a concurrency slot, waiting for one to free up if needed."""
+        if self.slots:
+            self.slots.acquire()
+
+    def release_slot(self):
+        if self.slots:
+            self.slots.release()
+
+    def _retry_delay(self, error: Exception, throttles: int, failures: int,
+                     idempotent: bool = True) -> Optional[float]:
+        """Return how long to wait before retrying after error, or None to give up."""
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            if throttles >= MAX_THROTTLE_RETRIES:
+                return None
+            self.throttled(retry_after)
+            # The wait is applied by the next reservation
+            return 0.0
+        if not idempotent or failures >= MAX_TRANSIENT_RETRIES or not is_transient_error(error):
+            return None
+        delay = backoff_delay(failures + 1)
+        logger.warning(f"Transient error calling {self.name} ({str(error)}), retrying in {delay:.1f}s")
+        return delay
+
+    def call(self, func: Callable[[], Any], tokens: int = 0, idempotent: bool = True) -> Any:
+        """
+        Call func within the quota, retrying after 429 responses (honoring
+        Retry-After) and, with backoff, after connection errors, timeouts
+        and 5xx responses.
+
+        Args:
+            func: The request to make
+            tokens: Estimated tokens the request uses
+            idempotent: Whether func may be repeated after a timeout, connection
+                error or 5xx response, which the server may have acted on;
+                if not, only 429 responses are retried
+
+        Returns:
+            The return value of func
+        """
+        throttles = failures = 0
+        while True:
+            delay = self.reserve(tokens)
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                return func()
+            except Exception as e:
+                backoff = self._retry_delay(e, throttles, failures, idempotent)
+                if backoff is None:
+                    raise
+                if retry_after_seconds(e) is not None:
+                    throttles += 1
+                else:
+                    failures += 1
+                    time.sleep(backoff)
+
+    def call_nowait(self, func: Callable[[], Any], tokens: int = 0) -> Any:
+        """
+        Call func if the quota has room right now, without waiting or retrying.
+
+        Used by callers that must not block, such as the shared Sora job
+        poller; they reschedule the call instead.
+
+        Raises:
+            RateLimitedError: The quota has no room or the call was throttled
+        """
+        wait = self.try_reserve(tokens)
+        if wait > 0:
+            raise RateLimitedError(self.name, wait)
+        try:
+            return func()
+        except Exception as e:
+            retry_after = retry_after_seconds(e)
+            if retry_after is None:
+                raise
+            self.throttled(retry_after)
+            raise RateLimitedError(self.name, retry_after) from e
+
+    async def acall(self, func: Callable[[], Awaitable[Any]], tokens: int = 0, idempotent: bool = True) -> Any:
+        """Async version of call."""
+        throttles = failures = 0
+        while True:
+            delay = self.reserve(tokens)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                return await func()
+            except Exception as e:
+                backoff = self._retry_delay(e, throttles, failures, idempotent)
+                if backoff is None:
+                    raise
+                if retry_after_seconds(e) is not None:
+                    throttles += 1
+                else:
+                    failures += 1
+                    await asyncio.sleep(backoff)
+
+
+_governors: Dict[str, DeploymentGovernor] = {}
+_governors_lock = threading.Lock()
+
+
+def get_governor(kind: str, deployment: str) -> DeploymentGovernor:
+    """
+    Return the process-wide governor of a deployment.
+
+    Limits are read from the environment by kind: GPT_RPM / GPT_TPM,
+    TTS_RPM and SORA_RPM / SORA_MAX_CONCURRENT_JOBS.
+
+    Args:
+        kind: "gpt", "tts" or "sora"
+        deployment: Deployment name
+    """
+    key = f"{kind}:{deployment}"
+    with _governors_lock:
+        if key not in _governors:
+            prefix = kind.upper()
+            max_jobs = _env_float(f"{prefix}_MAX_CONCURRENT_JOBS")
+            _governors[key] = DeploymentGovernor(
+                deployment,
+                requests_per_minute=_env_float(f"{prefix}_RPM"),
+                tokens_per_minute=_env_float(f"{prefix}_TPM"),
+                max_concurrency=int(max_jobs) if max_jobs else None
+            )
+        return _governors[key]
@@ -0,0 +1,202 @@
+"""
+Rendition ladder for the video generation application.
+This module derives several deliverables (sizes, bitrates, formats, a poster frame) from one video in a single decode.
+"""
+
+import os
+import json
+import uuid
+import logging
+import subprocess
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from moviepy.config import get_setting
+
+from artifacts import get_artifact_manager, publish
+from core_scheduler import ENCODE_THREADS_PER_JOB, get_core_scheduler
+from telemetry import get_telemetry
+from video_editor import probe_video
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Renditions produced for every video, as comma separated names from RENDITION_LADDER
+VIDEO_RENDITIONS = [name for name in os.getenv("VIDEO_RENDITIONS", "").split(",") if name]
+
+# Containers written as a single still frame instead of a video
+IMAGE_CONTAINERS = ("jpg", "png", "webp")
+
+# Encoders that understand -preset
+PRESET_CODECS = ("libx264", "libx265")
+
+
+@dataclass
+class Rendition:
+    """
+    One deliverable of the rendition ladder.
+
+    fit decides how the video is brought to width x height: "pad" letterboxes
+    it, "crop" fills the frame and cuts off the overflow (e.g. vertical
+    video from a landscape clip) and "stretch" ignores the aspect ratio.
+    """
+    name: str
+    width: int
+    height: int
+    fit: str = "pad"
+    container: str = "mp4"
+    video_codec: str = "libx264"
+    # Target bitrate such as "2500k"; quality-based (crf) encoding if None
+    video_bitrate: Optional[str] = None
+    crf: int = 23
+    preset: str = "veryfast"
+    fps: Optional[float] = None
+    audio_codec: str = "aac"
+    audio_bitrate: str = "128k"
+    # Seconds into the video of the frame used for image containers
+    poster_time: float = 1.0
+
+    @property
+    def is_image(self) -> bool:
+        return self.container in IMAGE_CONTAINERS
+
+
+RENDITION_LADDER = {
+    rendition.name: rendition for rendition in (
+        Rendition("web_720p", 1280, 720, video_bitrate="2500k"),
+        Rendition("vertical_720p", 720, 1280, fit="crop", video_bitrate="2500k"),
+        Rendition("preview_360p", 640, 360, video_bitrate="400k", audio_bitrate="64k"),
+        Rendition("poster", 1280, 720, container="jpg"),
+    )
+}
+
+
+def parse_renditions(spec: Union[str, Sequence[Union[str, Dict[str, Any], Rendition]]]) -> List[Rendition]:
+    """
+    Resolve a declarative list of renditions.
+
+    Args:
+        spec: Names from RENDITION_LADDER, dicts of Rendition fields or Rendition
+            objects; or a string with comma separated names or a JSON list
+
+    Returns:
+        List of Rendition objects
+    """
+    if isinstance(spec, str):
+        spec = json.loads(spec) if spec.lstrip().startswith("[") else [name for name in spec.split(",") if name]
+
+    renditions = []
+    for item in spec:
+        if isinstance(item, Rendition):
+            renditions.append(item)
+        elif isinstance(item, dict):
+            renditions.append(Rendition(**item))
+        elif item in RENDITION_LADDER:
+            renditions.append(RENDITION_LADDER[item])
+        else:
+            raise ValueError(f"Unknown rendition: {item}")
+    if len({r.name for r in renditions}) != len(renditions):
+        raise ValueError("Rendition names must be unique")
+    return renditions
+
+
+def _video_filter(rendition: Rendition, poster_time: float) -> str:
+    w, h = rendition.width, rendition.height
+    if rendition.fit == "pad":
+        chain = f"scale={w}:{h}:force_original_aspect_ratio=decrease,pad={w}:{h}:(ow-iw)/2:(oh-ih)/2"
+    elif rendition.fit == "crop":
+        chain = f"scale={w}:{h}:force_original_aspect_ratio=increase,crop={w}:{h}"
+    elif rendition.fit == "stretch":
+        chain = f"scale={w}:{h}"
+    else:
+        raise ValueError(f"Unknown rendition fit: {rendition.fit}")
+    chain += ",setsar=1"
+
+    if rendition.is_image:
+        return f"trim=start={poster_time:.3f},{chain}"
+    if rendition.fps:
+        chain += f",fps={rendition.fps}"
+    return chain + ",format=yuv420p"
+
+
+def _output_args(rendition: Rendition, label: str, output_path: str, threads: int) -> List[str]:
+    args = ["-map", f"[{label}]"]
+    if rendition.is_image:
+        return args + ["-frames:v", "1", "-q:v", "2", output_path]
+
+    args += ["-map", "0:a?", "-c:v", rendition.video_codec, "-threads", str(threads)]
+    if rendition.video_bitrate:
+        # Cap the peak rate too, so the rendition can be streamed at its nominal bitrate
+        args += ["-b:v", rendition.video_bitrate, "-maxrate", rendition.video_bitrate, "-bufsize", rendition.video_bitrate]
+    else:
+        args += ["-crf", str(rendition.crf)]
+    if rendition.video_codec in PRESET_CODECS:
+        args += ["-preset", rendition.preset]
+    args += ["-c:a", rendition.audio_codec, "-b:a", rendition.audio_bitrate]
+    if rendition.container in ("mp4", "mov"):
+        args += ["-movflags", "+faststart"]
+    return args + [output_path]
+
+
+def render_renditions(video_path: str, renditions: Sequence[Rendition], output_dir: Optional[str] = None,
+                      basename: Optional[str] = None, scratch_key: Optional[str] = None) -> Dict[str, str]:
+    """
+    Produce all renditions of a video with one ffmpeg process.
+
+    The video is decoded once; a split filter fans the frames out to one
+    scale/crop chain and encoder per rendition, and ffmpeg runs the
+    encoders in parallel. N deliverables cost one decode plus N encodes
+    instead of N full transcodes. The pass reserves one job's thread budget
+    from the core scheduler and splits it among its encoders. The outputs
+    are written to a scratch directory and only moved to output_dir once
+    all of them succeeded.
+
+    Args:
+        video_path: Path to the source video, e.g. the combined teaser
+        renditions: Renditions to produce
+        output_dir: Directory of the outputs (defaults to the directory of video_path)
+        basename: File name prefix (defaults to the name of video_path without extension)
+        scratch_key: Key of the artifact manager scratch directory to share, e.g. the job id
+
+    Returns:
+        Paths of the produced files by rendition name
+    """
+    if not renditions:
+        return {}
+    output_dir = output_dir or os.path.dirname(video_path) or "."
+    basename = basename or os.path.splitext(os.path.basename(video_path))[0]
+    os.makedirs(output_dir, exist_ok=True)
+
+    # A poster time past the end of a short clip would produce no frame
+    duration = probe_video(video_path)["duration"] or 0.0
+    outputs = {r.name: os.path.join(output_dir, f"{basename}_{r.name}.{r.container}") for r in renditions}
+
+    videos = sum(1 for r in renditions if not r.is_image)
+
+    with get_artifact_manager().workdir(scratch_key) as work_dir, \
+            get_core_scheduler().reserve(ENCODE_THREADS_PER_JOB, job="renditions") as threads:
+        scratch = {name: str(work_dir / f"{uuid.uuid4().hex}_{os.path.basename(path)}") for name, path in outputs.items()}
+        labels = "".join(f"[s{i}]" for i in range(len(renditions)))
+        chains = [f"[0:v]split={len(renditions)}{labels}"]
+        output_args: List[str] = []
+        for i, rendition in enumerate(renditions):
+            poster_time = min(rendition.poster_time, duration / 2) if duration else 0.0
+            chains.append(f"[s{i}]{_video_filter(rendition, poster_time)}[v{i}]")
+            output_args += _output_args(rendition, f"v{i}", scratch[rendition.name], max(1, threads // max(1, videos)))
+
+        command = [
+            get_setting("FFMPEG_BINARY"), "-y", "-hide_banner", "-loglevel", "error",
+            "-i", video_path,
+            "-filter_complex", ";".join(chains)
+        ] + output_args
+
+        logger.info(f"Rendering {len(renditions)} renditions of {video_path} on {threads} threads: {', '.join(outputs)}")
+        with get_telemetry().span("renditions", count=len(renditions)):
+            result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, errors="replace")
+        if result.returncode != 0:
+            # Partial outputs are removed with the scratch directory
+            raise Exception(f"ffmpeg renditions failed: {result.stderr.strip()}")
+        for name, path in outputs.items():
+            publish(scratch[name], path)
+    return outputs
@@ -0,0 +1,196 @@
+"""
+Result caching for the video generation application.
+This module stores model outputs on disk, keyed by a hash of everything that determines them.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Any, Dict, Optional
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Cache configuration
+CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+CACHE_PATH = os.getenv("RESULT_CACHE_PATH", os.path.join("output", "result_cache.db"))
+CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", str(7 * 24 * 3600)))
+CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+
+def make_cache_key(**parts: Any) -> str:
+    """
+    Build a content-addressed cache key.
+
+    Args:
+        **parts: Everything that determines the result, e.g. deployment name,
+            system prompt, user input and sampling parameters
+
+    Returns:
+        Hex SHA-256 digest of the canonical JSON encoding of the parts
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache(ABC):
+    """
+    Base class for result caches.
+
+    Subclasses implement _load and _store; this class keeps hit/miss counters
+    per kind of result (e.g. "narrative", "tts_audio").
+    """
+
+    def __init__(self):
+        self._stats = defaultdict(lambda: {"hits": 0, "misses": 0})
+        self._stats_lock = threading.Lock()
+
+    def get(self, key: str, kind: str = "default") -> Optional[bytes]:
+        """Return the cached value for key, or None on a miss."""
+        value = self._load(key)
+        with self._stats_lock:
+            self._stats[kind]["hits" if value is not None else "misses"] += 1
+        if value is not None:
+            logger.info(f"Result cache hit for {kind}")
+        return value
+
+    def put(self, key: str, value: bytes, kind: str = "default"):
+        """Store value under key."""
+        self._store(key, value, kind)
+
+    def get_text(self, key: str, kind: str = "default") -> Optional[str]:
+        value = self.get(key, kind)
+        return value.decode("utf-8") if value is not None else None
+
+    def put_text(self, key: str, value: str, kind: str = "default"):
+        self.put(key, value.encode("utf-8"), kind)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Return hit/miss counts and hit rate per kind of result."""
+        with self._stats_lock:
+            stats = {}
+            for kind, counts in self._stats.items():
+                total = counts["hits"] + counts["misses"]
+                stats[kind] = dict(counts, hit_rate=counts["hits"] / total if total else 0.0)
+            return stats
+
+    @abstractmethod
+    def _load(self, key: str) -> Optional[bytes]:
+        """Return the stored value for key, or None."""
+
+    @abstractmethod
+    def _store(self, key: str, value: bytes, kind: str):
+        """Store value under key."""
+
+
+class NullResultCache(ResultCache):
+    """Cache that never stores anything, used when caching is disabled."""
+
+    def _load(self, key: str) -> Optional[bytes]:
+        return None
+
+    def _store(self, key: str, value: bytes, kind: str):
+        pass
+
+
+class SQLiteResultCache(ResultCache):
+    """
+    Result cache backed by a single SQLite file.
+
+    Entries expire after ttl seconds. When the total size of the stored values
+    exceeds max_bytes, the least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, ttl: float = CACHE_TTL, max_bytes: int = CACHE_MAX_BYTES):
+        """
+        Initialize the cache.
+
+        Args:
+            path: Path of the SQLite database file
+            ttl: Seconds after which an entry expires
+            max_bytes: Maximum total size of the cached values
+        """
+        super().__init__()
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)")
+
+    def _load(self, key: str) -> Optional[bytes]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            if now - created > self.ttl:
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (now, key))
+            return bytes(value)
+
+    def _store(self, key: str, value: bytes, kind: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, kind, value, size, created, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, kind, sqlite3.Binary(value), len(value), now, now)
+            )
+            self._evict(now)
+
+    def _evict(self, now: float):
+        self._conn.execute("DELETE FROM results WHERE created < ?", (now - self.ttl,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries until the cache fits again
+        removed = 0
+        for key, size in self._conn.execute("SELECT key, size FROM results ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            total -= size
+            removed += 1
+        logger.info(f"Evicted {removed} entries from the result cache")
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_result_cache() -> ResultCache:
+    """Create the result cache configured by the environment."""
+    if not CACHE_ENABLED:
+        return NullResultCache()
+    return SQLiteResultCache()
@@ -0,0 +1,73 @@
+"""
+Retry helpers for the video generation application.
+This module retries operations that failed with transient network or server errors.
+"""
+
+import os
+import time
+import random
+import logging
+from typing import Any, Callable
+
+import httpx
+import openai
+import requests
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "2"))
+RETRY_MAX_DELAY = 60.0
+
+# HTTP status codes worth retrying
+TRANSIENT_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+
+TRANSIENT_EXCEPTIONS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+    httpx.TransportError,
+    openai.APIConnectionError,
+)
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """Return True if error is a network failure or a retryable HTTP status."""
+    if isinstance(error, TRANSIENT_EXCEPTIONS):
+        return True
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) in TRANSIENT_STATUS_CODES
+
+
+def backoff_delay(attempt: int, base_delay: float = RETRY_BASE_DELAY) -> float:
+    """Return the jittered exponential backoff before retry number attempt (starting at 1)."""
+    return min(base_delay * 2 ** (attempt - 1), RETRY_MAX_DELAY) * random.uniform(0.5, 1.0)
+
+
+def call_with_retries(func: Callable[[], Any], description: str = "operation",
+                      max_attempts: int = RETRY_MAX_ATTEMPTS, base_delay: float = RETRY_BASE_DELAY) -> Any:
+    """
+    Call func, retrying with exponential backoff and jitter after transient errors.
+
+    Any other error is raised immediately.
+
+    Args:
+        func: The operation to run
+        description: Name of the operation for log messages
+        max_attempts: Total number of attempts
+        base_delay: Delay before the first retry, doubled for every further retry
+
+    Returns:
+        The return value of func
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            return func()
+        except Exception as e:
+            if attempt == max_attempts or not is_transient_error(e):
+                raise
+            delay = backoff_delay(attempt, base_delay)
+            logger.warning(f"Transient error in {description} ({str(e)}), retrying in {delay:.1f}s (attempt {attempt}/{max_attempts})")
+            time.sleep(delay)
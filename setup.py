@@ -74,6 +74,8 @@ def main():
     
     print("\nSetup complete! You can now run the application with:")
     print("  streamlit run app.py")
+    print("or generate videos for a file of prompts with:")
+    print("  python batch_runner.py prompts.jsonl")
     return True
 
 if __name__ == "__main__":
@@ -0,0 +1,216 @@
+"""
+Metrics and tracing for the video generation application.
+This module records latencies, token usage and byte counts and exports them to the configured sinks.
+
+Every measurement is aggregated in memory (see snapshot) and, when enabled,
+exported to:
+- Prometheus, if prometheus_client is installed (start_metrics_server or METRICS_PORT)
+- OpenTelemetry, if opentelemetry-api is installed; spans go to whatever tracer
+  provider the process configured (e.g. via opentelemetry-instrument)
+- a JSON-lines file, if TELEMETRY_JSONL_PATH is set
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "teaser_"
+JSONL_PATH = os.getenv("TELEMETRY_JSONL_PATH")
+METRICS_PORT = os.getenv("METRICS_PORT")
+
+_tracer = otel_trace.get_tracer("teaser_video") if otel_trace else None
+
+
+@dataclass
+class Aggregate:
+    """Running count, sum and maximum of a metric."""
+    count: int = 0
+    total: float = 0.0
+    maximum: float = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.maximum = max(self.maximum, value)
+
+
+@dataclass
+class Span:
+    """A timed operation; children can be started on other threads with parent=span."""
+    name: str
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    duration: float = 0.0
+    context: Any = None
+    _otel_span: Any = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+        if self._otel_span is not None:
+            self._otel_span.set_attribute(key, _otel_value(value))
+
+
+def _otel_value(value: Any) -> Any:
+    return value if isinstance(value, (bool, int, float, str)) else str(value)
+
+
+class Telemetry:
+    """Process-wide metric registry and exporter."""
+
+    def __init__(self, jsonl_path: Optional[str] = JSONL_PATH):
+        self.jsonl_path = jsonl_path
+        self._aggregates: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Aggregate] = {}
+        self._prometheus: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._server_started = False
+
+    def observe(self, name: str, value: float, **labels: Any):
+        """Record a measurement, e.g. a duration in seconds."""
+        self._record("histogram", name, value, labels)
+
+    def increment(self, name: str, amount: float = 1, **labels: Any):
+        """Add to a counter, e.g. tokens or bytes."""
+        self._record("counter", name, amount, labels)
+
+    def _record(self, kind: str, name: str, value: float, labels: Dict[str, Any]):
+        labels = {key: str(label) for key, label in labels.items()}
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._aggregates.setdefault(key, Aggregate()).add(value)
+            metric = self._prometheus_metric(kind, name, sorted(labels)) if prometheus_client else None
+        if metric is not None:
+            target = metric.labels(**labels) if labels else metric
+            if kind == "counter":
+                target.inc(value)
+            else:
+                target.observe(value)
+        self._write({"type": kind, "metric": name, "value": value, "labels": labels})
+
+    def _prometheus_metric(self, kind: str, name: str, label_names):
+        # Label names are fixed by the first use of a metric
+        if name not in self._prometheus:
+            metric_class = prometheus_client.Counter if kind == "counter" else prometheus_client.Histogram
+            self._prometheus[name] = metric_class(METRIC_PREFIX + name, name.replace("_", " "), label_names)
+        return self._prometheus[name]
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[Span] = None, labels: Optional[Dict[str, Any]] = None,
+             **attributes: Any) -> Iterator[Span]:
+        """
+        Time an operation as a span.
+
+        The duration is also recorded as the "<name>_seconds" metric, with the
+        given labels and a "status" label of "ok" or "error".
+
+        Args:
+            name: Span and metric name, e.g. "stage"
+            parent: Parent span, needed when the span runs on a different thread
+            labels: Low-cardinality labels of the metric, also added as span attributes
+            **attributes: Further attributes of the span, e.g. a job id
+        """
+        labels = labels or {}
+        attributes = {**labels, **attributes}
+        record = Span(name, dict(attributes))
+        start = time.perf_counter()
+        otel_span_manager = None
+        if _tracer is not None:
+            otel_span_manager = _tracer.start_as_current_span(
+                name,
+                context=parent.context if parent is not None else None,
+                attributes={key: _otel_value(value) for key, value in attributes.items()}
+            )
+            record._otel_span = otel_span_manager.__enter__()
+            record.context = otel_trace.set_span_in_context(record._otel_span)
+
+        error = None
+        try:
+            yield record
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            record.duration = time.perf_counter() - start
+            if otel_span_manager is not None:
+                # Lets OpenTelemetry record the exception and error status
+                otel_span_manager.__exit__(type(error) if error else None, error, error.__traceback__ if error else None)
+            status = "error" if error else "ok"
+            self.observe(f"{name}_seconds", record.duration, status=status, **labels)
+            self._write({
+                "type": "span",
+                "span": name,
+                "duration": record.duration,
+                "status": status,
+                "attributes": {key: _otel_value(value) for key, value in record.attributes.items()}
+            })
+
+    def _write(self, event: Dict[str, Any]):
+        if not self.jsonl_path:
+            return
+        event["ts"] = time.time()
+        line = json.dumps(event)
+        with self._lock:
+            with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Return the in-memory aggregates as {"name{label=value}": {"count", "sum", "max"}}."""
+        with self._lock:
+            items = list(self._aggregates.items())
+        result = {}
+        for (name, labels), aggregate in sorted(items):
+            label_text = ",".join(f"{key}={value}" for key, value in labels)
+            result[f"{name}{{{label_text}}}" if label_text else name] = {
+                "count": aggregate.count,
+                "sum": aggregate.total,
+                "max": aggregate.maximum
+            }
+        return result
+
+    def start_metrics_server(self, port: Optional[int] = None) -> bool:
+        """
+        Serve the metrics for Prometheus to scrape.
+
+        Args:
+            port: Port to listen on (defaults to METRICS_PORT)
+
+        Returns:
+            True if the server is running
+        """
+        port = port or (int(METRICS_PORT) if METRICS_PORT else None)
+        if port is None:
+            return False
+        if prometheus_client is None:
+            logger.warning("prometheus_client is not installed, metrics endpoint disabled")
+            return False
+        with self._lock:
+            if not self._server_started:
+                prometheus_client.start_http_server(port)
+                self._server_started = True
+                logger.info(f"Serving metrics on port {port}")
+        return True
+
+
+_telemetry = Telemetry()
+
+
+def get_telemetry() -> Telemetry:
+    """Return the process-wide telemetry registry."""
+    return _telemetry
@@ -0,0 +1,25 @@
+from batch_runner import BatchRunner, job_key
+
+
+def test_sora_concurrency_covers_variant_jobs(tmp_path):
+    runner = BatchRunner(None, tmp_path, sora_concurrency=2)
+    limit = runner.stage_limits["video_variants"]
+    assert limit is runner.stage_limits["video"]
+    assert limit.acquire(blocking=False) and limit.acquire(blocking=False)
+    assert not limit.acquire(blocking=False)
+
+
+def test_rows_of_different_batches_do_not_share_jobs():
+    first = {"id": "1", "prompt": "A lighthouse at dusk"}
+    assert job_key(first) == job_key(dict(first))
+    assert job_key(first) != job_key({"id": "1", "prompt": "A city at night"})
+    assert job_key(first) != job_key({**first, "variants": "3"})
+
+
+def test_run_skips_only_rows_with_the_same_parameters(tmp_path):
+    runner = BatchRunner(None, tmp_path)
+    runner.state.record(job_key({"id": "1", "prompt": "A lighthouse at dusk"}), status="succeeded")
+    started = []
+    runner.run_job = lambda row: started.append(row["prompt"])
+    runner.run([{"id": "1", "prompt": "A lighthouse at dusk"}, {"id": "1", "prompt": "A city at night"}])
+    assert started == ["A city at night"]
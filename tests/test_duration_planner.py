@@ -0,0 +1,30 @@
+import numpy as np
+
+from audio_mixer import SAMPLE_RATE
+from duration_planner import DurationPlanner
+
+
+def narration(seconds: float) -> np.ndarray:
+    return np.full((int(seconds * SAMPLE_RATE), 1), 0.5, dtype=np.float32)
+
+
+def test_plan_without_stretch_covers_the_narration():
+    # 10s of speech plus the margin is just over a 10s clip
+    plan = DurationPlanner().plan("a b c", "alloy", 854, 480, samples=narration(10.0), max_stretch=0.0)
+    assert plan.n_seconds == 15
+    assert plan.required_speedup == 1.0
+
+
+def test_plan_with_stretch_accepts_the_shorter_clip():
+    plan = DurationPlanner().plan("a b c", "alloy", 854, 480, samples=narration(10.0), max_stretch=0.1)
+    assert plan.n_seconds == 10
+
+
+def test_prediction_leaves_room_until_the_voice_is_measured():
+    planner = DurationPlanner(words_per_second=2.5)
+    # 23 words at the default rate are 9.2s, which a 10s clip would only just cover
+    text = " ".join(["word"] * 23)
+    assert planner.plan(text, "alloy", 854, 480, max_stretch=0.0).n_seconds == 15
+
+    planner.record("alloy", " ".join(["word"] * 25), 10.0)
+    assert planner.plan(text, "alloy", 854, 480, max_stretch=0.0).n_seconds == 10
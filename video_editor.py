@@ -4,89 +4,279 @@ This module handles video processing and audio integration.
 """
 
 import os
+import re
+import time
 import logging
-import tempfile
-from typing import Optional
-# from moviepy.editor import VideoFileClip, TextClip, CompositeVideoClip, AudioFileClip
-from moviepy.editor import *
+import uuid
+import subprocess
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+from moviepy.config import get_setting
+
+from artifacts import get_artifact_manager, publish
+from audio_mixer import SAMPLE_RATE, MUSIC_DUCKING_DB, decode_audio, encode_audio, mix_voice_and_music
+from core_scheduler import ENCODE_THREADS_PER_JOB, get_core_scheduler
+from music_library import load_music
+from telemetry import get_telemetry
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def combine_video_and_audio(video_path: str, audio_data: bytes, output_path: str, background_music_path: Optional[str] = None, music_volume: float = 0.3) -> str:
+# Remux the original video stream instead of re-encoding it when possible
+FAST_MUX = os.getenv("VIDEO_FAST_MUX", "true").lower() in ("1", "true", "yes")
+
+# Video codecs and containers that can be stream-copied into an MP4 output
+STREAM_COPY_CODECS = ("h264", "hevc")
+STREAM_COPY_CONTAINERS = ("mov", "mp4")
+STREAM_COPY_EXTENSIONS = (".mp4", ".mov", ".m4v")
+
+
+@dataclass
+class EncoderProfile:
+    """
+    Video encoder settings for re-encoding.
+
+    Quality is either constant (crf) or a target bitrate; threads defaults
+    to the per-job budget of the core scheduler.
+    """
+    name: str
+    preset: str
+    crf: int = 23
+    video_bitrate: Optional[str] = None
+    codec: str = "libx264"
+    threads: Optional[int] = None
+
+    def ffmpeg_params(self) -> List[str]:
+        """Quality options passed to ffmpeg in addition to codec, preset and threads."""
+        return [] if self.video_bitrate else ["-crf", str(self.crf)]
+
+
+ENCODER_PROFILES = {
+    profile.name: profile for profile in (
+        # Several times faster than "balanced" at a somewhat larger file size
+        EncoderProfile("fast", preset="veryfast"),
+        # ffmpeg's own defaults, used before profiles existed
+        EncoderProfile("balanced", preset="medium"),
+        # Smaller files for archiving or slow links, at a multiple of the encode time
+        EncoderProfile("small", preset="slow", crf=26),
+    )
+}
+
+# Encoder profile used when the video has to be re-encoded
+ENCODER_PROFILE = os.getenv("VIDEO_ENCODER_PROFILE", "balanced")
+
+# Height of the quick preview shown while the final video is assembled
+PREVIEW_HEIGHT = int(os.getenv("VIDEO_PREVIEW_HEIGHT", "360"))
+
+# Streaming packages made for every final video, as comma separated names from STREAMING_FORMATS
+VIDEO_STREAMING_FORMATS = [name for name in os.getenv("VIDEO_STREAMING_FORMATS", "").split(",") if name]
+STREAMING_SEGMENT_SECONDS = float(os.getenv("VIDEO_STREAMING_SEGMENT_SECONDS", "4"))
+
+# Streaming formats and the file each one is addressed by: a fragmented MP4,
+# or the playlist/manifest of an HLS or DASH segment set
+STREAMING_FORMATS = {
+    "fmp4": "fragmented.mp4",
+    "hls": os.path.join("hls", "index.m3u8"),
+    "dash": os.path.join("dash", "manifest.mpd"),
+}
+
+
+def get_encoder_profile(profile: Union[str, EncoderProfile]) -> EncoderProfile:
+    """Resolve a profile name from ENCODER_PROFILES, or return the given profile."""
+    if isinstance(profile, EncoderProfile):
+        return profile
+    if profile not in ENCODER_PROFILES:
+        raise ValueError(f"Unknown encoder profile: {profile}")
+    return ENCODER_PROFILES[profile]
+
+
+def probe_video(video_path: str) -> Dict[str, Any]:
+    """
+    Read the container format and video codec of a file with ffmpeg.
+    
+    Args:
+        video_path: Path to the video file
+        
+    Returns:
+        Dict with "container" (e.g. "mov,mp4,m4a,3gp,3g2,mj2"), "video_codec" (e.g. "h264")
+        and "duration" in seconds
+    """
+    result = subprocess.run(
+        [get_setting("FFMPEG_BINARY"), "-hide_banner", "-i", video_path],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, errors="replace"
+    )
+    container = re.search(r"Input #0, ([^ ]+), from", result.stderr)
+    codec = re.search(r"Stream #0:\d+(?:\[\w+\])?(?:\(\w+\))?: Video: (\w+)", result.stderr)
+    duration = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", result.stderr)
+    return {
+        "container": container.group(1).rstrip(",") if container else None,
+        "video_codec": codec.group(1) if codec else None,
+        "duration": int(duration.group(1)) * 3600 + int(duration.group(2)) * 60 + float(duration.group(3)) if duration else None
+    }
+
+
+def video_duration(video_path: str) -> float:
+    """
+    Return the length of a video in seconds.
+    
+    Uses the duration in the container header when there is one; otherwise
+    the video stream is read through (stream-copied, so nothing is decoded)
+    and the timestamp ffmpeg reached is used.
+    
+    Args:
+        video_path: Path to the video file
+        
+    Returns:
+        Duration in seconds
+    """
+    duration = probe_video(video_path)["duration"]
+    if duration is not None:
+        return duration
+    result = subprocess.run(
+        [get_setting("FFMPEG_BINARY"), "-hide_banner", "-i", video_path, "-map", "0:v:0", "-c", "copy", "-f", "null", "-"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, errors="replace"
+    )
+    times = re.findall(r"time=(\d+):(\d+):(\d+(?:\.\d+)?)", result.stderr)
+    if not times:
+        raise ValueError(f"Cannot determine the duration of {video_path}")
+    hours, minutes, seconds = times[-1]
+    duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    if duration <= 0:
+        raise ValueError(f"Cannot determine the duration of {video_path}")
+    logger.info(f"{video_path} has no duration in its header, measured {duration:.2f}s")
+    return duration
+
+
+def can_stream_copy(video_path: str, output_path: str) -> bool:
+    """Check whether the video stream of video_path can be copied as-is into output_path."""
+    if os.path.splitext(output_path)[1].lower() not in STREAM_COPY_EXTENSIONS:
+        return False
+    info = probe_video(video_path)
+    containers = (info["container"] or "").split(",")
+    return info["video_codec"] in STREAM_COPY_CODECS and any(c in STREAM_COPY_CONTAINERS for c in containers)
+
+
+def mux_video_and_audio(video_path: str, audio_path: str, output_path: str) -> str:
+    """
+    Replace the audio track of a video without re-encoding the video stream.
+    
+    Args:
+        video_path: Path to the input video file
+        audio_path: Path to an AAC audio file to use as the new soundtrack
+        output_path: Path for the output video file
+        
+    Returns:
+        Path to the output video file
+    """
+    command = [
+        get_setting("FFMPEG_BINARY"), "-y", "-hide_banner", "-loglevel", "error",
+        "-i", video_path,
+        "-i", audio_path,
+        "-map", "0:v:0", "-map", "1:a:0",
+        "-c:v", "copy", "-c:a", "copy",
+        "-movflags", "+faststart",
+        output_path
+    ]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, errors="replace")
+    if result.returncode != 0:
+        raise Exception(f"ffmpeg mux failed: {result.stderr.strip()}")
+    return output_path
+
+def combine_video_and_audio(video_path: str, audio_data: Union[bytes, np.ndarray], output_path: str, background_music_path: Optional[str] = None, music_volume: float = 0.3, fast_mux: bool = FAST_MUX, ducking_db: float = MUSIC_DUCKING_DB, max_stretch: float = 0.0, profile: Union[str, EncoderProfile] = ENCODER_PROFILE, scratch_key: Optional[str] = None) -> str:
     """
     Combine video, voice narration, and optional background music into a final video file.
     
+    Narration and music are decoded once and mixed with NumPy (see
+    audio_mixer). With fast_mux the mixed soundtrack is encoded on its own and muxed with a
+    stream copy of the original video, which avoids decoding and re-encoding
+    every frame. The video is only re-encoded when its codec or container
+    cannot be copied into the output.
+    
+    Both paths reserve cores from the process-wide core scheduler first: one
+    for the audio encode and mux, the profile's thread budget for a
+    re-encode. Concurrent jobs then share the machine instead of
+    oversubscribing it.
+    
+    Intermediate files (the encoded soundtrack, MoviePy's temporary audio)
+    and the output itself are written to a scratch directory of the artifact
+    manager, which is removed afterwards even on failure. The finished video
+    is then moved to output_path, so a partial file never appears there.
+    
     Args:
         video_path: Path to the input video file
-        audio_data: Voice narration audio data as bytes
+        audio_data: Voice narration as encoded audio bytes, or as already decoded
+            float32 samples at audio_mixer.SAMPLE_RATE (e.g. from a TTS stream)
         output_path: Path for the output video file
         background_music_path: Optional path to a background music file
         music_volume: Volume level for background music (0.0 to 1.0)
+        fast_mux: Whether to stream-copy the video track when possible
+        ducking_db: Extra music attenuation while the narration is speaking, in dB
+        max_stretch: Maximum speed-up (0.1 = 10% faster) of narration longer than the video
+        profile: Encoder profile, or its name in ENCODER_PROFILES, used when re-encoding
+        scratch_key: Key of the scratch directory to share, e.g. the job id
         
     Returns:
         Path to the final video file
     """
     try:
-        # Create a temporary file for the voice narration
-        with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as temp_audio_file:
-            temp_audio_path = temp_audio_file.name
-            temp_audio_file.write(audio_data)
-        
-        logger.info(f"Temporary audio file created at {temp_audio_path}")
-        
-        # Load the video clip
-        video_clip = VideoFileClip(video_path)
+        profile = get_encoder_profile(profile)
         
-        # Load the voice narration clip
-        voice_clip = AudioFileClip(temp_audio_path)
-        
-        # Check if voice narration is longer than video
-        if voice_clip.duration > video_clip.duration:
-            logger.warning("Voice narration duration exceeds video duration. Trimming audio.")
-            voice_clip = voice_clip.subclip(0, video_clip.duration)
+        # Decode narration and music once to PCM and mix them as arrays
+        duration = video_duration(video_path)
+        voice = audio_data if isinstance(audio_data, np.ndarray) else decode_audio(audio_data)
         
+        music = None
         if background_music_path and os.path.exists(background_music_path):
             logger.info(f"Adding background music from {background_music_path}")
-            
-            # Load the background music
-            music_clip = AudioFileClip(background_music_path)
-            
-            # Loop the music if it's shorter than the video
-            if music_clip.duration < video_clip.duration:
-                logger.info("Background music is shorter than video. Looping music.")
-                repetitions = int(video_clip.duration / music_clip.duration) + 1
-                music_clip = concatenate_audioclips([music_clip] * repetitions)
-            
-            # Trim music if it's longer than the video
-            if music_clip.duration > video_clip.duration:
-                music_clip = music_clip.subclip(0, video_clip.duration)
-            
-            # Set the volume of the background music to be lower
-            music_clip = music_clip.volumex(music_volume)
-            
-            # Combine voice narration and background music
-            combined_audio = CompositeAudioClip([voice_clip, music_clip])
-            
-            # Set the combined audio to the video clip
-            final_clip = video_clip.set_audio(combined_audio)
-        else:
-            # Set only the voice narration to the video clip
-            final_clip = video_clip.set_audio(voice_clip)
+            music = load_music(background_music_path, max_duration=duration)
         
-        # Write the result to a file
-        final_clip.write_videofile(output_path, codec='libx264', audio_codec='aac', fps=24)
+        mixed_audio = mix_voice_and_music(voice, duration, music, music_volume=music_volume, ducking_db=ducking_db,
+                                          max_stretch=max_stretch)
         
-        # Close the clips to release resources
-        video_clip.close()
-        voice_clip.close()
-        final_clip.close()
-        if background_music_path and 'music_clip' in locals():
-            music_clip.close()
-        
-        # Remove the temporary audio file
-        os.unlink(temp_audio_path)
+        with get_artifact_manager().workdir(scratch_key) as work_dir:
+            scratch_output = str(work_dir / f"{uuid.uuid4().hex}{os.path.splitext(output_path)[1]}")
+            
+            # Write the result to a file
+            if fast_mux and can_stream_copy(video_path, output_path):
+                logger.info("Muxing audio with a stream copy of the video track")
+                mix_path = str(work_dir / f"{uuid.uuid4().hex}.m4a")
+                with get_core_scheduler().reserve(1, job="mux"):
+                    encode_start = time.perf_counter()
+                    encode_audio(mixed_audio, mix_path)
+                    mux_video_and_audio(video_path, mix_path, scratch_output)
+                encode_path = "mux"
+            else:
+                if fast_mux:
+                    logger.info("Video stream cannot be copied, re-encoding")
+                # MoviePy's clip classes pull in imageio and proglog, so only the
+                # re-encode fallback imports them
+                from moviepy.video.io.VideoFileClip import VideoFileClip
+                from moviepy.audio.AudioClip import AudioArrayClip
+                with get_core_scheduler().reserve(profile.threads or ENCODE_THREADS_PER_JOB) as threads:
+                    logger.info(f"Re-encoding with the {profile.name} profile ({profile.preset}) on {threads} threads")
+                    encode_start = time.perf_counter()
+                    video_clip = VideoFileClip(video_path)
+                    final_clip = video_clip.set_audio(AudioArrayClip(mixed_audio, fps=SAMPLE_RATE))
+                    try:
+                        # MoviePy would otherwise leave its temporary audio file in the working directory
+                        final_clip.write_videofile(
+                            scratch_output, codec=profile.codec, audio_codec='aac', fps=24,
+                            preset=profile.preset, bitrate=profile.video_bitrate, threads=threads,
+                            # Index at the front, so playback can start before the whole file is loaded
+                            ffmpeg_params=profile.ffmpeg_params() + ["-movflags", "+faststart"],
+                            temp_audiofile=str(work_dir / f"{uuid.uuid4().hex}.m4a")
+                        )
+                    finally:
+                        # Close the clips to release resources
+                        video_clip.close()
+                        final_clip.close()
+                encode_path = "reencode"
+            publish(scratch_output, output_path)
+        get_telemetry().observe("encode_seconds", time.perf_counter() - encode_start, path=encode_path,
+                                profile=profile.name if encode_path == "reencode" else "copy")
         
         logger.info(f"Successfully created final video at {output_path}")
         
@@ -94,7 +284,125 @@ def combine_video_and_audio(video_path: str, audio_data: bytes, output_path: str
     
     except Exception as e:
         logger.error(f"Error combining video and audio: {str(e)}")
-        # Ensure temporary file is removed even if there's an error
-        if 'temp_audio_path' in locals() and os.path.exists(temp_audio_path):
-            os.unlink(temp_audio_path)
         raise
+
+
+def make_preview(video_path: str, audio_data: Union[bytes, np.ndarray], output_path: str, height: int = PREVIEW_HEIGHT,
+                 max_stretch: float = 0.0, scratch_key: Optional[str] = None) -> str:
+    """
+    Make a quick proxy of the final video, to show while the final video is assembled.
+    
+    The proxy has the narration fitted to the clip but no background music.
+    A clip that can be stream-copied is only remuxed with it, which takes
+    well under a second; otherwise the video is scaled down to height and
+    encoded with x264's ultrafast preset on a single core.
+    
+    Args:
+        video_path: Path to the input video file
+        audio_data: Voice narration as encoded audio bytes or decoded float32 samples
+        output_path: Path for the preview file
+        height: Height of the preview in pixels when the video has to be encoded
+        max_stretch: Maximum speed-up of the narration, as for combine_video_and_audio
+        scratch_key: Key of the scratch directory to share, e.g. the job id
+        
+    Returns:
+        Path to the preview file
+    """
+    start = time.perf_counter()
+    duration = video_duration(video_path)
+    voice = audio_data if isinstance(audio_data, np.ndarray) else decode_audio(audio_data)
+    narration = mix_voice_and_music(voice, duration, None, max_stretch=max_stretch)
+    
+    with get_artifact_manager().workdir(scratch_key) as work_dir, get_core_scheduler().reserve(1, job="preview"):
+        audio_path = encode_audio(narration, str(work_dir / f"{uuid.uuid4().hex}.m4a"), bitrate="96k")
+        scratch_output = str(work_dir / f"{uuid.uuid4().hex}{os.path.splitext(output_path)[1]}")
+        if can_stream_copy(video_path, output_path):
+            mux_video_and_audio(video_path, audio_path, scratch_output)
+        else:
+            command = [
+                get_setting("FFMPEG_BINARY"), "-y", "-hide_banner", "-loglevel", "error",
+                "-i", video_path,
+                "-i", audio_path,
+                "-map", "0:v:0", "-map", "1:a:0",
+                "-vf", f"scale=-2:{height},format=yuv420p",
+                "-c:v", "libx264", "-preset", "ultrafast", "-crf", "28", "-threads", "1",
+                "-c:a", "copy", "-shortest",
+                "-movflags", "+faststart",
+                scratch_output
+            ]
+            result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, errors="replace")
+            if result.returncode != 0:
+                raise Exception(f"ffmpeg preview failed: {result.stderr.strip()}")
+        publish(scratch_output, output_path)
+    get_telemetry().observe("preview_seconds", time.perf_counter() - start)
+    logger.info(f"Created preview at {output_path}")
+    return output_path
+
+
+def _streaming_args(name: str, output_path: str, segment_seconds: float) -> List[str]:
+    args = ["-map", "0:v:0", "-map", "0:a:0?", "-c", "copy"]
+    if name == "fmp4":
+        # moov box up front and a fragment per keyframe, so players can start and seek right away
+        return args + ["-movflags", "+frag_keyframe+empty_moov+default_base_moof", "-f", "mp4", output_path]
+    if name == "hls":
+        directory = os.path.dirname(output_path)
+        return args + [
+            "-f", "hls", "-hls_time", str(segment_seconds), "-hls_playlist_type", "vod",
+            "-hls_segment_type", "fmp4", "-hls_fmp4_init_filename", "init.mp4",
+            "-hls_segment_filename", os.path.join(directory, "segment_%03d.m4s"),
+            output_path
+        ]
+    if name == "dash":
+        return args + ["-f", "dash", "-seg_duration", str(segment_seconds), "-use_template", "1", "-use_timeline", "1",
+                       output_path]
+    raise ValueError(f"Unknown streaming format: {name}")
+
+
+def package_for_streaming(video_path: str, formats: List[str], output_dir: Optional[str] = None,
+                          segment_seconds: float = STREAMING_SEGMENT_SECONDS,
+                          scratch_key: Optional[str] = None) -> Dict[str, str]:
+    """
+    Repackage a video for streaming delivery, without re-encoding.
+    
+    All formats are written by one ffmpeg process that copies the streams:
+    "fmp4" is a single fragmented MP4, "hls" an HLS playlist with fMP4
+    segments and "dash" a DASH manifest with its segments. A static file
+    server or CDN can serve them with range requests or segment by segment,
+    so playback starts before the whole video is transferred. Segments are
+    cut at keyframes, so their length follows the GOP of the video.
+    
+    Args:
+        video_path: Path to the final video (H.264/AAC MP4)
+        formats: Names from STREAMING_FORMATS
+        output_dir: Directory of the packages (defaults to "<video name>_stream" next to the video)
+        segment_seconds: Target length of the HLS and DASH segments
+        scratch_key: Key of the scratch directory to share, e.g. the job id
+        
+    Returns:
+        Path of the file or manifest of each format
+    """
+    if not formats:
+        return {}
+    unknown = [name for name in formats if name not in STREAMING_FORMATS]
+    if unknown:
+        raise ValueError(f"Unknown streaming formats: {', '.join(unknown)}")
+    output_dir = output_dir or f"{os.path.splitext(video_path)[0]}_stream"
+    
+    start = time.perf_counter()
+    with get_artifact_manager().workdir(scratch_key) as work_dir, get_core_scheduler().reserve(1, job="package"):
+        package_dir = work_dir / uuid.uuid4().hex
+        command = [
+            get_setting("FFMPEG_BINARY"), "-y", "-hide_banner", "-loglevel", "error",
+            "-i", video_path
+        ]
+        for name in formats:
+            path = package_dir / STREAMING_FORMATS[name]
+            path.parent.mkdir(parents=True, exist_ok=True)
+            command += _streaming_args(name, str(path), segment_seconds)
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, errors="replace")
+        if result.returncode != 0:
+            raise Exception(f"ffmpeg streaming packaging failed: {result.stderr.strip()}")
+        publish(str(package_dir), output_dir)
+    get_telemetry().observe("package_seconds", time.perf_counter() - start, formats=",".join(formats))
+    logger.info(f"Packaged {video_path} for streaming as {', '.join(formats)} in {output_dir}")
+    return {name: os.path.join(output_dir, STREAMING_FORMATS[name]) for name in formats}
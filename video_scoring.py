@@ -0,0 +1,158 @@
+"""
+Video quality scoring for the video generation application.
+This module ranks Sora video variants with cheap metrics computed on sampled frames.
+"""
+
+import os
+import logging
+import subprocess
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from moviepy.config import get_setting
+
+from video_editor import probe_video
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Frames are sampled at this rate and downscaled to grayscale thumbnails
+SAMPLE_FPS = float(os.getenv("VIDEO_SCORE_SAMPLE_FPS", "2"))
+SAMPLE_WIDTH = 160
+SAMPLE_HEIGHT = 90
+
+# Mean luma (0.0 to 1.0) below which a frame counts as black
+BLACK_FRAME_LEVEL = 0.06
+
+# Mean absolute difference to the previous frame below which a frame counts as frozen
+FROZEN_FRAME_DIFF = 0.002
+
+# Motion and sharpness at which the respective score saturates
+MOTION_REFERENCE = 0.05
+SHARPNESS_REFERENCE = 0.01
+
+
+@dataclass
+class VariantScore:
+    """Frame-sampled quality metrics of a video and the resulting score."""
+    path: str
+    duration: float
+    motion: float
+    sharpness: float
+    black_ratio: float
+    frozen_ratio: float
+    duration_shortfall: float
+
+    @property
+    def score(self) -> float:
+        """
+        Combined score, higher is better.
+
+        Motion and sharpness earn up to one point each; black and frozen
+        frames and a clip shorter than the narration are penalized.
+        """
+        return (
+            min(self.motion / MOTION_REFERENCE, 1.0)
+            + min(self.sharpness / SHARPNESS_REFERENCE, 1.0)
+            - 2.0 * self.black_ratio
+            - 1.5 * self.frozen_ratio
+            - 3.0 * self.duration_shortfall
+        )
+
+
+def sample_frames(video_path: str, fps: float = SAMPLE_FPS) -> np.ndarray:
+    """
+    Decode grayscale thumbnails of a video at a fixed sampling rate.
+
+    Args:
+        video_path: Path to the video file
+        fps: Frames sampled per second of video
+
+    Returns:
+        float32 array of shape (frames, SAMPLE_HEIGHT, SAMPLE_WIDTH) with values in [0.0, 1.0]
+    """
+    command = [
+        get_setting("FFMPEG_BINARY"), "-hide_banner", "-loglevel", "error",
+        "-i", video_path,
+        "-vf", f"fps={fps},scale={SAMPLE_WIDTH}:{SAMPLE_HEIGHT},format=gray",
+        "-f", "rawvideo", "pipe:1"
+    ]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise Exception(f"ffmpeg frame sampling failed: {result.stderr.decode(errors='replace').strip()}")
+    frames = np.frombuffer(result.stdout, dtype=np.uint8).reshape(-1, SAMPLE_HEIGHT, SAMPLE_WIDTH)
+    return frames.astype(np.float32) / 255.0
+
+
+def laplacian_variance(frame: np.ndarray) -> float:
+    """Return the variance of the 4-neighbour Laplacian of a frame, a standard sharpness measure."""
+    laplacian = (
+        frame[:-2, 1:-1] + frame[2:, 1:-1] + frame[1:-1, :-2] + frame[1:-1, 2:]
+        - 4.0 * frame[1:-1, 1:-1]
+    )
+    return float(laplacian.var())
+
+
+def score_video(video_path: str, target_duration: Optional[float] = None) -> VariantScore:
+    """
+    Score a video with frame-sampled metrics.
+
+    Args:
+        video_path: Path to the video file
+        target_duration: Seconds the video has to cover, e.g. the narration length
+
+    Returns:
+        VariantScore of the video
+    """
+    frames = sample_frames(video_path)
+    duration = probe_video(video_path)["duration"] or len(frames) / SAMPLE_FPS
+    if not len(frames):
+        return VariantScore(video_path, duration, 0.0, 0.0, 1.0, 1.0, 1.0)
+
+    differences = np.abs(np.diff(frames, axis=0)).mean(axis=(1, 2)) if len(frames) > 1 else np.zeros(0)
+    brightness = frames.mean(axis=(1, 2))
+    lit = brightness >= BLACK_FRAME_LEVEL
+    shortfall = max(0.0, target_duration - duration) / target_duration if target_duration else 0.0
+
+    return VariantScore(
+        path=video_path,
+        duration=duration,
+        motion=float(differences.mean()) if len(differences) else 0.0,
+        # Sharpness of black frames says nothing about the clip
+        sharpness=float(np.median([laplacian_variance(f) for f in frames[lit]])) if lit.any() else 0.0,
+        black_ratio=float(1.0 - lit.mean()),
+        frozen_ratio=float((differences < FROZEN_FRAME_DIFF).mean()) if len(differences) else 1.0,
+        duration_shortfall=shortfall
+    )
+
+
+def pick_best_video(video_paths: Sequence[str], target_duration: Optional[float] = None,
+                    max_workers: Optional[int] = None) -> Tuple[str, List[VariantScore]]:
+    """
+    Score video variants in parallel and pick the best one.
+
+    Args:
+        video_paths: Paths of the candidate videos
+        target_duration: Seconds the video has to cover, e.g. the narration length
+        max_workers: Maximum number of videos scored at the same time
+
+    Returns:
+        Path of the best video and the scores of all candidates, best first
+    """
+    if not video_paths:
+        raise ValueError("No video variants to choose from")
+
+    # Scoring is dominated by the ffmpeg decode, which runs outside the GIL
+    with ThreadPoolExecutor(max_workers=max_workers or len(video_paths), thread_name_prefix="score") as executor:
+        scores = list(executor.map(lambda path: score_video(path, target_duration), video_paths))
+
+    scores.sort(key=lambda s: s.score, reverse=True)
+    for s in scores:
+        logger.info(
+            f"Variant {os.path.basename(s.path)}: score {s.score:.2f} (motion {s.motion:.4f}, sharpness {s.sharpness:.4f}, "
+            f"black {s.black_ratio:.0%}, frozen {s.frozen_ratio:.0%}, duration {s.duration:.1f}s)"
+        )
+    return scores[0].path, scores